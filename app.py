@@ -1,6 +1,5 @@
 import streamlit as st
-import sqlite3
-import os
+from utils.bootstrap import RECURSOS, bootstrap
 
 # Configurar la sesión y la página
 st.set_page_config(
@@ -10,180 +9,20 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS personalizado para un diseño más moderno
-st.markdown("""
-<style>
-    /* Fuentes y estilos generales */
-    @import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@400;500;600;700&display=swap');
-    
-    html, body, [class*="css"] {
-        font-family: 'Montserrat', sans-serif;
-    }
-    
-    /* Banner principal */
-    .banner {
-        width: 100%;
-        margin-bottom: 2rem;
-        border-radius: 10px;
-        overflow: hidden;
-    }
-    
-    /* Estilo para tarjetas de contenido */
-    .content-card {
-        background-color: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1.5rem;
-    }
-    
-    /* Estilo para títulos */
-    h1, h2, h3 {
-        color: #1e3a8a;
-        font-weight: 700;
-    }
-    
-    /* Estilo para párrafos */
-    p {
-        font-size: 1.1rem;
-        line-height: 1.6;
-        color: #4b5563;
-    }
-    
-    /* Estilo para la barra lateral */
-    [data-testid=stSidebar] {
-        background-image: linear-gradient(180deg, #1e3a8a, #1e40af);
-    }
-    
-    /* Ajustes para el texto en la barra lateral */
-    [data-testid=stSidebar] [data-testid=stMarkdownContainer] p,
-    [data-testid=stSidebar] [data-testid=stHeading],
-    [data-testid=stSidebar] [data-baseweb=tab] button p,
-    [data-testid=stSidebar] span, 
-    [data-testid=stSidebar] a {
-        color: white !important;
-    }
-    
-    /* Logo en la barra lateral */
-    .sidebar-logo {
-        display: block;
-        margin: 0 auto 1.5rem auto;
-        width: 80%;
-        max-width: 150px;
-    }
-    
-    /* Elementos destacados */
-    .highlight {
-        background-color: #dbeafe;
-        padding: 1rem;
-        border-left: 4px solid #3b82f6;
-        border-radius: 0.25rem;
-        margin: 1rem 0;
-    }
-    
-    /* Sección de características */
-    .feature-grid {
-        display: grid;
-        grid-template-columns: repeat(3, 1fr);
-        gap: 1rem;
-        margin: 2rem 0;
-    }
-    
-    .feature-item {
-        background-color: #f8fafc;
-        padding: 1rem;
-        border-radius: 8px;
-        text-align: center;
-    }
-    
-    .feature-icon {
-        font-size: 2.5rem;
-        margin-bottom: 0.5rem;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Crear la base de datos si no existe
-if not os.path.exists('data'):
-    os.makedirs('data')
-
-conn = sqlite3.connect('data/corners.db')
-cursor = conn.cursor()
-
-# Crear tablas si no existen
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS usuarios (
-    id INTEGER PRIMARY KEY,
-    username TEXT UNIQUE,
-    password TEXT
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS equipos (
-    id INTEGER PRIMARY KEY,
-    nombre TEXT UNIQUE
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS jugadores (
-    id INTEGER PRIMARY KEY,
-    nombre TEXT,
-    equipo_id INTEGER,
-    numero INTEGER,
-    FOREIGN KEY (equipo_id) REFERENCES equipos (id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS partidos (
-    id INTEGER PRIMARY KEY,
-    equipo_local_id INTEGER,
-    equipo_visitante_id INTEGER,
-    fecha TEXT,
-    FOREIGN KEY (equipo_local_id) REFERENCES equipos (id),
-    FOREIGN KEY (equipo_visitante_id) REFERENCES equipos (id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS corners (
-    id INTEGER PRIMARY KEY,
-    partido_id INTEGER,
-    equipo_id INTEGER,
-    minuto INTEGER,
-    tipo TEXT,
-    resultado TEXT,
-    FOREIGN KEY (partido_id) REFERENCES partidos (id),
-    FOREIGN KEY (equipo_id) REFERENCES equipos (id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS posiciones_jugadores (
-    id INTEGER PRIMARY KEY,
-    corner_id INTEGER,
-    jugador_id INTEGER,
-    equipo_id INTEGER,
-    x REAL,
-    y REAL,
-    rol TEXT,
-    tipo TEXT,
-    FOREIGN KEY (corner_id) REFERENCES corners (id),
-    FOREIGN KEY (jugador_id) REFERENCES jugadores (id),
-    FOREIGN KEY (equipo_id) REFERENCES equipos (id)
-)
-''')
+# Base de datos, recursos y estilos: se preparan una sola vez por proceso (ver utils/bootstrap.py)
+entorno = bootstrap()
+for aviso in entorno['avisos']:
+    st.warning(aviso)
 
-conn.commit()
-conn.close()
+# CSS personalizado para un diseño más moderno (assets/estilos.css); hay que enviarlo en cada ejecución
+# porque Streamlit reconstruye la página, pero el fichero solo se lee al arrancar
+st.markdown(entorno['estilos'], unsafe_allow_html=True)
 
 # Barra lateral con logo
 with st.sidebar:
     # Verificar explícitamente si el archivo existe
-    logo_path = "assets/logo.png"
-    if os.path.exists(logo_path):
+    logo_path = RECURSOS['logo']
+    if entorno['recursos']['logo']:
         st.image(logo_path, width=150)
     else:
         st.error(f"Logo no encontrado en {logo_path}")
@@ -193,8 +32,8 @@ with st.sidebar:
     st.markdown('<p style="color: white; font-weight: bold;">Selecciona una página arriba.</p>', unsafe_allow_html=True)
 
 # Banner principal
-banner_path = "assets/banner.png"
-if os.path.exists(banner_path):
+banner_path = RECURSOS['banner']
+if entorno['recursos']['banner']:
     st.image(banner_path, use_container_width=True)  # Reemplazado use_column_width por use_container_width
 else:
     st.error(f"Banner no encontrado en {banner_path}")
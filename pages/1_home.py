@@ -1,11 +1,15 @@
 import streamlit as st
 import sqlite3
 import hashlib
-from utils.auth import login_user, register_user
+from utils.auth import current_user, end_session, login_user, register_user, start_session
+from utils.bootstrap import bootstrap
 
 def make_hashed_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
+# El inicio de sesión necesita la base de datos preparada (una vez por proceso, ver utils/bootstrap.py)
+bootstrap()
+
 st.title("Bienvenido al Sistema de Análisis de Corners")
 
 # Crear pestañas para login y registro
@@ -18,8 +22,7 @@ with tab1:
     
     if st.button("Iniciar Sesión"):
         if login_user(username, password):
-            st.session_state.logged_in = True
-            st.session_state.username = username
+            start_session(username)
             st.success(f"Bienvenido, {username}!")
             st.rerun()
         else:
@@ -39,15 +42,15 @@ with tab2:
         else:
             st.error("El nombre de usuario ya existe")
 
-# Comprobar si el usuario está logueado
+# Comprobar si el usuario está logueado (también desde la cookie de sesión en una pestaña nueva)
+usuario = current_user()
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 
 if st.session_state.logged_in:
-    st.write(f"Has iniciado sesión como {st.session_state.username}")
+    st.write(f"Has iniciado sesión como {usuario}" + (f" ({st.session_state.club})" if st.session_state.club else ""))
     if st.button("Cerrar Sesión"):
-        st.session_state.logged_in = False
-        st.session_state.username = None
+        end_session()
         st.rerun()
 else:
     st.warning("Por favor, inicia sesión para acceder a todas las funcionalidades.")
\ No newline at end of file
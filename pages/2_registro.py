@@ -1,11 +1,15 @@
 import streamlit as st
 import sqlite3
 from utils.db import get_db_connection
+from utils.auth import require_login
+from utils.deletion import delete_player, delete_team, describe_deleted, soft_delete_match
+from utils.bootstrap import bootstrap
 
-# Verificar si el usuario está logueado
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.warning("Por favor, inicia sesión primero.")
-    st.stop()
+# Verificar si el usuario está logueado (sesión o token de la cookie, ver utils/auth.py)
+require_login()
+
+# Base de datos preparada una vez por proceso (ver utils/bootstrap.py)
+bootstrap()
 
 st.title("Registro de Equipos, Jugadores y Partidos")
 
@@ -87,7 +91,7 @@ with tab_equipos:
                 # Verificar si el equipo tiene partidos
                 tiene_partidos = conn.execute("""
                     SELECT COUNT(*) FROM partidos 
-                    WHERE equipo_local_id = ? OR equipo_visitante_id = ?
+                    WHERE (equipo_local_id = ? OR equipo_visitante_id = ?) AND borrado_en IS NULL
                 """, (equipo_id_editar, equipo_id_editar)).fetchone()[0]
                 conn.close()
                 
@@ -101,48 +105,13 @@ with tab_equipos:
                 
                 if st.button("Eliminar Equipo"):
                     if confirmation == "ELIMINAR":
-                        conn = get_db_connection()
-                        cursor = conn.cursor()
                         try:
-                            # Iniciar transacción
-                            cursor.execute("BEGIN TRANSACTION")
-                            
-                            # Eliminar posiciones de jugadores
-                            cursor.execute("""
-                                DELETE FROM posiciones_jugadores 
-                                WHERE jugador_id IN (SELECT id FROM jugadores WHERE equipo_id = ?)
-                            """, (equipo_id_editar,))
-                            
-                            # Eliminar corners de partidos del equipo
-                            cursor.execute("""
-                                DELETE FROM corners 
-                                WHERE partido_id IN (
-                                    SELECT id FROM partidos 
-                                    WHERE equipo_local_id = ? OR equipo_visitante_id = ?
-                                )
-                            """, (equipo_id_editar, equipo_id_editar))
-                            
-                            # Eliminar jugadores del equipo
-                            cursor.execute("DELETE FROM jugadores WHERE equipo_id = ?", 
-                                       (equipo_id_editar,))
-                            
-                            # Eliminar partidos del equipo
-                            cursor.execute("""
-                                DELETE FROM partidos 
-                                WHERE equipo_local_id = ? OR equipo_visitante_id = ?
-                            """, (equipo_id_editar, equipo_id_editar))
-                            
-                            # Finalmente eliminar el equipo
-                            cursor.execute("DELETE FROM equipos WHERE id = ?", (equipo_id_editar,))
-                            
-                            conn.commit()
-                            st.success("Equipo eliminado correctamente")
+                            # Un solo DELETE: jugadores, partidos, corners y posiciones se borran en cascada
+                            borrados = delete_team(equipo_id_editar)
+                            st.success(f"Equipo eliminado correctamente ({describe_deleted(borrados)})")
                             st.rerun()
                         except Exception as e:
-                            conn.rollback()
                             st.error(f"Error al eliminar el equipo: {e}")
-                        finally:
-                            conn.close()
                     else:
                         st.error("Confirmación incorrecta. El equipo no ha sido eliminado.")
         
@@ -249,7 +218,9 @@ with tab_jugadores:
                         # Verificar si el jugador tiene posiciones registradas
                         conn = get_db_connection()
                         tiene_posiciones = conn.execute("""
-                            SELECT COUNT(*) FROM posiciones_jugadores WHERE jugador_id = ?
+                            SELECT COUNT(*) FROM posiciones_jugadores pj
+                            JOIN corners c ON pj.corner_id = c.id
+                            WHERE pj.jugador_id = ? AND c.borrado_en IS NULL
                         """, (jugador_id_editar,)).fetchone()[0]
                         conn.close()
                         
@@ -257,27 +228,13 @@ with tab_jugadores:
                             st.info(f"Este jugador tiene {tiene_posiciones} posiciones registradas en corners.")
                         
                         if st.button("Eliminar Jugador"):
-                            conn = get_db_connection()
-                            cursor = conn.cursor()
                             try:
-                                # Iniciar transacción
-                                cursor.execute("BEGIN TRANSACTION")
-                                
-                                # Eliminar posiciones del jugador
-                                cursor.execute("DELETE FROM posiciones_jugadores WHERE jugador_id = ?", 
-                                           (jugador_id_editar,))
-                                
-                                # Eliminar jugador
-                                cursor.execute("DELETE FROM jugadores WHERE id = ?", (jugador_id_editar,))
-                                
-                                conn.commit()
-                                st.success("Jugador eliminado correctamente")
+                                # Sus posiciones en corners se borran en cascada
+                                borrados = delete_player(jugador_id_editar)
+                                st.success(f"Jugador eliminado correctamente ({describe_deleted(borrados)})")
                                 st.rerun()
                             except Exception as e:
-                                conn.rollback()
                                 st.error(f"Error al eliminar el jugador: {e}")
-                            finally:
-                                conn.close()
             
             # Mostrar lista de jugadores
             st.subheader("Lista de Jugadores")
@@ -335,6 +292,7 @@ with tab_partidos:
                 FROM partidos p
                 JOIN equipos e1 ON p.equipo_local_id = e1.id
                 JOIN equipos e2 ON p.equipo_visitante_id = e2.id
+                WHERE p.borrado_en IS NULL
                 ORDER BY p.fecha DESC
             """).fetchall()
             conn.close()
@@ -353,7 +311,7 @@ with tab_partidos:
                     # Verificar si el partido tiene corners registrados
                     conn = get_db_connection()
                     tiene_corners = conn.execute("""
-                        SELECT COUNT(*) FROM corners WHERE partido_id = ?
+                        SELECT COUNT(*) FROM corners WHERE partido_id = ? AND borrado_en IS NULL
                     """, (partido_id_eliminar,)).fetchone()[0]
                     conn.close()
                     
@@ -361,32 +319,13 @@ with tab_partidos:
                         st.info(f"Este partido tiene {tiene_corners} corners registrados.")
                     
                     if st.button("Eliminar Partido"):
-                        conn = get_db_connection()
-                        cursor = conn.cursor()
                         try:
-                            # Iniciar transacción
-                            cursor.execute("BEGIN TRANSACTION")
-                            
-                            # Eliminar posiciones de jugadores en corners del partido
-                            cursor.execute("""
-                                DELETE FROM posiciones_jugadores 
-                                WHERE corner_id IN (SELECT id FROM corners WHERE partido_id = ?)
-                            """, (partido_id_eliminar,))
-                            
-                            # Eliminar corners del partido
-                            cursor.execute("DELETE FROM corners WHERE partido_id = ?", (partido_id_eliminar,))
-                            
-                            # Eliminar partido
-                            cursor.execute("DELETE FROM partidos WHERE id = ?", (partido_id_eliminar,))
-                            
-                            conn.commit()
-                            st.success("Partido eliminado correctamente")
+                            # Se marcan como borrados el partido y sus corners; la compactación los purga después
+                            borrados = soft_delete_match(partido_id_eliminar)
+                            st.success(f"Partido eliminado correctamente ({describe_deleted(borrados)})")
                             st.rerun()
                         except Exception as e:
-                            conn.rollback()
                             st.error(f"Error al eliminar el partido: {e}")
-                        finally:
-                            conn.close()
                 
                 # Mostrar lista de partidos
                 st.subheader("Lista de Partidos")
@@ -1,24 +1,30 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
 from utils.db import get_db_connection, execute_query
-from PIL import Image, ImageDraw, ImageColor
-import os
+from utils.auth import require_login
+from utils.deletion import soft_delete_corner
+from utils.lazy import lazy_import
+from utils.bootstrap import RECURSOS, bootstrap, pitch_image
 import base64
 from io import BytesIO
 import math
 
-# Verificar si el usuario está logueado
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.warning("Por favor, inicia sesión primero.")
-    st.stop()
+# pandas, numpy y PIL se cargan al usarse por primera vez, no al comprobar la sesión (ver utils/lazy.py)
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+ImageDraw = lazy_import('PIL.ImageDraw')
+ImageColor = lazy_import('PIL.ImageColor')
+
+# Verificar si el usuario está logueado (sesión o token de la cookie, ver utils/auth.py)
+require_login()
+
+# Base de datos, columnas de corners y recursos preparados una vez por proceso (ver utils/bootstrap.py)
+entorno = bootstrap()
 
 # Añadir logo y título en la misma línea
-logo_path = "assets/logo.png"
-if os.path.exists(logo_path):
+logo_path = RECURSOS['logo']
+if entorno['recursos']['logo']:
     col_logo, col_title = st.columns([1, 5])
     with col_logo:
         st.image(logo_path, width=100)
@@ -56,45 +62,8 @@ if not isinstance(st.session_state.posiciones_ofensivas, dict):
 if not isinstance(st.session_state.roles_ofensivos, dict):
     st.session_state.roles_ofensivos = {}
 
-# Verificar si existen las columnas necesarias en la tabla corners
-def verificar_columnas_corners():
-    try:
-        # Intentar ejecutar una consulta que use las columnas
-        execute_query("""
-            SELECT zona_caida, punto_caida FROM corners LIMIT 1
-        """)
-        return True, True
-    except:
-        # Intentar añadir las columnas si no existen
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        try:
-            # Verificar si las columnas ya existen
-            cursor.execute("PRAGMA table_info(corners)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            # Añadir columna zona_caida si no existe
-            if 'zona_caida' not in columns:
-                cursor.execute("ALTER TABLE corners ADD COLUMN zona_caida TEXT")
-            
-            # Añadir columna punto_caida si no existe
-            if 'punto_caida' not in columns:
-                cursor.execute("ALTER TABLE corners ADD COLUMN punto_caida TEXT")
-            
-            conn.commit()
-            return True, True
-        except Exception as e:
-            st.error(f"Error al añadir columnas: {e}")
-            conn.rollback()
-            return False, False
-        finally:
-            conn.close()
-
-# Ejecutar verificación de estructura de tabla
-has_zona_caida, has_punto_caida = verificar_columnas_corners()
-
 # Mostrar mensaje si las columnas no existen
-if not has_zona_caida or not has_punto_caida:
+if not entorno['columnas_corners_ok']:
     st.info("""
     Nota: Algunas funcionalidades avanzadas no estarán disponibles en la base de datos.
     La información de trayectoria se mostrará pero no se guardará permanentemente.
@@ -110,6 +79,7 @@ with col1:
         FROM partidos p
         JOIN equipos e1 ON p.equipo_local_id = e1.id
         JOIN equipos e2 ON p.equipo_visitante_id = e2.id
+        WHERE p.borrado_en IS NULL
         ORDER BY p.fecha DESC
     """, as_dict=False)
 
@@ -326,7 +296,7 @@ def draw_curved_arrow(draw, start_point, end_point, width, height, color=(255, 0
 def draw_field_with_trajectory(tipo_corner, punto_caida=None):
     # Cargar la imagen del campo
     try:
-        image = Image.open('assets/mediocampo.jpg')
+        image = pitch_image()
     except FileNotFoundError:
         st.error("No se encontró la imagen del campo en assets/mediocampo.jpg")
         # Crear una imagen verde como respaldo
@@ -393,7 +363,7 @@ with col_tray:
     if st.checkbox("Mostrar todas las zonas de referencia"):
         # Cargar imagen nuevamente para mostrar los puntos de referencia
         try:
-            debug_image = Image.open('assets/mediocampo.jpg')
+            debug_image = pitch_image()
         except FileNotFoundError:
             debug_image = Image.new('RGB', (600, 400), (50, 200, 50))
         
@@ -469,7 +439,7 @@ with col_tray:
 def draw_field_with_positions(positions, roles, color_map):
     # Cargar la imagen del campo
     try:
-        image = Image.open('assets/mediocampo.jpg')
+        image = pitch_image()
     except FileNotFoundError:
         st.error("No se encontró la imagen del campo en assets/mediocampo.jpg")
         # Crear una imagen verde como respaldo
@@ -733,7 +703,7 @@ try:
         SELECT c.id, c.minuto, c.tipo, c.resultado, e.nombre as equipo, c.zona_caida, c.punto_caida
         FROM corners c
         JOIN equipos e ON c.equipo_id = e.id
-        WHERE c.partido_id = ?
+        WHERE c.partido_id = ? AND c.borrado_en IS NULL
         ORDER BY c.minuto
     """, (partido_id,), as_dict=False)  # Cambiado a False para recibir tuplas
 except Exception as e:
@@ -807,22 +777,8 @@ if corners_registrados:
             with col_eliminar:
                 if st.button("Eliminar", use_container_width=True, type="primary"):
                     try:
-                        conn = get_db_connection()
-                        cursor = conn.cursor()
-                        
-                        # Primero eliminar las posiciones asociadas
-                        cursor.execute("""
-                            DELETE FROM posiciones_jugadores 
-                            WHERE corner_id = ?
-                        """, (st.session_state.corner_seleccionado_id,))
-                        
-                        # Luego eliminar el corner
-                        cursor.execute("""
-                            DELETE FROM corners 
-                            WHERE id = ?
-                        """, (st.session_state.corner_seleccionado_id,))
-                        
-                        conn.commit()
+                        # Se marca como borrado; sus posiciones se purgan con él al compactar
+                        soft_delete_corner(st.session_state.corner_seleccionado_id)
                         
                         # Eliminar de la información adicional en la sesión
                         if st.session_state.corner_seleccionado_id in st.session_state.info_corners:
@@ -837,10 +793,7 @@ if corners_registrados:
                         st.rerun()
                         
                     except Exception as e:
-                        conn.rollback()
                         st.error(f"Error al eliminar el corner: {e}")
-                    finally:
-                        conn.close()
 else:
     st.info("No hay corners registrados para este partido.")
 
@@ -1,60 +1,37 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle, FancyArrowPatch
-from matplotlib.path import Path
-import matplotlib.patches as patches
 from utils.db import get_db_connection
-import os
-from PIL import Image
-import matplotlib.image as mpimg
-import math
-import seaborn as sns
-from matplotlib.lines import Line2D
+from utils.auth import require_login
+from utils.scheduler import ChartScheduler
+from utils.profiling import begin_rerun, section, end_rerun, stop_rerun
+from utils.lazy import lazy_import
+from utils.bootstrap import RECURSOS, bootstrap
+from utils.categories import COLORES_RESULTADOS_DEFENSIVOS, categorize_columns, lookup_by_code, observed_counts
+from utils.visualization import get_role_colors, COLORES_ROLES_POR_CODIGO
+from utils.exports import render_export
+from utils.charts import (build_bar_chart, build_pie_chart, build_role_frequency_chart,
+                          build_zone_arrows_chart, build_average_positions_chart, build_slot_layout_chart,
+                          build_player_positions_chart, build_heatmap_chart,
+                          build_effectiveness_chart, build_trend_chart)
+from functools import partial
 
-# Verificar si el usuario está logueado
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.warning("Por favor, inicia sesión primero.")
-    st.stop()
+# pandas y numpy se cargan al usarse por primera vez, después de comprobar la sesión (ver utils/lazy.py)
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
-# Función para verificar y actualizar la estructura de la tabla corners si es necesario
-def ensure_corner_columns_exist():
-    """Asegurar que las columnas zona_caida y punto_caida existen en la tabla corners"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Verificar si las columnas ya existen
-        cursor.execute("PRAGMA table_info(corners)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        # Añadir columna zona_caida si no existe
-        if 'zona_caida' not in columns:
-            cursor.execute("ALTER TABLE corners ADD COLUMN zona_caida TEXT")
-            st.info("Columna zona_caida añadida a la tabla corners")
-        
-        # Añadir columna punto_caida si no existe
-        if 'punto_caida' not in columns:
-            cursor.execute("ALTER TABLE corners ADD COLUMN punto_caida TEXT")
-            st.info("Columna punto_caida añadida a la tabla corners")
-        
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error al añadir columnas: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
+# Verificar si el usuario está logueado (sesión o token de la cookie, ver utils/auth.py)
+require_login()
+
+# Base de datos, columnas de corners y recursos preparados una vez por proceso (ver utils/bootstrap.py)
+entorno = bootstrap()
 
-# Ejecutar verificación de estructura de tabla
-ensure_corner_columns_exist()
+# Perfilado opcional de esta ejecución (ver utils/profiling.py)
+begin_rerun('5_analisis_defensivo')
+section("Selección")
 
 # Añadir logo en la parte superior
-logo_path = "assets/logo.png"
-if os.path.exists(logo_path):
+logo_path = RECURSOS['logo']
+if entorno['recursos']['logo']:
     col_logo, col_title = st.columns([1, 5])
     with col_logo:
         st.image(logo_path, width=100)
@@ -70,7 +47,7 @@ conn.close()
 
 if not equipos:
     st.warning("No hay equipos registrados.")
-    st.stop()
+    stop_rerun()
 
 # Crear un layout de dos columnas para los selectores
 col_equipo, col_jugador = st.columns(2)
@@ -89,14 +66,14 @@ corners = conn.execute("""
     FROM corners c
     JOIN partidos p ON c.partido_id = p.id
     JOIN equipos e_ataque ON c.equipo_id = e_ataque.id
-    WHERE (p.equipo_local_id = ? OR p.equipo_visitante_id = ?) AND c.equipo_id != ?
+    WHERE (p.equipo_local_id = ? OR p.equipo_visitante_id = ?) AND c.equipo_id != ? AND c.borrado_en IS NULL
     ORDER BY p.fecha DESC
 """, (equipo_id, equipo_id, equipo_id)).fetchall()
 conn.close()
 
 if not corners:
     st.warning(f"No hay corners defensivos registrados para {equipo_seleccionado}.")
-    st.stop()
+    stop_rerun()
 
 # Obtener lista de jugadores del equipo para el selector de jugador
 conn = get_db_connection()
@@ -120,156 +97,19 @@ with col_jugador:
 
 st.info(f"Se encontraron {len(corners)} corners defensivos para {equipo_seleccionado}")
 
-# Función para crear una flecha convexa
-def create_curved_arrow(ax, start_point, end_point, color='red', width=2, label=None, curvature=0.2):
-    # Calcular punto medio
-    mid_x = (start_point[0] + end_point[0]) / 2
-    mid_y = (start_point[1] + end_point[1]) / 2
-    
-    # Calcular la distancia entre los puntos
-    dx = end_point[0] - start_point[0]
-    dy = end_point[1] - start_point[1]
-    distance = math.sqrt(dx*dx + dy*dy)
-    
-    # Determinar la dirección de la curva
-    if start_point[0] < end_point[0]:  # De izquierda a derecha
-        control_x = mid_x
-        control_y = mid_y + distance * curvature
-    else:  # De derecha a izquierda
-        control_x = mid_x
-        control_y = mid_y - distance * curvature
-    
-    # Crear los puntos de la ruta para la flecha
-    verts = [
-        (start_point[0], start_point[1]),  # Punto inicial
-        (control_x, control_y),            # Punto de control
-        (end_point[0], end_point[1]),      # Punto final
-    ]
-    
-    codes = [
-        Path.MOVETO,
-        Path.CURVE3,
-        Path.CURVE3,
-    ]
-    
-    path = Path(verts, codes)
-    patch = patches.PathPatch(path, facecolor='none', edgecolor=color, lw=width, alpha=0.7)
-    ax.add_patch(patch)
-    
-    # Dibujar punta de flecha
-    arrow_length = 0.5
-    arrow_width = 0.3
-    
-    # Calcular la dirección en el punto final
-    # Para una curva Bézier cuadrática, la dirección tangente en t=1 es P2-P1
-    dx = end_point[0] - control_x
-    dy = end_point[1] - control_y
-    
-    # Normalizar el vector
-    mag = math.sqrt(dx*dx + dy*dy)
-    if mag != 0:
-        dx, dy = dx/mag, dy/mag
-    
-    # Calcular puntos para la punta de flecha
-    arrow_point1_x = end_point[0] - arrow_length * (dx + arrow_width*dy)
-    arrow_point1_y = end_point[1] - arrow_length * (dy - arrow_width*dx)
-    arrow_point2_x = end_point[0] - arrow_length * (dx - arrow_width*dy)
-    arrow_point2_y = end_point[1] - arrow_length * (dy + arrow_width*dx)
-    
-    # Dibujar la punta de flecha
-    ax.fill([end_point[0], arrow_point1_x, arrow_point2_x], 
-            [end_point[1], arrow_point1_y, arrow_point2_y], 
-            color=color, alpha=0.7)
-    
-    # Añadir etiqueta en la parte curva de la flecha
-    if label:
-        # Posicionar la etiqueta en la parte más convexa de la curva
-        label_x = control_x
-        label_y = control_y
-        
-        # Añadir un fondo blanco para la etiqueta para mejorar la visibilidad
-        ax.text(label_x, label_y, label, ha='center', va='center', 
-                color='black', fontweight='bold', fontsize=9,
-                bbox=dict(facecolor='white', alpha=0.7, edgecolor='none', boxstyle='round,pad=0.2'))
+# Avisar si falta la imagen de fondo del campo
+if not entorno['recursos']['campo']:
+    st.warning("No se pudo cargar la imagen de fondo. Usando campo genérico.")
 
-# Función para crear campo de fútbol con imagen de fondo
-def create_field_plot():
-    fig, ax = plt.subplots(figsize=(10, 7))
-    
-    # Intentar cargar la imagen de fondo
-    try:
-        # Cargar la imagen como fondo
-        field_img = mpimg.imread('assets/mediocampo.jpg')
-        
-        # Configurar los límites del eje para que coincidan con nuestro sistema de coordenadas
-        ax.set_xlim(0, 100)
-        ax.set_ylim(0, 70)  # Mantener orientación normal
-        
-        # Mostrar la imagen de fondo
-        ax.imshow(field_img, extent=[0, 100, 0, 70], aspect='auto', alpha=1.0)
-    except Exception as e:
-        # Si no se puede cargar la imagen, usar el fondo verde como respaldo
-        ax.set_xlim(0, 100)
-        ax.set_ylim(0, 70)
-        
-        # Dibujar el campo (simplificado para la zona de corner)
-        ax.add_patch(plt.Rectangle((0, 0), 100, 70, fill=True, color='green', alpha=0.3))
-        ax.add_patch(plt.Rectangle((0, 0), 16.5, 40.3, fill=False, edgecolor='white'))
-        ax.add_patch(plt.Rectangle((0, 0), 5.5, 18.3, fill=False, edgecolor='white'))
-        circle = plt.Circle((11, 11), 9.15, fill=False, edgecolor='white')
-        ax.add_artist(circle)
-        
-        st.warning("No se pudo cargar la imagen de fondo. Usando campo genérico.")
-    
-    # Configuraciones comunes
-    ax.set_aspect('equal')
-    ax.axis('off')
-    
-    return fig, ax
-
-# Definir el punto de origen del corner basado en el tipo - igual que en registro_corners.py
-def get_punto_origen(tipo_corner):
-    if tipo_corner == "Derecha":
-        return (96, 6)  # Esquina derecha
-    else:  # "Izquierda"
-        return (4, 6)   # Esquina izquierda
-
-# Definir las zonas de referencia para el punto de caída - igual que en registro_corners.py
-def get_zonas_referencia(tipo_corner):
-    # Las zonas son: Primer Palo, Centro del Área Pequeña, Segundo Palo,
-    # Frontal Palo Cercano, Frontal Centro, Frontal Palo Lejano, 
-    # Zona de Rechace, Zona en Corto
-    
-    if tipo_corner == "Derecha":
-        # Corner desde la derecha (viendo hacia la portería)
-        return {
-            "Primer Palo": (65, 15),         # Primer palo (más alejado del corner)
-            "Centro Área Pequeña": (50, 15), # Centro del área pequeña
-            "Segundo Palo": (35, 15),        # Segundo palo (más cercano al corner)
-            "Frontal Palo Cercano": (35, 30), # Frontal cerca del segundo palo (cercano al lanzamiento)
-            "Frontal Centro": (50, 30),      # Frontal centro
-            "Frontal Palo Lejano": (65, 30), # Frontal cerca del primer palo (lejano al lanzamiento)
-            "Zona de Rechace": (50, 45),     # Zona de rechace
-            "Zona en Corto": (80, 20)        # Zona en corto (derecha)
-        }
-    else:  # "Izquierda"
-        # Corner desde la izquierda (viendo hacia la portería)
-        return {
-            "Primer Palo": (35, 15),         # Primer palo (más alejado del corner)
-            "Centro Área Pequeña": (50, 15), # Centro del área pequeña
-            "Segundo Palo": (65, 15),        # Segundo palo (más cercano al corner)
-            "Frontal Palo Cercano": (65, 30), # Frontal cerca del segundo palo (cercano al lanzamiento)
-            "Frontal Centro": (50, 30),      # Frontal centro
-            "Frontal Palo Lejano": (35, 30), # Frontal cerca del primer palo (lejano al lanzamiento)
-            "Zona de Rechace": (50, 45),     # Zona de rechace
-            "Zona en Corto": (20, 20)        # Zona en corto (izquierda)
-        }
+# Los gráficos se encargan en orden y se rasterizan en paralelo; cada uno aparece en su hueco al terminar
+charts = ChartScheduler()
 
 # Layout de dos filas y dos columnas
 # Primera fila: Estadísticas y Posicionamiento Promedio
 row1_col1, row1_col2 = st.columns(2)
 
 # Primera fila, primera columna: Estadísticas Generales y Distribución de Zonas
+section("Estadísticas")
 with row1_col1:
     st.subheader("Estadísticas Defensivas")
     
@@ -279,7 +119,7 @@ with row1_col1:
         SELECT c.resultado, COUNT(*) as cantidad
         FROM corners c
         JOIN partidos p ON c.partido_id = p.id
-        WHERE (p.equipo_local_id = ? OR p.equipo_visitante_id = ?) AND c.equipo_id != ?
+        WHERE (p.equipo_local_id = ? OR p.equipo_visitante_id = ?) AND c.equipo_id != ? AND c.borrado_en IS NULL
         GROUP BY c.resultado
     """, (equipo_id, equipo_id, equipo_id)).fetchall()
     conn.close()
@@ -291,9 +131,6 @@ with row1_col1:
         # Mostrar tabla de datos
         st.dataframe(resultados_df)
         
-        # Mostrar gráfico
-        fig, ax = plt.subplots(figsize=(6, 4))
-        
         # Definir colores según resultados (verde para buenos resultados defensivos, rojo para malos)
         colores = []
         for resultado in resultados_df['Resultado']:
@@ -305,12 +142,9 @@ with row1_col1:
                 colores.append('green')  # Otros resultados son buenos defensivamente
         
         # Crear gráfico de barras con colores personalizados
-        ax.bar(resultados_df['Resultado'], resultados_df['Cantidad'], color=colores)
-        ax.set_ylabel('Cantidad')
-        ax.set_title('Resultados de Corners en Defensa')
-        plt.xticks(rotation=45, ha='right')
-        fig.tight_layout()
-        st.pyplot(fig)
+        charts.schedule('defensivo/resultados', partial(build_bar_chart,
+            resultados_df['Resultado'], resultados_df['Cantidad'], 'Resultados de Corners en Defensa', colors=colores
+        ), equipo_id=equipo_id)
         
         # Mostrar efectividad defensiva general
         total_corners = resultados_df['Cantidad'].sum()
@@ -326,7 +160,6 @@ with row1_col1:
         st.subheader("Efectividad Defensiva")
         
         # Crear un gráfico de pastel para visualizar la efectividad
-        fig_pie, ax_pie = plt.subplots(figsize=(6, 6))
         labels = ['Neutralizados', 'Remates Permitidos', 'Goles Recibidos']
         sizes = [porcentaje_neutralizados, porcentaje_remates, porcentaje_goles]
         colors = ['green', 'orange', 'red']
@@ -334,11 +167,9 @@ with row1_col1:
         
         # Dibujar gráfico de pastel solo si hay datos
         if sum(sizes) > 0:
-            ax_pie.pie(sizes, explode=explode, labels=labels, colors=colors, 
-                    autopct='%1.1f%%', shadow=True, startangle=90)
-            ax_pie.axis('equal')  # Para asegurar que se dibuje como un círculo
-            plt.title('Efectividad Defensiva en Corners')
-            st.pyplot(fig_pie)
+            charts.schedule('defensivo/efectividad', partial(build_pie_chart,
+                sizes, labels, colors, 'Efectividad Defensiva en Corners', explode=explode
+            ), equipo_id=equipo_id)
         
         # Texto descriptivo con la efectividad
         st.markdown(f"""
@@ -350,6 +181,7 @@ with row1_col1:
         """)
 
 # Primera fila, segunda columna: Posicionamiento Promedio Defensivo
+section("Posicionamiento")
 with row1_col2:
     st.subheader("Posicionamiento Promedio Defensivo")
     
@@ -361,7 +193,7 @@ with row1_col2:
         JOIN jugadores j ON pj.jugador_id = j.id
         JOIN corners c ON pj.corner_id = c.id
         JOIN partidos p ON c.partido_id = p.id
-        WHERE pj.equipo_id = ? AND pj.tipo = 'Defensivo' AND c.equipo_id != ?
+        WHERE pj.equipo_id = ? AND pj.tipo = 'Defensivo' AND c.equipo_id != ? AND c.borrado_en IS NULL
         GROUP BY j.id, pj.rol
         ORDER BY veces DESC
     """, (equipo_id, equipo_id)).fetchall()
@@ -370,53 +202,62 @@ with row1_col2:
     if not posiciones:
         st.warning("No hay datos de posicionamiento defensivo registrados.")
     else:
-        # Crear el campo de fútbol para visualizar el posicionamiento promedio
-        fig, ax = create_field_plot()
-        
         # Dibujar jugadores en sus posiciones promedio
-        for pos in posiciones:
-            jugador_id, nombre, numero, rol, x_prom, y_prom, veces = pos
-            # Transformar la coordenada y para que sea coherente con el registro
-            y_transformada = 70 - y_prom  # Invertir el eje Y
-            
-            color = {'Zona': 'red', 'Al hombre': 'blue', 'Poste': 'yellow', 'Arriba': 'green'}.get(rol, 'white')
-            
-            # Tamaño del círculo proporcional a la frecuencia
-            size = 1 + (veces / 5)  # Ajustar según necesidad
-            
-            circle = plt.Circle((x_prom, y_transformada), size, color=color, alpha=0.7)
-            ax.add_artist(circle)
-            ax.text(x_prom, y_transformada, str(numero), ha='center', va='center', color='black', fontweight='bold')
+        pos_df = pd.DataFrame(posiciones, columns=['jugador_id', 'nombre', 'numero', 'rol', 'x_prom', 'y_prom', 'veces'])
+        pos_df = categorize_columns(pos_df, {'rol': 'rol'})
         
-        # Leyenda
-        legend_elements = [
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='Zona'),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='Al hombre'),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='yellow', markersize=10, label='Poste'),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='green', markersize=10, label='Arriba')
-        ]
-        ax.legend(handles=legend_elements, loc='upper right')
-        
-        # Configurar título y mostrar el gráfico
-        ax.set_title(f'Posicionamiento Defensivo Promedio - {equipo_seleccionado}')
-        fig.tight_layout()
-        st.pyplot(fig)
+        charts.schedule('defensivo/posiciones_promedio', partial(build_average_positions_chart,
+            pos_df, 'Defensivo', f'Posicionamiento Defensivo Promedio - {equipo_seleccionado}'
+        ), equipo_id=equipo_id)
 
         # Mostrar distribución de roles en formato de gráfico de barras
         st.subheader("Distribución de Roles Defensivos")
-        roles_df = pd.DataFrame([(p[3], p[6]) for p in posiciones], columns=['Rol', 'Frecuencia'])
-        roles_count = roles_df.groupby('Rol').sum().reset_index()
+        roles_df = pos_df[['rol', 'veces']].rename(columns={'rol': 'Rol', 'veces': 'Frecuencia'})
+        roles_count = roles_df.groupby('Rol', observed=True).sum().reset_index()
         
-        fig, ax = plt.subplots(figsize=(6, 4))
-        colors = ['red', 'blue', 'yellow', 'green']
-        sns.barplot(x='Rol', y='Frecuencia', data=roles_count, ax=ax, palette=colors)
-        plt.xticks(rotation=45, ha='right')
-        ax.set_ylabel('Cantidad')
-        ax.set_title('Frecuencia de Roles en Corners Defensivos')
-        plt.tight_layout()
-        st.pyplot(fig)
+        colors = get_role_colors(roles_count['Rol'], 'Defensivo')
+        charts.schedule('defensivo/roles', partial(build_role_frequency_chart,
+            roles_count, colors, 'Frecuencia de Roles en Corners Defensivos'
+        ), equipo_id=equipo_id)
+
+# Colocación defensiva por huecos (ver utils/slots.py): un intercambio de marcas entre jugadores no
+# desplaza las posiciones medias
+section("Huecos")
+st.subheader("Colocación Defensiva por Huecos")
+try:
+    # numpy y el almacén de posiciones se cargan aquí, después de comprobar la sesión
+    from utils.slots import load_slot_layout
+
+    with st.spinner("Asignando jugadores a huecos..."):
+        colocacion = load_slot_layout(equipo_id, 'Defensivo')
+except Exception as e:
+    st.error(f"Error al calcular la colocación por huecos: {e}")
+    colocacion = None
+
+if colocacion is not None and not colocacion['huecos']:
+    st.info("No hay corners defensivos con posiciones registradas.")
+elif colocacion is not None:
+    huecos_col1, huecos_col2 = st.columns(2)
+    huecos_df = pd.DataFrame(colocacion['huecos'])
+    with huecos_col1:
+        charts.schedule('defensivo/huecos', partial(build_slot_layout_chart,
+            huecos_df, 'Defensivo', f"Colocación Defensiva por Huecos - {equipo_seleccionado} ({colocacion['corners']} corners)"
+        ), equipo_id=equipo_id)
+    with huecos_col2:
+        st.caption("Cada hueco es una posición de la defensa, ocupe quien la ocupe; la elipse marca su "
+                   "dispersión. Los corners recibidos por la izquierda se muestran reflejados.")
+        nombres = {j[0]: f"{j[2]} - {j[1]}" for j in jugadores}
+        st.dataframe(pd.DataFrame({
+            'Hueco': huecos_df['hueco'],
+            'Rol': huecos_df['rol'],
+            '% mismo rol': (100 * huecos_df['consistencia']).round(1),
+            '% ocupado': (100 * huecos_df['ocupacion']).round(1),
+            'Dispersión': huecos_df['dispersion'].round(1),
+            'Jugadores': [', '.join(f"{nombres.get(j, j)} ({v})" for j, v in js) for js in huecos_df['jugadores']],
+        }).set_index('Hueco'))
 
 # Sección de visualización de puntos de caída de corners opuestos
+section("Zonas rivales")
 st.markdown("---")
 st.subheader("Zonas de Ataque de los Rivales")
 
@@ -432,6 +273,7 @@ def visualizar_zonas_rivales():
             JOIN equipos e ON c.equipo_id = e.id
             WHERE (p.equipo_local_id = ? OR p.equipo_visitante_id = ?) 
             AND c.equipo_id != ? 
+            AND c.borrado_en IS NULL
             AND c.zona_caida IS NOT NULL 
             AND c.zona_caida != ''
         """, (equipo_id, equipo_id, equipo_id)).fetchall()
@@ -439,7 +281,7 @@ def visualizar_zonas_rivales():
         
         if not zonas_rivales or len(zonas_rivales) == 0:
             st.info("No hay datos suficientes sobre las zonas de ataque de los rivales")
-            return None
+            return None, None
         
         # Convertir a DataFrame para análisis
         zonas_df = pd.DataFrame(zonas_rivales, columns=['Tipo', 'Zona', 'Punto', 'Resultado', 'Equipo'])
@@ -454,68 +296,25 @@ def visualizar_zonas_rivales():
         
         # Mostrar tabla de frecuencia de zonas
         st.dataframe(zonas_count)
-        
-        # Visualizar en el campo
-        fig, ax = create_field_plot()
+        render_export('corners_recibidos', 'exportar_corners_recibidos', sufijo=str(equipo_id), equipo_id=equipo_id)
         
         # Agrupar por tipo y zona para mostrar las flechas
         tipo_zona = zonas_df.groupby(['Tipo', 'Zona']).size().reset_index(name='Cantidad')
         
-        # Para cada combinación tipo-zona, dibujar una flecha
-        for _, row in tipo_zona.iterrows():
-            tipo = row['Tipo']
-            zona = row['Zona']
-            cantidad = row['Cantidad']
-            
-            # Calcular porcentaje
-            porcentaje = (cantidad / total * 100).round(1)
-            
-            # Obtener el origen según el tipo de corner
-            origen = get_punto_origen(tipo)
-            
-            # Obtener el destino según la zona
-            zonas_ref = get_zonas_referencia(tipo)
-            if zona in zonas_ref:
-                destino = zonas_ref[zona]
-            else:
-                # Si la zona no está en nuestras referencias, usar un punto predeterminado
-                destino = (50, 30)
-            
-            # Transformar para visualización
-            origen_transformado = (origen[0], 70 - origen[1])
-            destino_transformado = (destino[0], 70 - destino[1])
-            
-            # Dibujar flecha
-            create_curved_arrow(
-                ax, 
-                origen_transformado, 
-                destino_transformado, 
-                color='purple' if tipo == 'Derecha' else 'orange',  # Colores distintos por tipo
-                width=1 + (porcentaje / 5),  # Grosor según frecuencia
-                label=f"{porcentaje}%",
-                curvature=0.3
-            )
-        
-        # Añadir leyenda
-        legend_elements = [
-            Line2D([0], [0], color='purple', lw=2, label='Corners desde Derecha'),
-            Line2D([0], [0], color='orange', lw=2, label='Corners desde Izquierda')
-        ]
-        ax.legend(handles=legend_elements, loc='upper right')
-        
-        # Configurar título
-        ax.set_title('Zonas de Ataque de los Rivales\n(Tamaño de flecha = Frecuencia)')
-        
-        return fig, zonas_df
+        return tipo_zona, zonas_df
     
     except Exception as e:
         st.error(f"Error al analizar zonas de los rivales: {e}")
         return None, None
 
 # Ejecutar visualización
-fig_zonas, zonas_df = visualizar_zonas_rivales()
-if fig_zonas:
-    st.pyplot(fig_zonas)
+tipo_zona, zonas_df = visualizar_zonas_rivales()
+if tipo_zona is not None:
+    # Visualizar en el campo; el grosor de la flecha depende de la frecuencia
+    charts.schedule('defensivo/zonas_rivales', partial(build_zone_arrows_chart,
+        tipo_zona, ('purple', 'orange'), ('Corners desde Derecha', 'Corners desde Izquierda'),
+        'Zonas de Ataque de los Rivales\n(Tamaño de flecha = Frecuencia)'
+    ), equipo_id=equipo_id)
     
     # Análisis adicional: mostrar efectividad por zona
     if zonas_df is not None and not zonas_df.empty:
@@ -542,33 +341,17 @@ if fig_zonas:
         st.dataframe(zona_resultado)
         
         # Visualizar gráficamente
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Preparar datos para gráfico
         zonas = zona_resultado.index
         goles_pct = zona_resultado['% Goles'] if '% Goles' in zona_resultado.columns else [0] * len(zonas)
         remates_pct = zona_resultado['% Remates'] if '% Remates' in zona_resultado.columns else [0] * len(zonas)
         
-        # Crear barras
-        x = np.arange(len(zonas))
-        width = 0.35
-        
-        ax.bar(x - width/2, goles_pct, width, label='% Goles Recibidos', color='red')
-        ax.bar(x + width/2, remates_pct, width, label='% Remates Permitidos', color='orange')
-        
-        # Configurar eje X
-        ax.set_xticks(x)
-        ax.set_xticklabels(zonas, rotation=45, ha='right')
-        
-        # Añadir etiquetas y título
-        ax.set_ylabel('Porcentaje %')
-        ax.set_title('Efectividad Defensiva por Zona')
-        ax.legend()
-        
-        fig.tight_layout()
-        st.pyplot(fig)
+        charts.schedule('defensivo/efectividad_zonas', partial(build_effectiveness_chart,
+            zonas, goles_pct, remates_pct, ('% Goles Recibidos', '% Remates Permitidos'), ('red', 'orange'),
+            'Efectividad Defensiva por Zona', figsize=(10, 6)
+        ), equipo_id=equipo_id)
 
 # Segunda fila: Datos y Análisis específicos del Jugador
+section("Jugador")
 st.markdown("---")
 st.header(f"Análisis del Jugador: {jugador_seleccionado if jugadores else ''}")
 
@@ -584,7 +367,7 @@ else:
         JOIN corners c ON pj.corner_id = c.id
         JOIN partidos p ON c.partido_id = p.id
         JOIN equipos e_rival ON c.equipo_id = e_rival.id
-        WHERE pj.jugador_id = ? AND pj.tipo = 'Defensivo'
+        WHERE pj.jugador_id = ? AND pj.tipo = 'Defensivo' AND c.borrado_en IS NULL
         ORDER BY p.fecha DESC
     """, (jugador_id,)).fetchall()
     conn.close()
@@ -595,6 +378,8 @@ else:
         # Convertir los datos a un DataFrame para facilitar análisis
         cols = ['corner_id', 'fecha', 'rival', 'minuto', 'tipo', 'resultado', 'x', 'y', 'rol', 'zona_caida', 'punto_caida']
         df_jugador = pd.DataFrame(posiciones_jugador, columns=cols)
+        df_jugador = categorize_columns(df_jugador, {'tipo': 'tipo_corner', 'resultado': 'resultado', 'rol': 'rol',
+                                                     'zona_caida': 'zona'})
         
         # Crear layout de dos columnas para gráficos del jugador
         col1_jugador, col2_jugador = st.columns(2)
@@ -604,41 +389,11 @@ else:
             st.subheader("Posiciones Defensivas en el Campo")
             
             # Crear gráfico de posiciones del jugador usando la función con imagen de fondo
-            fig, ax = create_field_plot()
-            
-            # Dibujar todas las posiciones del jugador
-            for _, row in df_jugador.iterrows():
-                # Transformar la coordenada y
-                y_transformada = 70 - row['y']  # Invertir el eje Y
-                
-                # Colores según resultado (invertidos respecto al análisis ofensivo - aquí rojo es malo defensivamente)
-                if row['resultado'] == 'Gol':
-                    color = 'red'  # Gol en contra - mal desempeño defensivo
-                    marker = 'o'
-                elif row['resultado'] in ['Remate a puerta', 'Remate fuera']:
-                    color = 'orange'  # Remate permitido - desempeño medio
-                    marker = '^'
-                else:
-                    color = 'green'  # Sin peligro - buen desempeño defensivo
-                    marker = 's'
-                
-                ax.scatter(row['x'], y_transformada, color=color, marker=marker, s=100, alpha=0.7)
-                
-                # Añadir número de minuto al lado de cada punto
-                ax.text(row['x']+1, y_transformada, f"{row['minuto']}", fontsize=8)
-            
-            # Leyenda
-            legend_elements = [
-                Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='Gol recibido'),
-                Line2D([0], [0], marker='^', color='w', markerfacecolor='orange', markersize=10, label='Remate permitido'),
-                Line2D([0], [0], marker='s', color='w', markerfacecolor='green', markersize=10, label='Corner neutralizado')
-            ]
-            ax.legend(handles=legend_elements, loc='upper right')
-            
-            # Configurar título y mostrar el gráfico
-            ax.set_title(f'Posiciones de {jugador_seleccionado} en Defensa')
-            fig.tight_layout()
-            st.pyplot(fig)
+            # (colores invertidos respecto al análisis ofensivo - aquí rojo es malo defensivamente)
+            charts.schedule('defensivo/jugador_posiciones', partial(build_player_positions_chart,
+                df_jugador, ('red', 'orange', 'green'), ('Gol recibido', 'Remate permitido', 'Corner neutralizado'),
+                f'Posiciones de {jugador_seleccionado} en Defensa'
+            ), equipo_id=equipo_id, jugador_id=jugador_id)
             
             # Datos adicionales
             st.markdown(f"**Total de corners defendidos:** {len(df_jugador)}")
@@ -662,100 +417,47 @@ else:
             st.subheader("Distribución de Roles Defensivos")
             
             # Contar frecuencia de roles
-            roles_count = df_jugador['rol'].value_counts().reset_index()
+            roles_count = observed_counts(df_jugador['rol']).reset_index()
             roles_count.columns = ['Rol', 'Cantidad']
             
-            # Crear gráfico de roles
-            fig, ax = plt.subplots(figsize=(8, 5))
-            
-            # Definir colores para roles específicos
-            colores_roles = {
-                'Zona': 'red',
-                'Al hombre': 'blue',
-                'Poste': 'yellow',
-                'Arriba': 'green'
-            }
-            
-            # Extraer colores en el orden de los roles del dataframe
-            colores = [colores_roles.get(rol, 'lightgray') for rol in roles_count['Rol']]
+            # Colores de los roles defensivos, indexados por el código de cada rol
+            colores = lookup_by_code(roles_count['Rol'], 'rol', COLORES_ROLES_POR_CODIGO['Defensivo'], 'lightgray').tolist()
             
             # Crear gráfico de barras
-            ax.bar(roles_count['Rol'], roles_count['Cantidad'], color=colores)
-            ax.set_ylabel('Cantidad')
-            ax.set_title(f'Roles Defensivos de {jugador_seleccionado.split(" - ")[1]}')
-            plt.xticks(rotation=45, ha='right')
-            fig.tight_layout()
-            st.pyplot(fig)
+            charts.schedule('defensivo/jugador_roles', partial(build_bar_chart,
+                roles_count['Rol'], roles_count['Cantidad'],
+                f'Roles Defensivos de {jugador_seleccionado.split(" - ")[1]}', colors=colores, figsize=(8, 5)
+            ), equipo_id=equipo_id, jugador_id=jugador_id)
             
             # Gráfico de distribución de resultados
             st.subheader("Resultados Defensivos")
             
             # Contar frecuencia de resultados
-            resultados_count = df_jugador['resultado'].value_counts().reset_index()
+            resultados_count = observed_counts(df_jugador['resultado']).reset_index()
             resultados_count.columns = ['Resultado', 'Cantidad']
             
-            fig, ax = plt.subplots(figsize=(8, 5))
-            # Definir colores para resultados
-            colores_resultados = {
-                'Gol': 'red',
-                'Remate a puerta': 'orange',
-                'Remate fuera': 'yellow',
-                'Despeje': 'lightgreen',
-                'Falta atacante': 'green',
-                'Falta defensiva': 'lightblue',
-                'Otro': 'lightgray'
-            }
-            
-            # Extraer colores en el orden de los resultados del dataframe
-            colores = [colores_resultados.get(res, 'lightgray') for res in resultados_count['Resultado']]
+            # Colores de los resultados en defensa, indexados por el código de cada resultado
+            colores = lookup_by_code(resultados_count['Resultado'], 'resultado', COLORES_RESULTADOS_DEFENSIVOS,
+                                     'lightgray').tolist()
             
             # Crear gráfico de barras
-            ax.bar(resultados_count['Resultado'], resultados_count['Cantidad'], color=colores)
-            ax.set_ylabel('Cantidad')
-            ax.set_title(f'Resultados Defensivos con {jugador_seleccionado.split(" - ")[1]}')
-            plt.xticks(rotation=45, ha='right')
-            fig.tight_layout()
-            st.pyplot(fig)
+            charts.schedule('defensivo/jugador_resultados', partial(build_bar_chart,
+                resultados_count['Resultado'], resultados_count['Cantidad'],
+                f'Resultados Defensivos con {jugador_seleccionado.split(" - ")[1]}', colors=colores, figsize=(8, 5)
+            ), equipo_id=equipo_id, jugador_id=jugador_id)
         
         # Gráfico de mapa de calor para zonas frecuentes
         if df_jugador.shape[0] >= 3:  # Solo si hay suficientes datos
             st.subheader("Mapa de Calor de Posicionamiento Defensivo")
             
-            # Crear nueva figura
-            fig, ax = plt.subplots(figsize=(10, 7))
-            
-            # Intentar cargar la imagen de fondo
-            try:
-                field_img = mpimg.imread('assets/mediocampo.jpg')
-                ax.imshow(field_img, extent=[0, 100, 0, 70], aspect='auto', alpha=0.6)
-            except:
-                # Si falla, usar un fondo verde simple
-                ax.set_facecolor('#78A64B')  # Verde césped
-                
             # Preparar los datos para el mapa de calor
             x = df_jugador['x'].values
             y = 70 - df_jugador['y'].values  # Invertir Y para coherencia
             
-            # Generar un mapa de calor 2D usando kernel density estimation
-            if len(x) > 1:
-                sns.kdeplot(
-                    x=x, 
-                    y=y, 
-                    cmap="Blues",  # Usar blues para defensa (distinto de ofensivo)
-                    fill=True,
-                    alpha=0.7,
-                    thresh=0,
-                    levels=10,
-                    ax=ax
-                )
-            
-            # Configuraciones adicionales
-            ax.set_xlim(0, 100)
-            ax.set_ylim(0, 70)
-            ax.set_title(f"Mapa de Calor: Zonas Defensivas de {jugador_seleccionado.split(' - ')[1]}")
-            ax.axis('off')
-            fig.tight_layout()
-            st.pyplot(fig)
+            # Usar blues para defensa (distinto de ofensivo)
+            charts.schedule('defensivo/jugador_calor', partial(build_heatmap_chart,
+                x, y, 'Blues', f"Mapa de Calor: Zonas Defensivas de {jugador_seleccionado.split(' - ')[1]}"
+            ), equipo_id=equipo_id, jugador_id=jugador_id)
             
             # Columnas para análisis adicionales
             col3_jugador, col4_jugador = st.columns(2)
@@ -766,7 +468,7 @@ else:
                 
                 if len(df_jugador['rival'].unique()) > 1:
                     # Agrupar por rival y resultado
-                    rival_results = df_jugador.groupby(['rival', 'resultado']).size().unstack(fill_value=0)
+                    rival_results = df_jugador.groupby(['rival', 'resultado'], observed=True).size().unstack(fill_value=0)
                     
                     # Calcular totales
                     rival_results['Total'] = rival_results.sum(axis=1)
@@ -787,31 +489,14 @@ else:
                     st.dataframe(rival_results)
                     
                     # Visualizar efectividad por rival
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    
-                    # Preparar datos para gráfico
                     rivales = rival_results.index
                     goles_pct = rival_results['% Goles recibidos'] if '% Goles recibidos' in rival_results.columns else [0] * len(rivales)
                     remates_pct = rival_results['% Remates'] if '% Remates' in rival_results.columns else [0] * len(rivales)
                     
-                    # Crear barras
-                    x = np.arange(len(rivales))
-                    width = 0.35
-                    
-                    ax.bar(x - width/2, goles_pct, width, label='% Goles recibidos', color='red')
-                    ax.bar(x + width/2, remates_pct, width, label='% Remates permitidos', color='orange')
-                    
-                    # Configurar eje X
-                    ax.set_xticks(x)
-                    ax.set_xticklabels(rivales, rotation=45, ha='right')
-                    
-                    # Añadir etiquetas y título
-                    ax.set_ylabel('Porcentaje %')
-                    ax.set_title(f'Efectividad contra Rivales')
-                    ax.legend()
-                    
-                    fig.tight_layout()
-                    st.pyplot(fig)
+                    charts.schedule('defensivo/jugador_rivales', partial(build_effectiveness_chart,
+                        rivales, goles_pct, remates_pct, ('% Goles recibidos', '% Remates permitidos'), ('red', 'orange'),
+                        'Efectividad contra Rivales'
+                    ), equipo_id=equipo_id, jugador_id=jugador_id)
                 else:
                     st.info("No hay suficientes rivales para mostrar comparativa.")
             
@@ -838,47 +523,11 @@ else:
                     lambda x: result_value.get(x, 0)
                 )
                 
-                # Crear índice ordenado para el eje X
-                df_chronological['indice'] = range(len(df_chronological))
-                
                 if len(df_chronological) > 1:
                     # Graficar tendencia de rendimiento
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    
-                    # Graficar línea de tendencia
-                    ax.plot(df_chronological['indice'], df_chronological['valor_resultado'], 
-                            'o-', color='blue', alpha=0.7, label='Rendimiento')
-                    
-                    # Añadir línea de tendencia (media móvil) si hay suficientes datos
-                    if len(df_chronological) > 2:
-                        window = min(3, len(df_chronological))
-                        df_chronological['tendencia'] = df_chronological['valor_resultado'].rolling(window=window, center=True).mean()
-                        ax.plot(df_chronological['indice'], df_chronological['tendencia'], 
-                                '-', color='red', linewidth=2, label=f'Tendencia (media móvil {window})')
-                    
-                    # Configurar etiquetas del eje X
-                    xticks = df_chronological['indice']
-                    xticklabels = [f"{r['fecha']}" for _, r in df_chronological.iterrows()]
-                    
-                    if len(xticks) > 8:  # Si hay muchas fechas, mostrar solo algunas
-                        step = len(xticks) // 6
-                        xticks = xticks[::step]
-                        xticklabels = xticklabels[::step]
-                    
-                    ax.set_xticks(xticks)
-                    ax.set_xticklabels(xticklabels, rotation=45, ha='right')
-                    
-                    # Añadir línea horizontal en 0
-                    ax.axhline(y=0, color='gray', linestyle='-', alpha=0.3)
-                    
-                    # Configurar límites y etiquetas
-                    ax.set_ylim(-3.5, 2.5)
-                    ax.set_ylabel('Rendimiento Defensivo')
-                    ax.set_title(f'Evolución del Rendimiento Defensivo')
-                    ax.legend()
-                    
-                    fig.tight_layout()
-                    st.pyplot(fig)
+                    charts.schedule('defensivo/jugador_tendencia', partial(build_trend_chart,
+                        df_chronological, (-3.5, 2.5), 'Rendimiento Defensivo', 'Evolución del Rendimiento Defensivo'
+                    ), equipo_id=equipo_id, jugador_id=jugador_id)
                 else:
                     st.info("Se necesitan más participaciones para analizar tendencias.")
                 
@@ -893,7 +542,7 @@ else:
                     JOIN corners c ON pj1.corner_id = c.id
                     JOIN posiciones_jugadores pj2 ON pj1.corner_id = pj2.corner_id AND pj1.jugador_id != pj2.jugador_id
                     JOIN jugadores j ON pj2.jugador_id = j.id
-                    WHERE pj1.jugador_id = ? AND pj1.tipo = 'Defensivo' AND pj2.tipo = 'Defensivo'
+                    WHERE pj1.jugador_id = ? AND pj1.tipo = 'Defensivo' AND pj2.tipo = 'Defensivo' AND c.borrado_en IS NULL
                     GROUP BY j.id, c.resultado
                     ORDER BY veces DESC
                 """, (jugador_id,)).fetchall()
@@ -934,4 +583,11 @@ else:
         df_display.columns = ['Fecha', 'Rival', 'Minuto', 'Tipo Corner', 'Resultado', 'Rol', 'Zona de Caída']
         
         # Mostrar los datos en una tabla interactiva
-        st.dataframe(df_display)
\ No newline at end of file
+        st.dataframe(df_display)
+        render_export('participacion_jugador', 'exportar_participacion', sufijo=str(jugador_id),
+                      jugador_id=jugador_id, tipo='Defensivo')
+
+# Esperar a que terminen los gráficos encargados y colocarlos en su hueco
+section("Espera de gráficos")
+charts.wait()
+end_rerun()
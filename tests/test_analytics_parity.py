@@ -0,0 +1,77 @@
+# Paridad de las consultas analíticas: cada entrada de utils.analytics.CONSULTAS debe dar lo mismo en SQLite
+# que en DuckDB, leyendo el fichero SQLite adjunto y leyendo los snapshots Parquet. Los datos son una liga
+# sintética pequeña (utils.synthetic) creada en un directorio temporal.
+# Uso: python -m pytest tests [-rs para ver el motivo de cada caso saltado]
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from utils import db, query_log  # noqa: E402
+from utils.analytics import COLUMNAS, CONSULTAS, _valores_iguales, compare_query, run_analytic_query  # noqa: E402
+from utils.db import DB_PATH, FORMA_TUPLAS, execute_query, get_duckdb_connection  # noqa: E402
+from utils.synthetic import generate_league  # noqa: E402
+
+# Motivo de cada origen cuando DuckDB no lo puede abrir
+MOTIVOS = {
+    'sqlite': "DuckDB no puede adjuntar el fichero SQLite: falta la extensión sqlite de DuckDB "
+              "(se descarga con INSTALL sqlite, que necesita red)",
+    'parquet': "DuckDB no puede leer los snapshots Parquet",
+}
+
+@pytest.fixture(scope='module')
+def liga(tmp_path_factory):
+    """Liga sintética de 4 equipos y 2 temporadas; las rutas de la aplicación son relativas al directorio actual"""
+    directorio = tmp_path_factory.mktemp('liga')
+    anterior = os.getcwd()
+    estadisticas = query_log.QUERY_STATS
+    os.chdir(directorio)
+    query_log.QUERY_STATS = False
+    try:
+        generate_league(DB_PATH, equipos=4, temporadas=2, semilla=0)
+        yield directorio
+    finally:
+        query_log.QUERY_STATS = estadisticas
+        os.chdir(anterior)
+
+def _preparar_origen(origen):
+    """Exporta los snapshots si el origen es Parquet; se salta si falta pyarrow"""
+    if origen == 'parquet':
+        pytest.importorskip('pyarrow', reason="los snapshots Parquet necesitan pyarrow")
+        from utils.snapshots import export_snapshot
+
+        export_snapshot()
+
+@pytest.fixture(scope='module', params=['sqlite', 'parquet'])
+def origen(request, liga):
+    """Origen de datos de DuckDB; se salta si DuckDB no está instalado o no puede abrirlo"""
+    pytest.importorskip('duckdb', reason="DuckDB es opcional")
+    _preparar_origen(request.param)
+    cursor = get_duckdb_connection(request.param)
+    if cursor is None:
+        pytest.skip(MOTIVOS[request.param])
+    cursor.close()
+    return request.param
+
+@pytest.mark.parametrize('nombre', sorted(CONSULTAS))
+def test_sqlite_y_duckdb_dan_lo_mismo(origen, nombre):
+    assert compare_query(nombre, origen) is None
+
+# El enrutado por clase de consulta corre con cualquier instalación: usa DuckDB si puede abrir el
+# origen y, si no (sin DuckDB o sin la extensión sqlite), vuelve a SQLite; en ambos casos el resultado
+# tiene que ser el de SQLite
+@pytest.mark.parametrize('origen_enrutado', ['sqlite', 'parquet'])
+@pytest.mark.parametrize('nombre', sorted(CONSULTAS))
+def test_run_analytic_query_da_lo_mismo_que_sqlite(liga, monkeypatch, origen_enrutado, nombre):
+    _preparar_origen(origen_enrutado)
+    monkeypatch.setattr(db, 'ANALYTICS_SOURCE', origen_enrutado)
+    esperado = execute_query(CONSULTAS[nombre], forma=FORMA_TUPLAS)
+    obtenido = run_analytic_query(nombre)
+    assert list(obtenido.columns) == COLUMNAS[nombre]
+    assert len(obtenido) == len(esperado)
+    for fila_sqlite, fila in zip(esperado, obtenido.itertuples(index=False)):
+        assert all(_valores_iguales(a, b) for a, b in zip(fila_sqlite, fila)), (fila_sqlite, tuple(fila))
@@ -0,0 +1,128 @@
+# Consultas analíticas de toda la liga (todas las temporadas y equipos). run_analytic_query las ejecuta
+# con la clase QUERY_ANALITICA, de modo que van a DuckDB cuando está disponible y a SQLite en caso contrario.
+# Comprobación de paridad entre motores: python -m utils.analytics [--origen sqlite|parquet]
+import argparse
+import math
+import sys
+
+from utils.db import FORMA_DATAFRAME, QUERY_ANALITICA, execute_query, execute_duckdb_query
+
+# Solo SQL común a SQLite y DuckDB: todas las columnas no agregadas en el GROUP BY, sin divisiones
+# enteras (los porcentajes se calculan en pandas) y con ORDER BY completo para que el orden coincida
+CONSULTAS = {
+    'efectividad_zonas': """
+        SELECT c.zona_caida AS zona,
+               COUNT(*) AS corners,
+               SUM(CASE WHEN c.resultado = 'Gol' THEN 1 ELSE 0 END) AS goles,
+               SUM(CASE WHEN c.resultado IN ('Remate a puerta', 'Remate fuera') THEN 1 ELSE 0 END) AS remates
+        FROM corners c
+        WHERE c.borrado_en IS NULL AND c.zona_caida IS NOT NULL AND c.zona_caida != ''
+        GROUP BY c.zona_caida
+        ORDER BY c.zona_caida
+    """,
+    'efectividad_zonas_equipo': """
+        SELECT c.equipo_id, c.tipo, c.zona_caida AS zona,
+               COUNT(*) AS corners,
+               SUM(CASE WHEN c.resultado = 'Gol' THEN 1 ELSE 0 END) AS goles,
+               SUM(CASE WHEN c.resultado IN ('Remate a puerta', 'Remate fuera') THEN 1 ELSE 0 END) AS remates
+        FROM corners c
+        WHERE c.borrado_en IS NULL AND c.zona_caida IS NOT NULL AND c.zona_caida != ''
+        GROUP BY c.equipo_id, c.tipo, c.zona_caida
+        ORDER BY c.equipo_id, c.tipo, c.zona_caida
+    """,
+    'promedios_rol_jugador': """
+        SELECT pj.jugador_id, pj.tipo, pj.rol, substr(p.fecha, 1, 4) AS temporada,
+               COUNT(*) AS veces, AVG(pj.x) AS x_prom, AVG(pj.y) AS y_prom
+        FROM posiciones_jugadores pj
+        JOIN corners c ON pj.corner_id = c.id
+        JOIN partidos p ON c.partido_id = p.id
+        WHERE c.borrado_en IS NULL
+        GROUP BY pj.jugador_id, pj.tipo, pj.rol, substr(p.fecha, 1, 4)
+        ORDER BY pj.jugador_id, pj.tipo, pj.rol, temporada
+    """,
+    'resultados_temporada': """
+        SELECT c.equipo_id, substr(p.fecha, 1, 4) AS temporada, c.resultado, COUNT(*) AS cantidad
+        FROM corners c
+        JOIN partidos p ON c.partido_id = p.id
+        WHERE c.borrado_en IS NULL
+        GROUP BY c.equipo_id, substr(p.fecha, 1, 4), c.resultado
+        ORDER BY c.equipo_id, temporada, c.resultado
+    """,
+}
+
+COLUMNAS = {
+    'efectividad_zonas': ['zona', 'corners', 'goles', 'remates'],
+    'efectividad_zonas_equipo': ['equipo_id', 'tipo', 'zona', 'corners', 'goles', 'remates'],
+    'promedios_rol_jugador': ['jugador_id', 'tipo', 'rol', 'temporada', 'veces', 'x_prom', 'y_prom'],
+    'resultados_temporada': ['equipo_id', 'temporada', 'resultado', 'cantidad'],
+}
+
+def run_analytic_query(nombre, params=()):
+    """Ejecuta una de las consultas analíticas y devuelve un DataFrame"""
+    return execute_query(CONSULTAS[nombre], params, query_class=QUERY_ANALITICA,
+                         forma=FORMA_DATAFRAME, columnas=COLUMNAS[nombre])
+
+def _valores_iguales(a, b, tolerancia=1e-9):
+    """Compara dos valores; los reales con tolerancia relativa (el orden de suma de AVG puede variar)"""
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is b
+        return math.isclose(float(a), float(b), rel_tol=tolerancia, abs_tol=tolerancia)
+    return a == b
+
+def compare_query(nombre, source=None):
+    """
+    Ejecuta una consulta analítica en SQLite y en DuckDB y describe la primera diferencia (None si dan lo
+    mismo). DuckDB no disponible para ese origen también cuenta como diferencia.
+    """
+    query = CONSULTAS[nombre]
+    esperado = execute_query(query, as_dict=False)
+    resultado = execute_duckdb_query(query, source=source)
+    if resultado is None:
+        return "DuckDB no pudo ejecutar la consulta"
+
+    obtenido = resultado[0]
+    if len(esperado) != len(obtenido):
+        return f"{len(esperado)} filas en SQLite y {len(obtenido)} en DuckDB"
+
+    for i, (fila_sqlite, fila_duckdb) in enumerate(zip(esperado, obtenido)):
+        if len(fila_sqlite) != len(fila_duckdb) or not all(
+            _valores_iguales(a, b) for a, b in zip(fila_sqlite, fila_duckdb)
+        ):
+            return f"fila {i}: SQLite {fila_sqlite} / DuckDB {fila_duckdb}"
+    return None
+
+def check_parity(source=None):
+    """Ejecuta cada consulta analítica en SQLite y en DuckDB y devuelve las diferencias encontradas"""
+    diferencias = {}
+    for nombre in CONSULTAS:
+        diferencia = compare_query(nombre, source)
+        if diferencia is not None:
+            diferencias[nombre] = diferencia
+    return diferencias
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comprueba que DuckDB y SQLite devuelven lo mismo")
+    parser.add_argument('--origen', choices=['sqlite', 'parquet'], default=None,
+                        help="Origen de datos de DuckDB (por defecto CORNERS_ANALYTICS_SOURCE)")
+    args = parser.parse_args(argv)
+
+    if args.origen == 'parquet':
+        # Los snapshots tienen que estar al día para poder comparar
+        from utils.snapshots import export_snapshot
+        export_snapshot()
+
+    from utils.db import get_duckdb_connection
+    cursor = get_duckdb_connection(args.origen)
+    if cursor is None:
+        print("DuckDB no está disponible para este origen; las consultas analíticas usan SQLite.")
+        return 2
+    cursor.close()
+
+    diferencias = check_parity(args.origen)
+    for nombre in CONSULTAS:
+        print(f"{nombre}: {'DIFERENTE - ' + diferencias[nombre] if nombre in diferencias else 'OK'}")
+    return 1 if diferencias else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,40 +1,329 @@
+import base64
 import hashlib
+import hmac
+import json
+import os
+import secrets
 import sqlite3
+import threading
+import time
+from http.cookies import CookieError, SimpleCookie
+
 from utils.db import get_db_connection
+from utils.tenancy import club_slug, set_tenant
+
+# Sesiones firmadas: al iniciar sesión se emite un token (usuario, caducidad y firma HMAC) que se guarda
+# en la sesión de Streamlit y en una cookie del navegador (SameSite=Strict), así que una pestaña nueva no
+# tiene que volver a iniciar sesión. El token no va nunca en la URL: quedaría en el historial, en los
+# enlaces copiados y en las capturas. Validar un token es comprobar la firma y mirar un diccionario en
+# memoria; las credenciales se cargan de SQLite de una vez y se reutilizan durante USUARIOS_TTL segundos.
+# Los usuarios viven siempre en la base principal; su club decide qué base de datos ven (utils/tenancy.py).
+SESION_TTL = float(os.environ.get('CORNERS_SESSION_TTL_H', '12')) * 3600
+USUARIOS_TTL = float(os.environ.get('CORNERS_USERS_TTL', '60'))
+CLAVE_PATH = 'data/.session_key'
+PARAMETRO_SESION = 'sesion'  # versiones anteriores dejaban el token en la URL; se borra si aparece
+COOKIE_SESION = 'corners_sesion'
+
+_lock = threading.Lock()
+_lock_clave = threading.Lock()
+_usuarios = {'datos': None, 'cargado': 0.0}  # {username: (id, hash, club)} y cuándo se leyó
+_sesiones = {}   # token -> (username, caduca): tokens ya validados
+_revocados = {}  # token -> caduca: sesiones cerradas antes de caducar
+_clave = None
 
 def make_hashed_password(password):
     """Crea un hash para la contraseña"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+def _clave_firma():
+    """Clave de firma: CORNERS_SESSION_KEY o una aleatoria guardada en data/ (sobrevive a reinicios)"""
+    global _clave
+    if _clave is None:
+        with _lock_clave:
+            if _clave is None:
+                clave = os.environ.get('CORNERS_SESSION_KEY')
+                if clave:
+                    _clave = clave.encode()
+                else:
+                    _clave = _leer_o_crear_clave()
+    return _clave
+
+def _leer_o_crear_clave():
+    """Lee la clave de data/ o la crea legible solo por el propietario (0600)"""
+    os.makedirs(os.path.dirname(CLAVE_PATH), exist_ok=True)
+    clave = secrets.token_hex(32).encode()
+    try:
+        # O_EXCL: si otro proceso la crea a la vez, se usa la suya
+        fd = os.open(CLAVE_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        try:
+            # Las versiones anteriores la creaban legible para todos
+            os.chmod(CLAVE_PATH, 0o600)
+        except OSError:
+            pass
+        with open(CLAVE_PATH, 'rb') as f:
+            return f.read().strip()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(clave)
+    return clave
+
+def _usuarios_vigentes():
+    """
+    Credenciales en memoria. Solo un hilo las recarga cuando caducan; el resto usa la copia anterior
+    (o espera a la primera carga), así que una ráfaga de inicios de sesión hace una única consulta.
+    """
+    datos = _usuarios['datos']
+    if datos is not None and time.monotonic() - _usuarios['cargado'] < USUARIOS_TTL:
+        return datos
+    if datos is not None and not _lock.acquire(blocking=False):
+        return datos
+    if datos is None:
+        _lock.acquire()
+    try:
+        if _usuarios['datos'] is None or time.monotonic() - _usuarios['cargado'] >= USUARIOS_TTL:
+            conn = get_db_connection(principal=True)
+            try:
+                filas = _leer_usuarios(conn)
+            finally:
+                conn.close()
+            _usuarios['datos'] = {username: (id_, password, club) for id_, username, password, club in filas}
+            _usuarios['cargado'] = time.monotonic()
+        return _usuarios['datos']
+    finally:
+        _lock.release()
+
+def _leer_usuarios(conn):
+    try:
+        return conn.execute("SELECT id, username, password, club FROM usuarios").fetchall()
+    except sqlite3.OperationalError:
+        # Base de datos anterior a los clubes: se añade la columna (NULL = base principal)
+        conn.execute("ALTER TABLE usuarios ADD COLUMN club TEXT")
+        conn.commit()
+        return conn.execute("SELECT id, username, password, club FROM usuarios").fetchall()
+
+def preload_users():
+    """Carga las credenciales en memoria antes del primer inicio de sesión; devuelve cuántos usuarios hay"""
+    return len(_usuarios_vigentes())
+
+def invalidate_users():
+    """Fuerza a leer de nuevo los usuarios en el próximo inicio de sesión"""
+    _usuarios['cargado'] = 0.0
+
 def login_user(username, password):
     """Verifica las credenciales del usuario"""
     if not username or not password:
         return False
-    
-    hashed_password = make_hashed_password(password)
-    
-    conn = get_db_connection()
-    user = conn.execute("SELECT * FROM usuarios WHERE username = ? AND password = ?", 
-                      (username, hashed_password)).fetchone()
-    conn.close()
-    
-    return user is not None
-
-def register_user(username, password):
+
+    usuario = _usuarios_vigentes().get(username)
+    if usuario is None:
+        return False
+    return hmac.compare_digest(usuario[1], make_hashed_password(password))
+
+def user_club(username):
+    """Club del usuario (None si usa la base principal o no existe)"""
+    usuario = _usuarios_vigentes().get(username) if username else None
+    return usuario[2] if usuario is not None else None
+
+def register_user(username, password, club=None):
     """Registra un nuevo usuario"""
     if not username or not password:
         return False
-    
+
     hashed_password = make_hashed_password(password)
-    
-    conn = get_db_connection()
+
+    conn = get_db_connection(principal=True)
     try:
-        conn.execute("INSERT INTO usuarios (username, password) VALUES (?, ?)", 
-                   (username, hashed_password))
+        conn.execute("INSERT INTO usuarios (username, password, club) VALUES (?, ?, ?)",
+                   (username, hashed_password, club_slug(club) if club else None))
         conn.commit()
+        invalidate_users()
         return True
     except sqlite3.IntegrityError:
         # El nombre de usuario ya existe
         return False
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def assign_club(username, club):
+    """Asigna un usuario a un club (None: base principal); devuelve False si el usuario no existe"""
+    conn = get_db_connection(principal=True)
+    try:
+        _leer_usuarios(conn)
+        cursor = conn.execute("UPDATE usuarios SET club = ? WHERE username = ?",
+                              (club_slug(club) if club else None, username))
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_users()
+    return cursor.rowcount > 0
+
+def users_by_club():
+    """Usuarios agrupados por club ({club o None: [usernames]})"""
+    clubes = {}
+    for username, (_, _, club) in sorted(_usuarios_vigentes().items()):
+        clubes.setdefault(club, []).append(username)
+    return clubes
+
+def _b64(datos):
+    return base64.urlsafe_b64encode(datos).rstrip(b'=').decode('ascii')
+
+def _firmar(cuerpo):
+    return _b64(hmac.new(_clave_firma(), cuerpo.encode('ascii'), hashlib.sha256).digest())
+
+def issue_token(username, ttl=SESION_TTL):
+    """Token de sesión firmado: usuario.caducidad.firma"""
+    caduca = int(time.time() + ttl)
+    cuerpo = f"{_b64(username.encode('utf-8'))}.{caduca}"
+    token = f"{cuerpo}.{_firmar(cuerpo)}"
+    _sesiones[token] = (username, caduca)
+    return token
+
+def _podar(ahora):
+    for tabla in (_sesiones, _revocados):
+        for token, valor in list(tabla.items()):
+            if (valor[1] if isinstance(valor, tuple) else valor) <= ahora:
+                tabla.pop(token, None)
+
+def validate_token(token):
+    """Usuario del token si es válido (firma, caducidad, no revocado y el usuario existe); si no, None"""
+    if not token:
+        return None
+    ahora = time.time()
+    sesion = _sesiones.get(token)
+    if sesion is not None:
+        # El usuario puede haberse borrado después de validar el token
+        if sesion[1] > ahora and sesion[0] in _usuarios_vigentes():
+            return sesion[0]
+        _sesiones.pop(token, None)
+        return None
+    if token in _revocados:
+        return None
+    # Token emitido por otro proceso o antes de un reinicio: se comprueba la firma una vez
+    try:
+        usuario_b64, caduca, firma = token.split('.')
+        caduca = int(caduca)
+        username = base64.urlsafe_b64decode(usuario_b64 + '=' * (-len(usuario_b64) % 4)).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if caduca <= ahora or not hmac.compare_digest(firma, _firmar(f"{usuario_b64}.{caduca}")):
+        return None
+    if username not in _usuarios_vigentes():
+        return None
+    if len(_sesiones) > 1000:
+        _podar(ahora)
+    _sesiones[token] = (username, caduca)
+    return username
+
+def revoke_token(token):
+    """Invalida un token antes de su caducidad (cerrar sesión)"""
+    sesion = _sesiones.pop(token, None)
+    if sesion is not None:
+        _revocados[token] = sesion[1]
+    else:
+        try:
+            _revocados[token] = int(token.split('.')[1])
+        except (AttributeError, IndexError, ValueError):
+            pass
+
+def start_session(username):
+    """Marca la sesión de Streamlit como iniciada; la cookie se escribe en la siguiente ejecución"""
+    import streamlit as st
+
+    token = issue_token(username)
+    st.session_state.logged_in = True
+    st.session_state.username = username
+    st.session_state.token = token
+    st.session_state.cookie_pendiente = token
+    return token
+
+def end_session():
+    """Cierra la sesión de Streamlit y revoca su token"""
+    import streamlit as st
+
+    revoke_token(st.session_state.get('token'))
+    st.session_state.logged_in = False
+    st.session_state.username = None
+    st.session_state.token = None
+    st.session_state.cookie_pendiente = ''
+    set_tenant(None)
+
+def _token_cookie():
+    """Token de la cookie que el navegador envió al abrir la conexión de esta sesión (None si no hay)"""
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+
+        cabeceras = _get_websocket_headers() or {}
+    except (ImportError, RuntimeError):
+        # Sin servidor (AppTest, scripts) no hay cabeceras
+        return None
+    try:
+        cookie = SimpleCookie(cabeceras.get('Cookie', ''))
+    except CookieError:
+        return None
+    return cookie[COOKIE_SESION].value if COOKIE_SESION in cookie else None
+
+def _escribir_cookie(token):
+    """Guarda el token en la cookie del navegador ('' la borra); el iframe del componente comparte el origen"""
+    import streamlit.components.v1 as components
+
+    edad = int(SESION_TTL) if token else 0
+    components.html(
+        "<script>document.cookie = " + json.dumps(f"{COOKIE_SESION}={token}; Max-Age={edad}; Path=/; SameSite=Strict")
+        + " + (location.protocol === 'https:' ? '; Secure' : '');</script>",
+        height=0,
+    )
+
+def _sesion_activa(estado, token_cookie):
+    """
+    Comprueba la sesión: la recupera a partir de la cookie (pestañas nuevas) y la cierra si su token ha
+    caducado, se ha revocado o su usuario ya no existe
+    """
+    token = estado.get('token')
+    if estado.get('logged_in'):
+        if token is None:
+            if estado.get('username') in _usuarios_vigentes():
+                return True
+        elif validate_token(token) is not None:
+            return True
+        estado.logged_in = False
+        estado.username = None
+        estado.token = None
+    token = token_cookie
+    username = validate_token(token)
+    if username is None:
+        return False
+    estado.logged_in = True
+    estado.username = username
+    estado.token = token
+    return True
+
+def current_user():
+    """
+    Usuario de la sesión de Streamlit o None. Fija además el club de la ejecución, de modo que las
+    consultas posteriores van a la base de datos del club del usuario.
+    """
+    import streamlit as st
+
+    estado = st.session_state
+    if PARAMETRO_SESION in st.query_params:
+        del st.query_params[PARAMETRO_SESION]
+    activa = _sesion_activa(estado, _token_cookie())
+    pendiente = estado.get('cookie_pendiente')
+    if pendiente is not None:
+        _escribir_cookie(pendiente)
+        estado.cookie_pendiente = None
+    username = estado.get('username') if activa else None
+    club = user_club(username)
+    set_tenant(club)
+    estado.club = club
+    return username
+
+def require_login(mensaje="Por favor, inicia sesión primero."):
+    """Guarda de las páginas: devuelve el usuario o muestra el aviso y detiene la página"""
+    import streamlit as st
+
+    username = current_user()
+    if not st.session_state.get('logged_in'):
+        st.warning(mensaje)
+        st.stop()
+    return username
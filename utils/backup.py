@@ -0,0 +1,286 @@
+# Copias de seguridad en caliente de la base de datos con la API de backup de SQLite. La copia avanza por
+# pasos de PAGINAS páginas; entre paso y paso se suelta el bloqueo de lectura, así que quien esté
+# registrando corners durante un partido puede escribir mientras tanto (SQLite reinicia la copia si la
+# base cambia a medias, de modo que el resultado es siempre un estado coherente). La copia se escribe en
+# un temporal, se comprueba y se renombra: nunca queda un fichero a medias en data/backups/.
+# Las copias son incrementales en el sentido de que solo se hace una nueva si la base de datos ha cambiado
+# desde la anterior, y se podan con una política de retención (las últimas, una por día y una por semana).
+# Uso: python -m utils.backup crear [--club CLUB | --todos] | listar [--club CLUB] | podar [--todos]
+#      | restaurar <copia> [--club CLUB]
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from utils.db import database_path, get_data_version, get_db_connection
+from utils.tenancy import current_tenant, list_tenants, tenant_path, use_tenant
+
+BACKUP_DIR = os.path.join('data', 'backups')
+MANIFEST = 'backups.json'
+MANIFEST_VERSION = 1
+PREFIJO = 'corners-'
+
+# Páginas copiadas por paso y pausa entre pasos o mientras la base está bloqueada (segundos)
+PAGINAS = 256
+PAUSA = 0.02
+# Retención: las N copias más recientes, la última de cada uno de los D últimos días y la última de cada
+# una de las S últimas semanas
+RETENER_RECIENTES = int(os.environ.get('CORNERS_BACKUP_KEEP', '24'))
+RETENER_DIAS = int(os.environ.get('CORNERS_BACKUP_DAYS', '7'))
+RETENER_SEMANAS = int(os.environ.get('CORNERS_BACKUP_WEEKS', '8'))
+# Cada cuántos minutos hace copia el hilo del servidor (0 lo desactiva)
+INTERVALO_MIN = float(os.environ.get('CORNERS_BACKUP_INTERVAL_MIN', '60'))
+
+_hilo = {'hilo': None}
+_hilo_lock = threading.Lock()
+# Una sola copia o restauración a la vez en el proceso
+_lock = threading.Lock()
+
+def backup_dir():
+    """Directorio de copias del club actual (o de la base principal)"""
+    return tenant_path(BACKUP_DIR)
+
+def load_manifest(destino=None):
+    """Copias registradas, de la más antigua a la más reciente (lista vacía si no hay ninguna)"""
+    destino = destino or backup_dir()
+    try:
+        with open(os.path.join(destino, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return manifest['copias'] if manifest.get('version') == MANIFEST_VERSION else []
+
+def _guardar_manifest(copias, destino):
+    temporal = os.path.join(destino, MANIFEST + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'copias': copias}, f, indent=1)
+    os.replace(temporal, os.path.join(destino, MANIFEST))
+
+def _comprobar(ruta):
+    """quick_check de un fichero de copia; devuelve 'ok' o los mensajes de error"""
+    conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    try:
+        mensajes = [fila[0] for fila in conn.execute("PRAGMA quick_check(5)")]
+    finally:
+        conn.close()
+    return 'ok' if mensajes == ['ok'] else '; '.join(mensajes)
+
+def _copiar(origen, destino, paginas, pausa):
+    """Copia una conexión en otra por pasos, con una pausa tras cada uno; devuelve los pasos dados"""
+    pasos = [0]
+
+    def progreso(estado, restantes, total):
+        # Entre pasos no se tiene ningún bloqueo: la pausa deja hueco a las escrituras de las páginas.
+        # Tras un paso ocupado (BUSY/LOCKED) ya espera backup() con sleep, así que aquí no se repite.
+        pasos[0] += 1
+        if restantes and estado == sqlite3.SQLITE_OK:
+            time.sleep(pausa)
+
+    origen.backup(destino, pages=paginas, progress=progreso, sleep=pausa)
+    return pasos[0]
+
+def create_backup(forzar=False, paginas=PAGINAS, pausa=PAUSA, podar=True):
+    """
+    Copia en caliente la base de datos del club actual (o la principal) si ha cambiado desde la última
+    copia (o siempre con forzar=True) y aplica la retención salvo con podar=False. Devuelve la entrada
+    del manifiesto o None si no hacía falta.
+    """
+    destino = backup_dir()
+    with _lock:
+        copias = load_manifest(destino)
+        if not os.path.exists(database_path()):
+            return None
+        data_version = get_data_version()
+        if copias and copias[-1]['data_version'] == data_version and not forzar:
+            return None
+
+        os.makedirs(destino, exist_ok=True)
+        ahora = datetime.datetime.now()
+        archivo = f"{PREFIJO}{ahora:%Y%m%d-%H%M%S-%f}.db"
+        ruta = os.path.join(destino, archivo)
+        temporal = ruta + '.tmp'
+        inicio = time.perf_counter()
+        origen = get_db_connection()
+        copia = sqlite3.connect(temporal)
+        try:
+            pasos = _copiar(origen, copia, paginas, pausa)
+        except sqlite3.Error:
+            copia.close()
+            os.remove(temporal)
+            raise
+        finally:
+            origen.close()
+        copia.close()
+        resultado = _comprobar(temporal)
+        if resultado != 'ok':
+            os.remove(temporal)
+            raise RuntimeError(f"La copia no supera la comprobación de integridad: {resultado}")
+        os.replace(temporal, ruta)
+
+        entrada = {
+            'archivo': archivo,
+            'fecha': ahora.isoformat(timespec='seconds'),
+            'data_version': data_version,
+            'bytes': os.path.getsize(ruta),
+            'pasos': pasos,
+            'duracion_s': round(time.perf_counter() - inicio, 2),
+        }
+        copias.append(entrada)
+        _guardar_manifest(copias, destino)
+    if podar:
+        prune_backups()
+    return entrada
+
+def retained(copias, ahora=None, recientes=RETENER_RECIENTES, dias=RETENER_DIAS, semanas=RETENER_SEMANAS):
+    """Nombres de las copias que conserva la política de retención"""
+    ahora = ahora or datetime.datetime.now()
+    ordenadas = sorted(copias, key=lambda c: c['fecha'], reverse=True)
+    conservar = {c['archivo'] for c in ordenadas[:recientes]}
+    dias_vistos, semanas_vistas = set(), set()
+    for copia in ordenadas:
+        fecha = datetime.datetime.fromisoformat(copia['fecha'])
+        antiguedad = (ahora.date() - fecha.date()).days
+        if antiguedad < dias and fecha.date() not in dias_vistos:
+            dias_vistos.add(fecha.date())
+            conservar.add(copia['archivo'])
+        semana = fecha.isocalendar()[:2]
+        if antiguedad < semanas * 7 and semana not in semanas_vistas:
+            semanas_vistas.add(semana)
+            conservar.add(copia['archivo'])
+    return conservar
+
+def prune_backups(ahora=None):
+    """Borra las copias que la política de retención ya no conserva; devuelve sus nombres"""
+    destino = backup_dir()
+    with _lock:
+        copias = load_manifest(destino)
+        conservar = retained(copias, ahora)
+        borradas = [c['archivo'] for c in copias if c['archivo'] not in conservar]
+        for archivo in borradas:
+            try:
+                os.remove(os.path.join(destino, archivo))
+            except FileNotFoundError:
+                pass
+        if borradas:
+            _guardar_manifest([c for c in copias if c['archivo'] in conservar], destino)
+    return borradas
+
+def restore_backup(archivo, paginas=PAGINAS, pausa=PAUSA):
+    """
+    Restaura una copia sobre la base de datos del club actual (o la principal). Antes se hace una copia
+    del estado actual, así que una restauración también se puede deshacer. La copia se vuelca con la API
+    de backup sobre la base en uso, de modo que las conexiones abiertas ven el contenido nuevo sin
+    reiniciar. Devuelve el nombre de la copia del estado previo (None si la base aún no existía).
+    """
+    destino = backup_dir()
+    ruta = archivo if os.path.isabs(archivo) or os.path.exists(archivo) else os.path.join(destino, archivo)
+    if not os.path.isfile(ruta):
+        raise FileNotFoundError(f"No existe la copia {archivo}")
+    resultado = _comprobar(ruta)
+    if resultado != 'ok':
+        raise RuntimeError(f"La copia no supera la comprobación de integridad: {resultado}")
+
+    # Sin podar: la retención podría borrar justo la copia que se va a restaurar; se aplica al terminar
+    previa = create_backup(forzar=True, paginas=paginas, pausa=pausa, podar=False)
+    with _lock:
+        origen = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+        conn = get_db_connection()
+        try:
+            _copiar(origen, conn, paginas, pausa)
+        finally:
+            origen.close()
+            conn.close()
+    # El almacén de posiciones y los snapshots suponen que las filas solo se añaden o se borran, así que
+    # tras una restauración se reconstruyen desde cero
+    from utils.compaction import refresh_derived
+
+    refresh_derived(completo=True)
+    prune_backups()
+    return previa['archivo'] if previa else None
+
+def backup_all(forzar=False):
+    """Copia de la base principal y de la de cada club; un fallo en una no detiene las demás"""
+    resultados = []
+    for club in [None] + list_tenants():
+        with use_tenant(club):
+            try:
+                resultados.append({'club': club, 'copia': create_backup(forzar)})
+            except (sqlite3.Error, OSError, RuntimeError) as e:
+                resultados.append({'club': club, 'error': str(e)})
+    return resultados
+
+def _bucle(intervalo):
+    while True:
+        time.sleep(intervalo)
+        backup_all()
+
+def start_backup_thread(intervalo_min=INTERVALO_MIN):
+    """Arranca (una vez por proceso) el hilo que hace copia cada intervalo; False si está desactivado"""
+    if intervalo_min <= 0:
+        return False
+    with _hilo_lock:
+        if _hilo['hilo'] is None:
+            _hilo['hilo'] = threading.Thread(target=_bucle, args=(intervalo_min * 60,), name='copias',
+                                             daemon=True)
+            _hilo['hilo'].start()
+    return True
+
+def _describir(resultado):
+    nombre = resultado['club'] or '(principal)'
+    if 'error' in resultado:
+        return f"{nombre}: error: {resultado['error']}"
+    copia = resultado['copia']
+    if copia is None:
+        return f"{nombre}: sin cambios desde la última copia"
+    return (f"{nombre}: {copia['archivo']} ({copia['bytes'] / 1024:.0f} KB, {copia['pasos']} pasos, "
+            f"{copia['duracion_s']}s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copias de seguridad en caliente de la base de datos")
+    ordenes = parser.add_subparsers(dest='orden', required=True)
+    crear = ordenes.add_parser('crear', help="Hace una copia si la base de datos ha cambiado")
+    crear.add_argument('--forzar', action='store_true', help="Copiar aunque no haya cambios")
+    listar = ordenes.add_parser('listar', help="Lista las copias")
+    podar = ordenes.add_parser('podar', help="Borra las copias que no conserva la política de retención")
+    restaurar = ordenes.add_parser('restaurar', help="Restaura una copia (antes copia el estado actual)")
+    restaurar.add_argument('copia', help="Nombre de la copia (ver listar) o ruta al fichero")
+    for orden in (crear, listar, podar, restaurar):
+        orden.add_argument('--club', help="Club (por defecto, la base principal)")
+    for orden in (crear, podar):
+        orden.add_argument('--todos', action='store_true', help="La base principal y todos los clubes")
+    args = parser.parse_args(argv)
+
+    clubes = [None] + list_tenants() if getattr(args, 'todos', False) else [args.club]
+    if args.orden == 'crear':
+        if getattr(args, 'todos', False):
+            resultados = backup_all(args.forzar)
+        else:
+            with use_tenant(args.club):
+                resultados = [{'club': current_tenant(), 'copia': create_backup(args.forzar)}]
+        for resultado in resultados:
+            print(_describir(resultado))
+        return 1 if any('error' in r for r in resultados) else 0
+    if args.orden == 'restaurar':
+        with use_tenant(args.club):
+            previa = restore_backup(args.copia)
+            print(f"Restaurada {args.copia} en {database_path()} (estado anterior guardado en {previa})")
+        return 0
+    for club in clubes:
+        with use_tenant(club):
+            nombre = current_tenant() or '(principal)'
+            if args.orden == 'podar':
+                borradas = prune_backups()
+                print(f"{nombre}: {len(borradas)} copias borradas")
+            else:
+                copias = load_manifest()
+                print(f"{nombre}: {len(copias)} copias en {backup_dir()}")
+                for copia in copias:
+                    print(f"  {copia['archivo']}  {copia['fecha']}  {copia['bytes'] / 1024:>8.0f} KB")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
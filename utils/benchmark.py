@@ -0,0 +1,276 @@
+# Banco de pruebas de escala: genera ligas sintéticas (utils.synthetic) de 1, 10 y 100 temporadas y mide
+# las consultas, el dibujado de gráficos y las páginas 3_corners, 4_analisis_ofensivo y 5_analisis_defensivo.
+# Uso: python -m utils.benchmark [--escalas 1 10 100] [--salida benchmark.json] [--comparar base.json]
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESCALAS = [1, 10, 100]
+EQUIPOS = 20
+REPETICIONES = 3
+BENCHMARK_VERSION = 1
+
+# Por debajo de este margen una diferencia se considera ruido al comparar con otra ejecución
+MARGEN_RUIDO_MS = 5.0
+
+def _resumen(tiempos):
+    return {
+        'min_ms': round(min(tiempos), 2),
+        'mediana_ms': round(statistics.median(tiempos), 2),
+        'max_ms': round(max(tiempos), 2),
+    }
+
+def _medir(funcion, repeticiones):
+    """Ejecuta funcion(i) varias veces y devuelve el mínimo, la mediana y el máximo en milisegundos"""
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return _resumen(tiempos)
+
+def _preparar_directorio(escala, semilla):
+    """Directorio de trabajo con data/corners.db sintética y los recursos de la aplicación"""
+    from utils.synthetic import generate_league
+
+    directorio = tempfile.mkdtemp(prefix=f"corners-bench-{escala}x-")
+    inicio = time.perf_counter()
+    filas = generate_league(os.path.join(directorio, 'data', 'corners.db'), EQUIPOS, escala, semilla)
+    generacion = time.perf_counter() - inicio
+    try:
+        os.symlink(os.path.join(RAIZ, 'assets'), os.path.join(directorio, 'assets'))
+    except OSError:
+        shutil.copytree(os.path.join(RAIZ, 'assets'), os.path.join(directorio, 'assets'))
+    return directorio, filas, generacion
+
+def _jugador_referencia(equipo_id):
+    """Jugador del equipo con más posiciones ofensivas (el caso más pesado de la vista de jugador)"""
+    from utils.db import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        fila = conn.execute("""
+            SELECT jugador_id FROM posiciones_jugadores
+            WHERE equipo_id = ? AND tipo = 'Ofensivo'
+            GROUP BY jugador_id ORDER BY COUNT(*) DESC LIMIT 1
+        """, (equipo_id,)).fetchone()
+    finally:
+        conn.close()
+    return fila[0] if fila else None
+
+def medir_consultas(equipo_id, jugador_id, repeticiones):
+    """Consultas de las páginas de análisis (utils.queries), siempre sin caché"""
+    from utils import queries
+
+    consultas = {
+        'get_equipos': lambda v: queries.get_equipos(v),
+        'get_jugadores_equipo': lambda v: queries.get_jugadores_equipo(equipo_id, v),
+        'contar_corners_equipo': lambda v: queries.contar_corners_equipo(equipo_id, v),
+        'get_resultados_equipo': lambda v: queries.get_resultados_equipo(equipo_id, v),
+        'get_zonas_equipo': lambda v: queries.get_zonas_equipo(equipo_id, v),
+        'get_tipo_zonas_equipo': lambda v: queries.get_tipo_zonas_equipo(equipo_id, v),
+        'get_posiciones_promedio_ofensivas': lambda v: queries.get_posiciones_promedio_ofensivas(equipo_id, v),
+        'get_puntos_caida_equipo': lambda v: queries.get_puntos_caida_equipo(equipo_id, v),
+        'get_posiciones_jugador_ofensivas': lambda v: queries.get_posiciones_jugador_ofensivas(jugador_id, v),
+        'get_combinaciones_ofensivas': lambda v: queries.get_combinaciones_ofensivas(jugador_id, v),
+    }
+    resultados = {}
+    for nombre, consulta in consultas.items():
+        # Una versión de datos distinta en cada repetición obliga a st.cache_data a ejecutar la consulta
+        resultados[f"consultas/{nombre}"] = _medir(lambda i: consulta(f"benchmark-{time.time_ns()}-{i}"), repeticiones)
+    return resultados
+
+def medir_graficos(equipo_id, jugador_id, repeticiones):
+    """Construcción y rasterizado a PNG de los gráficos del análisis ofensivo, con los datos de sus consultas"""
+    from utils import queries
+    from utils.chart_cache import figure_to_png
+    from utils.charts import (build_bar_chart, build_zone_arrows_chart, build_average_positions_chart,
+                              build_drop_points_chart, build_player_positions_chart, build_heatmap_chart)
+    from utils.render import release_figure
+
+    version = f"benchmark-{time.time_ns()}"
+    resultados_df = queries.get_resultados_equipo(equipo_id, version)
+    cz_df = queries.get_tipo_zonas_equipo(equipo_id, version)
+    pos_df = queries.get_posiciones_promedio_ofensivas(equipo_id, version)
+    puntos_df = queries.get_puntos_caida_equipo(equipo_id, version)
+    df_jugador = queries.get_posiciones_jugador_ofensivas(jugador_id, version)
+
+    graficos = {
+        'resultados': partial(build_bar_chart, resultados_df['Resultado'], resultados_df['Cantidad'], 'Resultados'),
+        'zonas': partial(build_zone_arrows_chart, cz_df, ('red', 'blue'), ('Derecha', 'Izquierda'), 'Zonas'),
+        'posiciones_promedio': partial(build_average_positions_chart, pos_df, 'Ofensivo', 'Posiciones'),
+        'puntos_caida': partial(build_drop_points_chart, puntos_df),
+        'jugador_posiciones': partial(build_player_positions_chart, df_jugador, ('green', 'red', 'blue'),
+                                      ('Gol', 'Remate', 'Otros'), 'Jugador'),
+        'jugador_calor': partial(build_heatmap_chart, df_jugador['x'].values, 70 - df_jugador['y'].values,
+                                 'hot', 'Mapa de calor'),
+    }
+
+    def rasterizar(build):
+        fig = build()
+        try:
+            figure_to_png(fig)
+        finally:
+            release_figure(fig)
+
+    return {f"graficos/{nombre}": _medir(lambda i: rasterizar(build), repeticiones)
+            for nombre, build in graficos.items()}
+
+def medir_paginas(repeticiones):
+    """Ejecución completa de las páginas con AppTest: en frío (sin cachés) y en caliente (recarga)"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {}
+    import streamlit as st
+    from utils.chart_cache import clear_chart_cache
+    from utils.synthetic import USUARIO_DEMO
+
+    def ejecutar(at):
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        # Sin título la página se ha quedado en el aviso de inicio de sesión y el tiempo no vale
+        if not at.title:
+            avisos = [w.value for w in at.warning]
+            raise RuntimeError(f"La página no se ha mostrado: {avisos[0] if avisos else 'sin contenido'}")
+
+    def nueva(pagina):
+        at = AppTest.from_file(os.path.join(RAIZ, 'pages', pagina), default_timeout=900)
+        # La guarda exige un usuario existente además de logged_in (ver utils/auth._sesion_activa)
+        at.session_state['logged_in'] = True
+        at.session_state['username'] = USUARIO_DEMO[0]
+        return at
+
+    resultados = {}
+    for pagina, secciones in (('3_corners.py', [None]),
+                              ('4_analisis_ofensivo.py', ["Resumen", "Zonas de caída", "Posicionamiento",
+                                                          "Puntos de caída", "Jugador"]),
+                              ('5_analisis_defensivo.py', [None])):
+        nombre = pagina[:-3]
+        for seccion in secciones:
+            clave = f"paginas/{nombre}" + (f"/{seccion}" if seccion else '')
+            frio, caliente = [], []
+            try:
+                for _ in range(repeticiones):
+                    st.cache_data.clear()
+                    clear_chart_cache()
+                    at = nueva(pagina)
+                    if seccion:
+                        at.session_state['seccion_ofensivo'] = seccion
+                    inicio = time.perf_counter()
+                    ejecutar(at)
+                    frio.append((time.perf_counter() - inicio) * 1000)
+                    inicio = time.perf_counter()
+                    ejecutar(at)
+                    caliente.append((time.perf_counter() - inicio) * 1000)
+            except Exception as e:
+                resultados[clave] = {'error': str(e)}
+                continue
+            resultados[f"{clave}/frio"] = _resumen(frio)
+            resultados[f"{clave}/caliente"] = _resumen(caliente)
+    return resultados
+
+def run_benchmark(escalas=ESCALAS, repeticiones=REPETICIONES, semilla=0, paginas=True):
+    """Ejecuta el banco de pruebas en cada escala y devuelve el informe (serializable a JSON)"""
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    # Las llamadas a st.cache_data fuera de una sesión avisan en cada consulta; Streamlit fija el nivel
+    # de cada uno de sus loggers, así que hay que bajarlos uno a uno
+    import streamlit  # noqa: F401
+    for nombre in list(logging.root.manager.loggerDict):
+        if nombre.startswith('streamlit'):
+            logging.getLogger(nombre).setLevel(logging.ERROR)
+    # Las consultas del banco de pruebas no deben mezclarse con las estadísticas de la aplicación
+    from utils import query_log
+    query_log.QUERY_STATS = False
+
+    informe = {
+        'version': BENCHMARK_VERSION,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'equipos': EQUIPOS,
+        'repeticiones': repeticiones,
+        'escalas': {},
+    }
+    directorio_original = os.getcwd()
+    for escala in escalas:
+        directorio, filas, generacion = _preparar_directorio(escala, semilla)
+        # Las rutas de la aplicación son relativas (data/corners.db, data/cache, assets)
+        os.chdir(directorio)
+        try:
+            equipo_id = 1
+            jugador_id = _jugador_referencia(equipo_id)
+            resultados = {}
+            resultados.update(medir_consultas(equipo_id, jugador_id, repeticiones))
+            resultados.update(medir_graficos(equipo_id, jugador_id, repeticiones))
+            if paginas:
+                resultados.update(medir_paginas(repeticiones))
+        finally:
+            os.chdir(directorio_original)
+            shutil.rmtree(directorio, ignore_errors=True)
+        informe['escalas'][str(escala)] = {
+            'filas': filas,
+            'generacion_s': round(generacion, 2),
+            'resultados': resultados,
+        }
+    return informe
+
+def compare_reports(actual, base, tolerancia=0.25):
+    """Lista de regresiones: medianas más lentas que la base en más de la tolerancia (y del margen de ruido)"""
+    regresiones = []
+    for escala, datos in actual['escalas'].items():
+        previos = base.get('escalas', {}).get(escala, {}).get('resultados', {})
+        for clave, medida in datos['resultados'].items():
+            previa = previos.get(clave)
+            if not previa or 'mediana_ms' not in previa or 'mediana_ms' not in medida:
+                continue
+            antes, ahora = previa['mediana_ms'], medida['mediana_ms']
+            if ahora > antes * (1 + tolerancia) and ahora - antes > MARGEN_RUIDO_MS:
+                regresiones.append({'escala': escala, 'medida': clave, 'base_ms': antes, 'actual_ms': ahora,
+                                    'cambio': round(ahora / antes - 1, 3) if antes else None})
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide consultas, gráficos y páginas con ligas sintéticas")
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS, help="Temporadas de cada escala")
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--sin-paginas', action='store_true', help="No ejecutar las páginas con AppTest")
+    parser.add_argument('--salida', default=None, help="Fichero JSON del informe (por defecto, salida estándar)")
+    parser.add_argument('--comparar', default=None, help="Informe JSON de referencia para detectar regresiones")
+    parser.add_argument('--tolerancia', type=float, default=0.25, help="Empeoramiento relativo admitido")
+    args = parser.parse_args(argv)
+
+    informe = run_benchmark(args.escalas, args.repeticiones, args.semilla, paginas=not args.sin_paginas)
+
+    codigo = 0
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        informe['regresiones'] = compare_reports(informe, base, args.tolerancia)
+        for r in informe['regresiones']:
+            print(f"REGRESIÓN {r['escala']}x {r['medida']}: {r['base_ms']} ms -> {r['actual_ms']} ms", file=sys.stderr)
+        codigo = 1 if informe['regresiones'] else 0
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+    return codigo
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# Arranque de la aplicación, una vez por proceso (st.cache_resource): crea la base de datos y sus tablas,
+# añade las columnas de corners que falten, comprueba los recursos gráficos y precarga lo que comparten
+# todas las sesiones; arranca además los hilos de compactación y de copias de seguridad. Las páginas
+# llaman a bootstrap() al principio y dan el entorno por listo; después de comprobar la sesión se prepara
+# además la base de datos del club del usuario (ver utils/tenancy.py).
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+import streamlit as st
+
+from utils.auth import preload_users
+from utils.backup import start_backup_thread
+from utils.compaction import start_compaction_thread
+from utils.categories import drop_lookup_tables
+from utils.db import (add_columns_to_corners_table, create_tables, get_data_version, get_db_connection,
+                      upgrade_foreign_keys)
+from utils.tenancy import current_tenant
+
+RECURSOS = {
+    'logo': 'assets/logo.png',
+    'banner': 'assets/banner.png',
+    'campo': 'assets/mediocampo.jpg',
+}
+ESTILOS_PATH = 'assets/estilos.css'
+
+def init_database():
+    """
+    Crea la base de datos del club actual (o la principal) con sus tablas (sin las antiguas tablas cat_*) y
+    las columnas zona_caida y punto_caida de corners, y migra las claves ajenas a borrado en cascada.
+    Devuelve (correcto, avisos): correcto es True si corners tiene ya zona_caida y punto_caida.
+    """
+    conn = get_db_connection()
+    try:
+        create_tables(conn)
+        drop_lookup_tables(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    correcto, mensaje = add_columns_to_corners_table()
+    avisos = [] if correcto else [mensaje]
+    try:
+        migracion = upgrade_foreign_keys()
+    except sqlite3.Error as e:
+        avisos.append(f"No se pudieron migrar las claves ajenas: {e}")
+    else:
+        if migracion['huerfanas']:
+            detalle = ', '.join(f"{filas} en {tabla}" for tabla, filas in migracion['huerfanas'].items())
+            avisos.append(f"Se han borrado filas que apuntaban a registros eliminados: {detalle}")
+    return correcto, avisos
+
+def check_assets():
+    """Indica qué recursos gráficos existen ({nombre: bool})"""
+    return {nombre: os.path.isfile(ruta) for nombre, ruta in RECURSOS.items()}
+
+def _leer_estilos():
+    try:
+        with open(ESTILOS_PATH, encoding='utf-8') as f:
+            return f"<style>\n{f.read()}</style>"
+    except OSError:
+        return ''
+
+@lru_cache(maxsize=1)
+def _imagen_campo():
+    from PIL import Image
+
+    with Image.open(RECURSOS['campo']) as imagen:
+        imagen.load()
+        return imagen.copy()
+
+def pitch_image():
+    """Copia de la imagen del campo (PIL) para dibujar encima; se decodifica una sola vez por proceso"""
+    return _imagen_campo().copy()
+
+def _precargar_imagenes():
+    # En segundo plano: la primera página se muestra sin esperar a matplotlib ni a PIL
+    from utils.visualization import load_field_image
+
+    load_field_image()
+    try:
+        _imagen_campo()
+    except OSError:
+        pass
+
+def _precargar_plantillas():
+    """Deja en la caché de consultas la lista de equipos y la plantilla de cada uno"""
+    from utils.queries import get_equipos, get_jugadores_equipo
+
+    version = get_data_version()
+    for equipo_id, _ in get_equipos(version):
+        get_jugadores_equipo(equipo_id, version)
+
+@st.cache_resource(show_spinner=False)
+def _bootstrap(directorio, club):
+    inicio = time.perf_counter()
+    columnas_corners_ok, avisos = init_database()
+    recursos = check_assets()
+    if recursos['campo']:
+        threading.Thread(target=_precargar_imagenes, name='precarga-campo', daemon=True).start()
+    # Credenciales en memoria: los inicios de sesión de la primera ráfaga no van a SQLite
+    preload_users()
+    # Purga de lo borrado y VACUUM incremental fuera de horas punta (CORNERS_COMPACTION_HOURS)
+    start_compaction_thread()
+    # Copias de seguridad en caliente cada CORNERS_BACKUP_INTERVAL_MIN minutos (solo si hay cambios)
+    start_backup_thread()
+    try:
+        _precargar_plantillas()
+    except Exception as e:
+        avisos.append(f"No se pudieron precargar las plantillas: {e}")
+    return {
+        'directorio': directorio,
+        'club': club,
+        'recursos': recursos,
+        'columnas_corners_ok': columnas_corners_ok,
+        'estilos': _leer_estilos(),
+        'avisos': avisos,
+        'duracion_ms': round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+def bootstrap():
+    """
+    Prepara el entorno la primera vez que se llama en el proceso y devuelve su estado: recursos
+    disponibles, hoja de estilos y avisos. Las rutas de la aplicación son relativas, así que se
+    prepara un entorno por directorio de trabajo y club.
+    """
+    return _bootstrap(os.getcwd(), current_tenant())
@@ -0,0 +1,73 @@
+# Catálogos de los valores categóricos del modelo de datos (roles, tipos, resultados y zonas).
+# El código de cada valor es su posición en la lista: los valores nuevos se añaden siempre al final
+# para que los códigos ya guardados (almacén de posiciones) no cambien. La codificación vive solo en
+# pandas (Categorical) y NumPy; en SQLite las columnas siguen siendo TEXT: las consultas de las
+# páginas, exportaciones y snapshots filtran y agrupan por el texto, y los índices sobre esas columnas
+# ya son pequeños con estos pocos valores distintos, así que no hay tablas de consulta con códigos.
+from utils.lazy import lazy_import
+
+# pandas y numpy se cargan en el primer uso: la comprobación de sesión de las páginas no los necesita
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+ROLES_OFENSIVOS = ['Lanzador', 'Rematador', 'Bloqueador', 'Arrastre', 'Rechace', 'Atrás']
+ROLES_DEFENSIVOS = ['Zona', 'Al hombre', 'Poste', 'Arriba']
+
+CATEGORIAS = {
+    'rol': ROLES_OFENSIVOS + ROLES_DEFENSIVOS,
+    'tipo_posicion': ['Ofensivo', 'Defensivo'],
+    'tipo_corner': ['Derecha', 'Izquierda'],
+    'resultado': ['Gol', 'Remate a puerta', 'Remate fuera', 'Despeje', 'Falta atacante', 'Falta defensiva', 'Otro'],
+    'zona': ['Primer Palo', 'Centro Área Pequeña', 'Segundo Palo', 'Frontal Palo Cercano',
+             'Frontal Centro', 'Frontal Palo Lejano', 'Zona de Rechace', 'Zona en Corto'],
+}
+
+# Tablas de consulta que creaban versiones anteriores; ninguna consulta ni clave ajena las usaba
+_TABLAS_OBSOLETAS = ['cat_roles', 'cat_tipos_posicion', 'cat_tipos_corner', 'cat_resultados', 'cat_zonas']
+
+# Colores de cada resultado, en el orden de CATEGORIAS['resultado']
+COLORES_RESULTADOS = ['green', 'orange', 'red', 'gray', 'brown', 'blue', 'lightgray']
+# Los mismos en defensa: aquí un gol o un remate es malo para el equipo
+COLORES_RESULTADOS_DEFENSIVOS = ['red', 'orange', 'yellow', 'lightgreen', 'green', 'lightblue', 'lightgray']
+
+def drop_lookup_tables(conn):
+    """Elimina las tablas de consulta cat_* de bases de datos antiguas; no hace commit"""
+    for tabla in _TABLAS_OBSOLETAS:
+        conn.execute(f"DROP TABLE IF EXISTS {tabla}")
+
+def category_dtype(dominio):
+    """Tipo pandas Categorical con las categorías del catálogo en orden de código"""
+    return pd.CategoricalDtype(CATEGORIAS[dominio])
+
+def to_categorical(valores, dominio):
+    """
+    Convierte una serie de textos en Categorical con los códigos del catálogo. Los valores que no
+    están en el catálogo se añaden al final como categorías extra en lugar de perderse.
+    """
+    serie = pd.Series(valores, dtype=object) if not isinstance(valores, pd.Series) else valores
+    extra = [v for v in pd.unique(serie.dropna()) if v not in category_dtype(dominio).categories]
+    return serie.astype(pd.CategoricalDtype(CATEGORIAS[dominio] + sorted(map(str, extra))))
+
+def categorize_columns(df, columnas):
+    """Convierte las columnas indicadas ({columna: dominio}) del DataFrame en Categorical"""
+    for columna, dominio in columnas.items():
+        df[columna] = to_categorical(df[columna], dominio)
+    return df
+
+def category_codes(valores, dominio):
+    """Códigos enteros del catálogo (-1 para nulos y valores desconocidos)"""
+    return pd.Categorical(np.asarray(valores, dtype=object), dtype=category_dtype(dominio)).codes
+
+def lookup_by_code(valores, dominio, tabla, defecto):
+    """
+    Traduce cada valor con una tabla indexada por código (p. ej. colores). El valor por defecto va en
+    la última posición, de modo que el código -1 de los desconocidos apunta directamente a él.
+    """
+    tabla = np.append(np.asarray(tabla, dtype=object), defecto)
+    return tabla[category_codes(valores, dominio)]
+
+def observed_counts(serie):
+    """value_counts sin las categorías que no aparecen (un Categorical las cuenta con 0)"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.cat.remove_unused_categories()
+    return serie.value_counts()
@@ -0,0 +1,218 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from utils.db import get_data_version
+from utils.profiling import span
+from utils.render import release_figure
+
+# Cambiar este número cuando cambie el aspecto de algún gráfico para invalidar lo ya guardado
+CACHE_VERSION = 2
+
+CACHE_DIR = os.path.join('data', 'cache', 'charts')
+MAX_MEMORY_BYTES = 64 * 1024 * 1024
+MAX_DISK_BYTES = 256 * 1024 * 1024
+
+# Mismos parámetros que usa st.pyplot al rasterizar, para que la imagen sea idéntica
+PNG_DPI = 200
+
+# Estado de la caché (compartido por todas las sesiones del servidor)
+_lock = threading.Lock()
+_memoria = OrderedDict()   # clave -> bytes PNG, en orden de uso (el último es el más reciente)
+_memoria_bytes = 0
+_disco = None              # clave -> tamaño en bytes, en orden de uso; se carga al primer acceso
+_disco_bytes = 0
+_stats = {
+    'aciertos_memoria': 0,
+    'aciertos_disco': 0,
+    'fallos': 0,
+    'desalojos_memoria': 0,
+    'desalojos_disco': 0,
+}
+
+def chart_key(chart_id, equipo_id=None, jugador_id=None, filtros=None, data_version=None):
+    """Calcula la clave de un gráfico a partir de su identificador, la vista y la versión de los datos"""
+    partes = [CACHE_VERSION, chart_id, equipo_id, jugador_id, filtros, data_version]
+    texto = json.dumps(partes, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+def figure_to_png(fig):
+    """Rasteriza una figura a PNG con los mismos parámetros que st.pyplot"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=PNG_DPI, bbox_inches='tight')
+    return buffer.getvalue()
+
+def _ruta(key):
+    return os.path.join(CACHE_DIR, f"{key}.png")
+
+def _cargar_disco():
+    """Indexa los PNG que ya hay en disco, del más antiguo al más reciente (llamar con _lock)"""
+    global _disco, _disco_bytes
+    if _disco is not None:
+        return
+
+    entradas = []
+    if os.path.isdir(CACHE_DIR):
+        for nombre in os.listdir(CACHE_DIR):
+            if not nombre.endswith('.png'):
+                continue
+            try:
+                info = os.stat(os.path.join(CACHE_DIR, nombre))
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, nombre[:-4], info.st_size))
+
+    entradas.sort()
+    _disco = OrderedDict((key, size) for _, key, size in entradas)
+    _disco_bytes = sum(_disco.values())
+
+def _guardar_memoria(key, png):
+    """Guarda en memoria y desaloja lo menos usado si se supera el límite (llamar con _lock)"""
+    global _memoria_bytes
+    if len(png) > MAX_MEMORY_BYTES:
+        return
+
+    if key in _memoria:
+        _memoria_bytes -= len(_memoria.pop(key))
+    _memoria[key] = png
+    _memoria_bytes += len(png)
+
+    while _memoria_bytes > MAX_MEMORY_BYTES:
+        _, antiguo = _memoria.popitem(last=False)
+        _memoria_bytes -= len(antiguo)
+        _stats['desalojos_memoria'] += 1
+
+def _guardar_disco(key, png):
+    """Escribe el PNG en disco y desaloja los ficheros menos usados si se supera el límite (llamar con _lock)"""
+    global _disco_bytes
+    _cargar_disco()
+    if len(png) > MAX_DISK_BYTES:
+        return
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Escribir primero en un temporal para que nunca se lea un PNG a medias
+        temporal = _ruta(key) + f".{os.getpid()}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(png)
+        os.replace(temporal, _ruta(key))
+    except OSError:
+        return
+
+    if key in _disco:
+        _disco_bytes -= _disco.pop(key)
+    _disco[key] = len(png)
+    _disco_bytes += len(png)
+
+    while _disco_bytes > MAX_DISK_BYTES and _disco:
+        antiguo, size = _disco.popitem(last=False)
+        _disco_bytes -= size
+        _stats['desalojos_disco'] += 1
+        try:
+            os.remove(_ruta(antiguo))
+        except OSError:
+            pass
+
+def get_chart(key):
+    """Devuelve los bytes PNG guardados para la clave, o None si no están en caché"""
+    global _disco_bytes
+    with _lock:
+        png = _memoria.get(key)
+        if png is not None:
+            _memoria.move_to_end(key)
+            _stats['aciertos_memoria'] += 1
+            return png
+
+        _cargar_disco()
+        if key in _disco:
+            try:
+                with open(_ruta(key), 'rb') as f:
+                    png = f.read()
+                os.utime(_ruta(key))  # Conservar el orden de uso entre reinicios
+            except OSError:
+                # Otro proceso lo ha borrado: olvidar la entrada
+                _disco_bytes -= _disco.pop(key)
+                png = None
+
+        if png is None:
+            _stats['fallos'] += 1
+            return None
+
+        _disco.move_to_end(key)
+        _stats['aciertos_disco'] += 1
+        _guardar_memoria(key, png)
+        return png
+
+def put_chart(key, png):
+    """Guarda los bytes PNG de un gráfico en memoria y en disco"""
+    with _lock:
+        _guardar_memoria(key, png)
+        _guardar_disco(key, png)
+
+def clear_chart_cache(disco=True):
+    """Vacía la caché en memoria y, opcionalmente, los ficheros en disco"""
+    global _memoria_bytes, _disco_bytes
+    with _lock:
+        _memoria.clear()
+        _memoria_bytes = 0
+        if disco:
+            _cargar_disco()
+            for key in _disco:
+                try:
+                    os.remove(_ruta(key))
+                except OSError:
+                    pass
+            _disco.clear()
+            _disco_bytes = 0
+
+def chart_cache_stats():
+    """Devuelve aciertos, fallos, desalojos y ocupación de la caché de gráficos"""
+    with _lock:
+        _cargar_disco()
+        stats = dict(_stats)
+        stats.update({
+            'entradas_memoria': len(_memoria),
+            'bytes_memoria': _memoria_bytes,
+            'entradas_disco': len(_disco),
+            'bytes_disco': _disco_bytes,
+        })
+    return stats
+
+def store_chart(key, build, chart_id=None):
+    """Construye la figura con build(), la rasteriza y guarda el PNG bajo la clave (None si no hay figura)"""
+    with span('grafico', chart_id or 'grafico'):
+        fig = build()
+    if fig is None:
+        return None
+    try:
+        with span('rasterizado', chart_id or 'grafico'):
+            png = figure_to_png(fig)
+    finally:
+        release_figure(fig)
+
+    put_chart(key, png)
+    return png
+
+def render_chart(chart_id, build, equipo_id=None, jugador_id=None, filtros=None, data_version=None):
+    """Devuelve el PNG del gráfico, construyendo la figura solo si no está en caché"""
+    if data_version is None:
+        data_version = get_data_version()
+    key = chart_key(chart_id, equipo_id, jugador_id, filtros, data_version)
+
+    png = get_chart(key)
+    if png is None:
+        png = store_chart(key, build)
+    return png
+
+def show_chart(chart_id, build, equipo_id=None, jugador_id=None, filtros=None, container=None):
+    """Muestra un gráfico desde la caché o, si no está, lo construye con build() y lo guarda"""
+    png = render_chart(chart_id, build, equipo_id, jugador_id, filtros)
+    if png is None:
+        return False
+    (container or st).image(png, use_column_width=True)
+    return True
@@ -0,0 +1,337 @@
+from utils.categories import lookup_by_code
+from utils.lazy import lazy_import
+from utils.render import new_figure
+from utils.visualization import (COLORES_ROLES, create_field_plot, load_field_image,
+                                 draw_curved_arrows, draw_role_circles, draw_spread_ellipses, add_text_batch,
+                                 scatter_by_outcome, get_role_colors, get_trayectorias)
+
+# numpy, pandas, seaborn y matplotlib se cargan al construir el primer gráfico (ver utils/lazy.py)
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+sns = lazy_import('seaborn')
+martist = lazy_import('matplotlib.artist')
+mlines = lazy_import('matplotlib.lines')
+
+# Las funciones de este módulo solo reciben datos y devuelven una figura: no consultan la base de
+# datos ni llaman a Streamlit, de forma que se pueden cachear y rasterizar fuera del script.
+
+def build_bar_chart(labels, values, title, colors=None, figsize=(6, 4)):
+    """Gráfico de barras simple con etiquetas del eje X rotadas"""
+    fig, ax = new_figure(figsize=figsize)
+    ax.bar(labels, values, color=colors)
+    ax.set_ylabel('Cantidad')
+    ax.set_title(title)
+    martist.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
+    return fig
+
+def build_role_frequency_chart(roles_count, colors, title):
+    """Frecuencia de roles del equipo (roles_count con columnas Rol y Frecuencia)"""
+    fig, ax = new_figure(figsize=(6, 4))
+    # Rol como texto: con un Categorical seaborn dibujaría también los roles sin datos
+    roles_count = roles_count.assign(Rol=roles_count['Rol'].astype(str))
+    sns.barplot(x='Rol', y='Frecuencia', data=roles_count, ax=ax, palette=colors)
+    martist.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.set_ylabel('Cantidad')
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+def build_zone_arrows_chart(tipo_zona, colores_tipo, etiquetas_tipo, title):
+    """Flechas desde el punto de lanzamiento a cada zona de caída (tipo_zona con Tipo, Zona y Cantidad)"""
+    fig, ax = create_field_plot()
+
+    # Porcentaje de cada combinación de tipo y zona
+    total = tipo_zona['Cantidad'].sum()
+    porcentajes = (tipo_zona['Cantidad'] / total * 100).round(1)
+
+    # Obtener puntos de origen y destino (mismas zonas de referencia que en el registro),
+    # ya transformados en el eje Y para que sean coherentes con la visualización
+    origenes, destinos = get_trayectorias(tipo_zona['Tipo'], tipo_zona['Zona'])
+
+    # Dibujar todas las flechas de una vez; el grosor depende de la frecuencia
+    draw_curved_arrows(
+        ax,
+        origenes,
+        destinos,
+        colors=lookup_by_code(tipo_zona['Tipo'], 'tipo_corner', colores_tipo, colores_tipo[1]),  # Colores distintos por tipo
+        widths=1 + (porcentajes / 5),  # Grosores más pronunciados
+        labels=porcentajes.astype(str) + '%',
+        curvature=0.3  # Aumentada para mejor visualización
+    )
+
+    # Añadir leyenda
+    legend_elements = [
+        mlines.Line2D([0], [0], color=colores_tipo[0], lw=2, label=etiquetas_tipo[0]),
+        mlines.Line2D([0], [0], color=colores_tipo[1], lw=2, label=etiquetas_tipo[1])
+    ]
+    ax.legend(handles=legend_elements, loc='upper right')
+
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+def build_average_positions_chart(pos_df, tipo_pos, title):
+    """Posiciones promedio por jugador y rol (pos_df con numero, rol, x_prom, y_prom y veces)"""
+    fig, ax = create_field_plot()
+
+    draw_role_circles(
+        ax,
+        pos_df['x_prom'],
+        70 - pos_df['y_prom'],  # Invertir el eje Y para que sea coherente con el registro
+        1 + (pos_df['veces'] / 5),  # Tamaño del círculo proporcional a la frecuencia
+        get_role_colors(pos_df['rol'], tipo_pos),
+        pos_df['numero']
+    )
+
+    # Leyenda con todos los roles del tipo de posicionamiento
+    legend_elements = [
+        mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor=color, markersize=10, label=rol)
+        for rol, color in COLORES_ROLES[tipo_pos].items()
+    ]
+    ax.legend(handles=legend_elements, loc='upper right')
+
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+def build_routine_chart(colocacion_df, caida, title):
+    """
+    Colocación media de una rutina (colocacion_df con rol, x, y y ocupacion, un hueco por fila) y su
+    punto de caída medio (x, y) o None
+    """
+    fig, ax = create_field_plot()
+
+    # El círculo crece con la fracción de corners de la rutina en los que el hueco está ocupado
+    draw_role_circles(
+        ax,
+        colocacion_df['x'],
+        70 - colocacion_df['y'],
+        1.5 + 1.5 * colocacion_df['ocupacion'],
+        get_role_colors(colocacion_df['rol'], 'Ofensivo'),
+        range(1, len(colocacion_df) + 1)
+    )
+    legend_elements = [
+        mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor=color, markersize=10, label=rol)
+        for rol, color in COLORES_ROLES['Ofensivo'].items()
+    ]
+    if caida is not None:
+        ax.scatter([caida[0]], [70 - caida[1]], marker='X', s=250, c='black', edgecolors='white', zorder=5)
+        legend_elements.append(mlines.Line2D([0], [0], marker='X', color='w', markerfacecolor='black',
+                                             markersize=12, label='Caída media'))
+    ax.legend(handles=legend_elements, loc='upper right')
+
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+def build_slot_layout_chart(huecos_df, tipo_pos, title):
+    """
+    Colocación por huecos (huecos_df con hueco, rol, x, y, dispersion_x, dispersion_y y ocupacion): cada
+    hueco en su posición media, con una elipse de una desviación típica alrededor
+    """
+    fig, ax = create_field_plot()
+
+    colores = get_role_colors(huecos_df['rol'], tipo_pos)
+    draw_spread_ellipses(
+        ax,
+        huecos_df['x'],
+        70 - huecos_df['y'],
+        2 * huecos_df['dispersion_x'],
+        2 * huecos_df['dispersion_y'],
+        colores
+    )
+    # El círculo crece con la fracción de corners en los que el hueco está ocupado
+    draw_role_circles(
+        ax,
+        huecos_df['x'],
+        70 - huecos_df['y'],
+        1.5 + 1.5 * huecos_df['ocupacion'],
+        colores,
+        huecos_df['hueco']
+    )
+    legend_elements = [
+        mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor=color, markersize=10, label=rol)
+        for rol, color in COLORES_ROLES[tipo_pos].items()
+    ]
+    ax.legend(handles=legend_elements, loc='upper right')
+
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+def build_drop_points_chart(puntos_df):
+    """Puntos de caída registrados (puntos_df con punto_caida, tipo, resultado y zona)"""
+    fig, ax = create_field_plot()
+
+    # Separar las coordenadas "x,y" y descartar las que no tengan un formato válido
+    coords = puntos_df['punto_caida'].str.extract(r'^([^,]*),([^,]*)$')
+    puntos_df = puntos_df.assign(
+        x=pd.to_numeric(coords[0].str.strip(), errors='coerce'),
+        y=pd.to_numeric(coords[1].str.strip(), errors='coerce')
+    ).dropna(subset=['x', 'y'])
+
+    # Transformar coordenada y
+    y_transformada = 70 - puntos_df['y']
+
+    # Colores según resultado: un scatter por categoría
+    goles, remates, otros = scatter_by_outcome(
+        ax, puntos_df['x'], y_transformada, puntos_df['resultado'],
+        [(['Gol'], 'green', 'o'), (['Remate a puerta', 'Remate fuera'], 'red', '^')],
+        default=('blue', 's'),
+        s=100, alpha=0.7, edgecolors='white'
+    )
+
+    # Mostrar tipo y zona (primera letra de cada uno)
+    zona_inicial = puntos_df['zona'].astype(object).fillna('').str[:1]
+    textos = puntos_df['tipo'].astype(object).fillna('').str[:1] + np.where(zona_inicial != '', '-' + zona_inicial, '')
+    add_text_batch(ax, puntos_df['x'], y_transformada - 2, textos,
+                   fontsize=8, color='white', background='black', background_alpha=0.5)
+
+    # Añadir leyenda solo con las categorías presentes
+    legend_elements = []
+    if goles > 0:
+        legend_elements.append(mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='green', markersize=10, label='Gol'))
+    if remates > 0:
+        legend_elements.append(mlines.Line2D([0], [0], marker='^', color='w', markerfacecolor='red', markersize=10, label='Remate'))
+    if otros > 0:
+        legend_elements.append(mlines.Line2D([0], [0], marker='s', color='w', markerfacecolor='blue', markersize=10, label='Otros'))
+
+    if legend_elements:
+        ax.legend(handles=legend_elements, loc='upper right')
+
+    ax.set_title('Puntos de caída registrados\n(Letra indica tipo: D=Derecha, I=Izquierda + Zona)')
+    fig.tight_layout()
+    return fig
+
+def build_player_positions_chart(df_jugador, colores, etiquetas, title):
+    """Posiciones de un jugador coloreadas por resultado: colores/etiquetas para (gol, remate, otros)"""
+    fig, ax = create_field_plot()
+
+    # Dibujar todas las posiciones del jugador, un scatter por resultado
+    y_transformada = 70 - df_jugador['y']  # Invertir el eje Y
+    scatter_by_outcome(
+        ax, df_jugador['x'], y_transformada, df_jugador['resultado'],
+        [(['Gol'], colores[0], 'o'), (['Remate a puerta', 'Remate fuera'], colores[1], '^')],
+        default=(colores[2], 's'),
+        s=100, alpha=0.7
+    )
+
+    # Añadir número de minuto al lado de cada punto
+    add_text_batch(ax, df_jugador['x'] + 1, y_transformada, df_jugador['minuto'].astype(str),
+                   fontsize=8, ha='left', va='baseline')
+
+    # Leyenda
+    legend_elements = [
+        mlines.Line2D([0], [0], marker=marker, color='w', markerfacecolor=color, markersize=10, label=etiqueta)
+        for marker, color, etiqueta in zip(['o', '^', 's'], colores, etiquetas)
+    ]
+    ax.legend(handles=legend_elements, loc='upper right')
+
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+def build_heatmap_chart(x, y, cmap, title):
+    """Mapa de calor (KDE) de las posiciones de un jugador sobre el campo"""
+    fig, ax = new_figure(figsize=(10, 7))
+
+    # Usar la imagen de fondo ya cargada
+    field_img = load_field_image()
+    if field_img is not None:
+        ax.imshow(field_img, extent=[0, 100, 0, 70], aspect='auto', alpha=0.6)
+    else:
+        # Si falla, usar un fondo verde simple
+        ax.set_facecolor('#78A64B')  # Verde césped
+
+    # Generar un mapa de calor 2D usando kernel density estimation
+    if len(x) > 1:
+        sns.kdeplot(
+            x=x,
+            y=y,
+            cmap=cmap,
+            fill=True,
+            alpha=0.7,
+            thresh=0,
+            levels=10,
+            ax=ax
+        )
+
+    # Configuraciones adicionales
+    ax.set_xlim(0, 100)
+    ax.set_ylim(0, 70)
+    ax.set_title(title)
+    ax.axis('off')
+    fig.tight_layout()
+    return fig
+
+def build_effectiveness_chart(categorias, goles_pct, remates_pct, etiquetas, colores, title, figsize=(8, 5)):
+    """Barras agrupadas de % de goles y % de remates por categoría (rival o zona)"""
+    fig, ax = new_figure(figsize=figsize)
+
+    # Crear barras
+    x = np.arange(len(categorias))
+    width = 0.35
+
+    ax.bar(x - width/2, goles_pct, width, label=etiquetas[0], color=colores[0])
+    ax.bar(x + width/2, remates_pct, width, label=etiquetas[1], color=colores[1])
+
+    # Configurar eje X
+    ax.set_xticks(x)
+    ax.set_xticklabels(categorias, rotation=45, ha='right')
+
+    # Añadir etiquetas y título
+    ax.set_ylabel('Porcentaje %')
+    ax.set_title(title)
+    ax.legend()
+
+    fig.tight_layout()
+    return fig
+
+def build_trend_chart(df_chronological, ylim, ylabel, title):
+    """Evolución del rendimiento (df_chronological con fecha y valor_resultado, ordenado por fecha)"""
+    fig, ax = new_figure(figsize=(8, 5))
+    indice = np.arange(len(df_chronological))
+    valores = df_chronological['valor_resultado']
+
+    # Graficar línea de tendencia
+    ax.plot(indice, valores, 'o-', color='blue', alpha=0.7, label='Rendimiento')
+
+    # Añadir línea de tendencia (media móvil) si hay suficientes datos
+    if len(df_chronological) > 2:
+        window = min(3, len(df_chronological))
+        tendencia = valores.rolling(window=window, center=True).mean()
+        ax.plot(indice, tendencia, '-', color='red', linewidth=2, label=f'Tendencia (media móvil {window})')
+
+    # Configurar etiquetas del eje X
+    xticks = indice
+    xticklabels = df_chronological['fecha'].astype(str).tolist()
+
+    if len(xticks) > 8:  # Si hay muchas fechas, mostrar solo algunas
+        step = len(xticks) // 6
+        xticks = xticks[::step]
+        xticklabels = xticklabels[::step]
+
+    ax.set_xticks(xticks)
+    ax.set_xticklabels(xticklabels, rotation=45, ha='right')
+
+    # Añadir línea horizontal en 0
+    ax.axhline(y=0, color='gray', linestyle='-', alpha=0.3)
+
+    # Configurar límites y etiquetas
+    ax.set_ylim(*ylim)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend()
+
+    fig.tight_layout()
+    return fig
+
+def build_pie_chart(sizes, labels, colors, title, explode=None):
+    """Gráfico de pastel (se asume que sum(sizes) > 0)"""
+    fig, ax = new_figure(figsize=(6, 6))
+    ax.pie(sizes, explode=explode, labels=labels, colors=colors,
+           autopct='%1.1f%%', shadow=True, startangle=90)
+    ax.axis('equal')  # Para asegurar que se dibuje como un círculo
+    ax.set_title(title)
+    return fig
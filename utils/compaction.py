@@ -0,0 +1,196 @@
+# Compactación fuera de horas punta. Las páginas solo marcan como borrados los partidos y corners
+# (borrado_en, ver utils/deletion.py); aquí se purgan en lotes pequeños con pausas entre ellos, para no
+# bloquear a quien esté escribiendo, se ponen al día el almacén de posiciones y los snapshots, se
+# devuelven al sistema las páginas libres (VACUUM incremental) y se actualizan las estadísticas del
+# planificador. Un hilo del servidor la lanza una vez al día dentro de la franja CORNERS_COMPACTION_HOURS,
+# seguida del mantenimiento nocturno (ANALYZE, integridad e historial de tamaños, ver utils/maintenance.py).
+# Uso: python -m utils.compaction [--club CLUB | --todos] [--lote 200] [--pausa 0.05] [--sin-vacuum]
+import argparse
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from utils.db import get_db_connection
+from utils.deletion import TABLAS, describe_deleted, purge_marked
+from utils.maintenance import maintain_all
+from utils.tenancy import current_tenant, list_tenants, use_tenant
+
+# Filas marcadas que se purgan por transacción y pausa entre lotes (segundos)
+LOTE = int(os.environ.get('CORNERS_COMPACTION_BATCH', '200'))
+PAUSA = 0.05
+# Páginas que libera cada paso del VACUUM incremental
+PAGINAS_VACUUM = 2000
+# Franja horaria (hora local, fin excluido; admite pasar de medianoche: 23-5). Vacía o 'off' la desactiva
+FRANJA = os.environ.get('CORNERS_COMPACTION_HOURS', '3-5')
+# Cada cuánto mira el hilo si está en la franja (segundos)
+INTERVALO = 600
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+_hilo = {'hilo': None}
+_hilo_lock = threading.Lock()
+
+def parse_window(texto=FRANJA):
+    """Franja '3-5' -> (3, 5); None si está desactivada"""
+    texto = (texto or '').strip().lower()
+    if texto in ('', 'off'):
+        return None
+    inicio, fin = (int(hora) % 24 for hora in texto.split('-'))
+    return inicio, fin
+
+def in_window(franja, ahora=None):
+    """Indica si la hora actual cae dentro de la franja"""
+    if franja is None:
+        return False
+    hora = (ahora or datetime.datetime.now()).hour
+    inicio, fin = franja
+    return inicio <= hora < fin if inicio <= fin else hora >= inicio or hora < fin
+
+def purge_deleted(lote=LOTE, pausa=PAUSA):
+    """
+    Purga las filas marcadas como borradas, primero los corners y después los partidos (cuyos corners
+    ya no tienen posiciones que borrar). Cada lote es una transacción corta. Devuelve {tabla: filas}.
+    """
+    total = {}
+    for tabla in ('corners', 'partidos'):
+        while True:
+            borrados = purge_marked(tabla, lote)
+            if not borrados:
+                break
+            for nombre, filas in borrados.items():
+                total[nombre] = total.get(nombre, 0) + filas
+            time.sleep(pausa)
+    return {tabla: total[tabla] for tabla in TABLAS if tabla in total}
+
+def refresh_derived(completo=False):
+    """
+    Pone al día el almacén de posiciones y los snapshots que ya existan (completo=True los reconstruye
+    desde cero); devuelve lo actualizado
+    """
+    from utils import snapshots
+    from utils.position_store import POSITIONS_DIR, _leer_meta, refresh_position_store
+    from utils.tenancy import tenant_path
+
+    actualizados = []
+    if _leer_meta(tenant_path(POSITIONS_DIR)) is not None:
+        refresh_position_store(completo=completo)
+        actualizados.append('posiciones')
+    if snapshots.pa is not None and snapshots.load_manifest() is not None:
+        snapshots.export_snapshot(completo=completo)
+        actualizados.append('snapshots')
+    return actualizados
+
+def incremental_vacuum(paginas=PAGINAS_VACUUM, pausa=PAUSA):
+    """
+    Devuelve al sistema las páginas libres de la base de datos por pasos. La primera vez pasa la base de
+    datos a auto_vacuum incremental, lo que exige un VACUUM completo. Devuelve las páginas liberadas.
+    """
+    conn = get_db_connection()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return libres
+        liberadas = 0
+        while True:
+            libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if libres == 0:
+                return liberadas
+            # Con execute cada paso del cursor libera una sola página; executescript ejecuta el paso completo
+            conn.executescript(f"PRAGMA incremental_vacuum({min(libres, paginas)});")
+            paso = libres - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if paso <= 0:
+                return liberadas
+            liberadas += paso
+            time.sleep(pausa)
+    finally:
+        conn.close()
+
+def optimize():
+    """Actualiza las estadísticas que usa el planificador de SQLite donde hagan falta"""
+    conn = get_db_connection()
+    try:
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+def compact(lote=LOTE, pausa=PAUSA, vacuum=True):
+    """Compacta la base de datos del club actual (o la principal); devuelve un resumen"""
+    inicio = time.perf_counter()
+    purgados = purge_deleted(lote, pausa)
+    actualizados = refresh_derived() if purgados else []
+    liberadas = incremental_vacuum(pausa=pausa) if vacuum else 0
+    optimize()
+    return {
+        'club': current_tenant(),
+        'purgados': purgados,
+        'actualizados': actualizados,
+        'paginas_liberadas': liberadas,
+        'duracion_s': round(time.perf_counter() - inicio, 2),
+    }
+
+def compact_all(lote=LOTE, pausa=PAUSA, vacuum=True):
+    """Compacta la base principal y la de cada club; un fallo en una no detiene las demás"""
+    resumenes = []
+    for club in [None] + list_tenants():
+        with use_tenant(club):
+            try:
+                resumenes.append(compact(lote, pausa, vacuum))
+            except (sqlite3.Error, OSError) as e:
+                resumenes.append({'club': club, 'error': str(e)})
+    return resumenes
+
+def _bucle(franja, intervalo):
+    ultima = None
+    while True:
+        ahora = datetime.datetime.now()
+        if in_window(franja, ahora) and ultima != ahora.date():
+            ultima = ahora.date()
+            compact_all()
+            maintain_all()
+        time.sleep(intervalo)
+
+def start_compaction_thread(franja=FRANJA, intervalo=INTERVALO):
+    """Arranca (una vez por proceso) el hilo que compacta dentro de la franja; False si está desactivada"""
+    franja = parse_window(franja)
+    if franja is None:
+        return False
+    with _hilo_lock:
+        if _hilo['hilo'] is None:
+            _hilo['hilo'] = threading.Thread(target=_bucle, args=(franja, intervalo), name='compactacion',
+                                             daemon=True)
+            _hilo['hilo'].start()
+    return True
+
+def _describir(resumen):
+    nombre = resumen['club'] or '(principal)'
+    if 'error' in resumen:
+        return f"{nombre}: error: {resumen['error']}"
+    purgados = describe_deleted(resumen['purgados']) if resumen['purgados'] else 'nada'
+    actualizados = f", actualizados {', '.join(resumen['actualizados'])}" if resumen['actualizados'] else ''
+    return (f"{nombre}: purgado {purgados}{actualizados}, {resumen['paginas_liberadas']} páginas liberadas "
+            f"en {resumen['duracion_s']}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Purga lo marcado como borrado y compacta la base de datos")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--club', help="Club que se compacta (por defecto, la base principal)")
+    grupo.add_argument('--todos', action='store_true', help="Compactar la base principal y todos los clubes")
+    parser.add_argument('--lote', type=int, default=LOTE, help="Filas marcadas purgadas por transacción")
+    parser.add_argument('--pausa', type=float, default=PAUSA, help="Segundos de pausa entre lotes")
+    parser.add_argument('--sin-vacuum', action='store_true', help="No liberar las páginas libres")
+    args = parser.parse_args(argv)
+
+    if args.todos:
+        resumenes = compact_all(args.lote, args.pausa, not args.sin_vacuum)
+    else:
+        with use_tenant(args.club):
+            resumenes = [compact(args.lote, args.pausa, not args.sin_vacuum)]
+    for resumen in resumenes:
+        print(_describir(resumen))
+
+if __name__ == '__main__':
+    main()
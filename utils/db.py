@@ -1,15 +1,295 @@
 import sqlite3
 import os
+import re
+import threading
+import time
 
-def get_db_connection():
-    """Establece una conexión con la base de datos SQLite"""
+from utils import query_log
+from utils.profiling import current_trace, span, traced
+from utils.tenancy import current_tenant, tenant_path
+
+# Base de datos principal; la de cada club está en data/clubes/<club>/ (ver utils/tenancy.py)
+DB_PATH = 'data/corners.db'
+
+# Clases de consulta: las transaccionales (registro, login, selectores) siempre van a SQLite; las
+# analíticas (agregaciones de solo lectura sobre varias temporadas) pueden ir a DuckDB
+QUERY_TRANSACCIONAL = 'transaccional'
+QUERY_ANALITICA = 'analitica'
+
+# Motor de las consultas analíticas: 'sqlite', 'duckdb' o 'auto' (DuckDB si está instalado)
+ANALYTICS_ENGINE = os.environ.get('CORNERS_ANALYTICS_ENGINE', 'auto')
+# Origen de los datos para DuckDB: 'sqlite' (el fichero vivo, con la extensión sqlite de DuckDB)
+# o 'parquet' (los snapshots de utils.snapshots, solo si están al día)
+ANALYTICS_SOURCE = os.environ.get('CORNERS_ANALYTICS_SOURCE', 'sqlite')
+
+# Tablas de la aplicación (las columnas zona_caida y punto_caida de corners se añaden aparte,
+# ver add_columns_to_corners_table). Las claves ajenas borran en cascada: eliminar un equipo, partido,
+# jugador o corner elimina lo que depende de él (ver utils/deletion.py)
+ESQUEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INTEGER PRIMARY KEY,
+        username TEXT UNIQUE,
+        password TEXT,
+        club TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS equipos (
+        id INTEGER PRIMARY KEY,
+        nombre TEXT UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS jugadores (
+        id INTEGER PRIMARY KEY,
+        nombre TEXT,
+        equipo_id INTEGER,
+        numero INTEGER,
+        FOREIGN KEY (equipo_id) REFERENCES equipos (id) ON DELETE CASCADE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS partidos (
+        id INTEGER PRIMARY KEY,
+        equipo_local_id INTEGER,
+        equipo_visitante_id INTEGER,
+        fecha TEXT,
+        borrado_en TEXT,
+        FOREIGN KEY (equipo_local_id) REFERENCES equipos (id) ON DELETE CASCADE,
+        FOREIGN KEY (equipo_visitante_id) REFERENCES equipos (id) ON DELETE CASCADE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS corners (
+        id INTEGER PRIMARY KEY,
+        partido_id INTEGER,
+        equipo_id INTEGER,
+        minuto INTEGER,
+        tipo TEXT,
+        resultado TEXT,
+        borrado_en TEXT,
+        FOREIGN KEY (partido_id) REFERENCES partidos (id) ON DELETE CASCADE,
+        FOREIGN KEY (equipo_id) REFERENCES equipos (id) ON DELETE CASCADE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS posiciones_jugadores (
+        id INTEGER PRIMARY KEY,
+        corner_id INTEGER,
+        jugador_id INTEGER,
+        equipo_id INTEGER,
+        x REAL,
+        y REAL,
+        rol TEXT,
+        tipo TEXT,
+        FOREIGN KEY (corner_id) REFERENCES corners (id) ON DELETE CASCADE,
+        FOREIGN KEY (jugador_id) REFERENCES jugadores (id) ON DELETE CASCADE,
+        FOREIGN KEY (equipo_id) REFERENCES equipos (id) ON DELETE CASCADE
+    )
+    ''',
+]
+
+# Índices de las claves ajenas: los borrados en cascada y las comprobaciones de SQLite buscan las filas
+# hijas por estas columnas; sin índice, cada fila borrada recorrería la tabla hija entera
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_jugadores_equipo ON jugadores (equipo_id)",
+    "CREATE INDEX IF NOT EXISTS idx_partidos_local ON partidos (equipo_local_id)",
+    "CREATE INDEX IF NOT EXISTS idx_partidos_visitante ON partidos (equipo_visitante_id)",
+    "CREATE INDEX IF NOT EXISTS idx_corners_partido ON corners (partido_id)",
+    "CREATE INDEX IF NOT EXISTS idx_corners_equipo ON corners (equipo_id)",
+    "CREATE INDEX IF NOT EXISTS idx_posiciones_corner ON posiciones_jugadores (corner_id)",
+    "CREATE INDEX IF NOT EXISTS idx_posiciones_jugador ON posiciones_jugadores (jugador_id)",
+    "CREATE INDEX IF NOT EXISTS idx_posiciones_equipo ON posiciones_jugadores (equipo_id)",
+    # Parciales: solo contienen las filas marcadas como borradas, que la compactación busca y purga
+    "CREATE INDEX IF NOT EXISTS idx_partidos_borrados ON partidos (borrado_en) WHERE borrado_en IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_corners_borrados ON corners (borrado_en) WHERE borrado_en IS NOT NULL",
+]
+
+# Columnas añadidas al esquema después de su creación: (tabla, columna, tipo). borrado_en marca los
+# partidos y corners borrados por el usuario hasta que la compactación los elimina (utils/compaction.py)
+COLUMNAS_ANADIDAS = [
+    ('partidos', 'borrado_en', 'TEXT'),
+    ('corners', 'borrado_en', 'TEXT'),
+]
+
+def create_tables(conn, indices=True):
+    """Crea las tablas de la aplicación (y los índices de sus claves ajenas) si no existen; no hace commit"""
+    for sentencia in ESQUEMA:
+        conn.execute(sentencia)
+    add_missing_columns(conn)
+    if indices:
+        create_indexes(conn)
+
+def add_missing_columns(conn):
+    """Añade a las tablas ya existentes las columnas de COLUMNAS_ANADIDAS que les falten; no hace commit"""
+    existentes = {}
+    for tabla, columna, tipo in COLUMNAS_ANADIDAS:
+        if tabla not in existentes:
+            existentes[tabla] = {col[1] for col in conn.execute(f"PRAGMA table_info({tabla})")}
+        if columna not in existentes[tabla]:
+            conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+            existentes[tabla].add(columna)
+
+def create_indexes(conn):
+    """Crea los índices de las claves ajenas y los de las filas borradas; no hace commit"""
+    for sentencia in INDICES:
+        conn.execute(sentencia)
+
+def _sql_span_name(sql):
+    """Primera parte de la sentencia en una sola línea, para identificarla en la traza"""
+    return ' '.join(sql.split())[:80]
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor que mide cada sentencia: spans 'sql' para el perfilado (utils.profiling) y estadísticas por
+    huella para el registro de consultas lentas (utils.query_log). Una llamada abarca la ejecución y la
+    lectura de sus filas; se anota al leer la última fila, al ejecutar otra sentencia o al cerrar el cursor.
+    Las filas leídas iterando sobre el cursor no se cuentan (solo el tiempo de la ejecución).
+    """
+    _llamada = None
+
+    def _terminar(self, explicar=True):
+        llamada = self._llamada
+        if llamada is None:
+            return
+        self._llamada = None
+        if query_log.QUERY_STATS:
+            sql, parametros, duracion, filas = llamada
+            query_log.record_query(sql, duracion, filas, parametros, self._explicar if explicar else None,
+                                   base=getattr(self.connection, 'base', None))
+
+    def _explicar(self, sql, parametros):
+        # Cursor básico de sqlite3 para que el propio EXPLAIN no cuente como consulta
+        return sqlite3.Cursor(self.connection).execute("EXPLAIN QUERY PLAN " + sql, parametros).fetchall()
+
+    def _anotar(self, inicio, filas, terminada):
+        llamada = self._llamada
+        if llamada is not None:
+            llamada[2] += (time.perf_counter() - inicio) * 1000
+            llamada[3] += filas
+            if terminada:
+                self._terminar()
+
+    def execute(self, sql, parameters=()):
+        self._terminar()
+        with span('sql', _sql_span_name(sql)):
+            inicio = time.perf_counter()
+            resultado = super().execute(sql, parameters)
+            self._llamada = [sql, parameters, (time.perf_counter() - inicio) * 1000, 0]
+        # Sin filas que leer (INSERT, DELETE, DDL...) la llamada termina aquí
+        if self.description is None:
+            self._terminar()
+        return resultado
+
+    def executemany(self, sql, seq_of_parameters):
+        self._terminar()
+        with span('sql', _sql_span_name(sql), many=True):
+            inicio = time.perf_counter()
+            resultado = super().executemany(sql, seq_of_parameters)
+            self._llamada = [sql, (), (time.perf_counter() - inicio) * 1000, 0]
+        self._terminar(explicar=False)
+        return resultado
+
+    def executescript(self, sql_script):
+        self._terminar()
+        with span('sql', 'script'):
+            return super().executescript(sql_script)
+
+    # SQLite genera las filas según se leen, así que la lectura también es tiempo de consulta
+    def fetchone(self):
+        with span('sql', 'fetch'):
+            inicio = time.perf_counter()
+            fila = super().fetchone()
+            self._anotar(inicio, 0 if fila is None else 1, fila is None)
+            return fila
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        with span('sql', 'fetch'):
+            inicio = time.perf_counter()
+            filas = super().fetchmany(size)
+            self._anotar(inicio, len(filas), len(filas) < size)
+            return filas
+
+    def fetchall(self):
+        with span('sql', 'fetch'):
+            inicio = time.perf_counter()
+            filas = super().fetchall()
+            self._anotar(inicio, len(filas), True)
+            return filas
+
+    def close(self):
+        self._terminar()
+        super().close()
+
+    def __del__(self):
+        # Cursores que se abandonan sin leer todas las filas (p. ej. conn.execute(...) recorrido con for)
+        try:
+            self._terminar(explicar=False)
+        except Exception:
+            pass
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Conexión cuyos cursores (también los de conn.execute) son TracedCursor. base es el fichero abierto:
+    con una base por club, las estadísticas y el EXPLAIN de cada consulta se separan por fichero.
+    """
+    base = None
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+def database_path():
+    """Fichero SQLite del club de la ejecución actual (la base principal si no hay club)"""
+    return tenant_path(DB_PATH)
+
+def get_db_connection(principal=False):
+    """
+    Establece una conexión con la base de datos SQLite del club actual, o con la principal
+    (usuarios) si principal=True
+    """
+    ruta = DB_PATH if principal else database_path()
     # Asegurarse de que el directorio de datos existe
-    if not os.path.exists('data'):
-        os.makedirs('data')
+    if not os.path.exists(os.path.dirname(ruta)):
+        os.makedirs(os.path.dirname(ruta))
     
-    conn = sqlite3.connect('data/corners.db')
+    # La conexión se instrumenta si se recogen estadísticas de consultas o se está perfilando esta ejecución
+    if query_log.QUERY_STATS or current_trace() is not None:
+        conn = sqlite3.connect(ruta, factory=TracedConnection)
+        conn.base = ruta
+    else:
+        conn = sqlite3.connect(ruta)
+    # SQLite no comprueba las claves ajenas (ni borra en cascada) salvo que se active en cada conexión
+    conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
+def get_data_version():
+    """
+    Devuelve una huella de la base de datos que cambia con cada escritura (fecha y tamaño de los ficheros).
+    Lleva delante el club, así que las cachés que la usan como clave nunca mezclan datos de dos clubes.
+    """
+    ruta_db = database_path()
+    club = current_tenant()
+    partes = [club] if club else []
+    # El fichero -wal solo existe en modo WAL; las escrituras pendientes de volcar viven ahí
+    for ruta in (ruta_db, ruta_db + '-wal'):
+        try:
+            info = os.stat(ruta)
+        except OSError:
+            continue
+        partes.append(f"{info.st_mtime_ns}:{info.st_size}")
+    return '|'.join(partes)
+
 def dict_factory(cursor, row):
     """Convierte las filas de SQLite en diccionarios para mejor serialización"""
     d = {}
@@ -23,28 +303,102 @@ def get_db_connection_dict():
     conn.row_factory = dict_factory
     return conn
 
-def execute_query(query, params=(), fetch_one=False, as_dict=True):
-    """Ejecuta una consulta y devuelve el resultado como lista de tuplas o diccionarios"""
-    if as_dict:
-        conn = get_db_connection_dict()
-    else:
-        conn = get_db_connection()
-    
+# Formas en las que execute_query e iter_query devuelven las filas
+FORMA_TUPLAS = 'tuplas'          # lista de tuplas, tal como las da el cursor
+FORMA_FILAS = 'filas'            # lista de sqlite3.Row (acceso por nombre o posición, sin copiar la fila)
+FORMA_DICT = 'dict'              # lista de diccionarios {columna: valor}
+FORMA_COLUMNAS = 'columnas'      # {columna: np.ndarray}, una matriz por columna
+FORMA_DATAFRAME = 'dataframe'    # pandas DataFrame
+FORMAS = (FORMA_TUPLAS, FORMA_FILAS, FORMA_DICT, FORMA_COLUMNAS, FORMA_DATAFRAME)
+
+# Filas que se leen de cada vez en iter_query
+TAMANO_LOTE = 5000
+
+def _dar_forma(filas, nombres, forma):
+    """Convierte una lista de tuplas (o sqlite3.Row) en la forma pedida"""
+    if forma in (FORMA_TUPLAS, FORMA_FILAS):
+        return filas
+    if forma == FORMA_DICT:
+        return [dict(zip(nombres, fila)) for fila in filas]
+    if forma == FORMA_DATAFRAME:
+        import pandas as pd
+        return pd.DataFrame.from_records(filas, columns=nombres)
+    import numpy as np
+    # Las columnas de enteros con NULL quedan como object, igual que las de texto
+    if not filas:
+        return {nombre: np.array([], dtype=object) for nombre in nombres}
+    return {nombre: np.array(valores) for nombre, valores in zip(nombres, zip(*filas))}
+
+def _forma_fila(fila, nombres, forma):
+    """Forma de una sola fila (fetch_one): tupla, sqlite3.Row o diccionario; None si no hay fila"""
+    if fila is None or forma in (FORMA_TUPLAS, FORMA_FILAS):
+        return fila
+    if forma == FORMA_DICT:
+        return dict(zip(nombres, fila))
+    raise ValueError(f"fetch_one no admite la forma {forma!r}")
+
+@traced('consulta')
+def execute_query(query, params=(), fetch_one=False, as_dict=True, query_class=QUERY_TRANSACCIONAL,
+                  forma=None, columnas=None):
+    """
+    Ejecuta una consulta y devuelve el resultado en la forma pedida (FORMA_TUPLAS, FORMA_FILAS, FORMA_DICT,
+    FORMA_COLUMNAS o FORMA_DATAFRAME; columnas sustituye a los nombres del cursor). Sin forma se mantiene
+    el comportamiento de siempre: lista de tuplas, y con fetch_one un diccionario si as_dict es True.
+    """
+    if forma is None:
+        forma = FORMA_DICT if as_dict and fetch_one else FORMA_TUPLAS
+    if forma not in FORMAS:
+        raise ValueError(f"Forma desconocida: {forma!r}")
+
+    # Las consultas analíticas se intentan primero en DuckDB; si no está disponible, en SQLite
+    if query_class == QUERY_ANALITICA and ANALYTICS_ENGINE != 'sqlite':
+        result = execute_duckdb_query(query, params, fetch_one)
+        if result is not None:
+            filas, nombres = result
+            nombres = columnas or nombres
+            if forma == FORMA_FILAS:
+                # DuckDB no tiene sqlite3.Row; sus tuplas también se indexan por posición
+                forma = FORMA_TUPLAS
+            return _forma_fila(filas, nombres, forma) if fetch_one else _dar_forma(filas, nombres, forma)
+
+    conn = get_db_connection()
+    if forma == FORMA_FILAS:
+        conn.row_factory = sqlite3.Row
     try:
         cursor = conn.cursor()
         cursor.execute(query, params)
-        
+        # Los nombres se leen una vez por consulta, no en cada fila
+        nombres = columnas or [d[0] for d in cursor.description or ()]
         if fetch_one:
-            result = cursor.fetchone()
-        else:
-            result = cursor.fetchall()
-            
-        # Si necesitamos convertir diccionarios a tuplas para compatibilidad
-        if as_dict and not fetch_one:
-            # Convertir cada diccionario en una lista/tupla basada en valores
-            result = [tuple(d.values()) for d in result]
-        
-        return result
+            return _forma_fila(cursor.fetchone(), nombres, forma)
+        return _dar_forma(cursor.fetchall(), nombres, forma)
+    finally:
+        conn.close()
+
+def iter_query(query, params=(), forma=FORMA_TUPLAS, tamano=TAMANO_LOTE, columnas=None):
+    """
+    Ejecuta una consulta en SQLite y devuelve sus filas por lotes de como mucho tamano filas, cada lote
+    en la forma pedida. La conexión sigue abierta mientras se recorre y se cierra al terminar o al
+    abandonar el generador, así que solo hay un lote en memoria.
+    """
+    if forma not in FORMAS:
+        raise ValueError(f"Forma desconocida: {forma!r}")
+    conn = get_db_connection()
+    if forma == FORMA_FILAS:
+        conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.cursor()
+        with span('consulta', 'iter_query'):
+            cursor.execute(query, params)
+        nombres = columnas or [d[0] for d in cursor.description or ()]
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                break
+            yield _dar_forma(filas, nombres, forma)
+            if len(filas) < tamano:
+                break
+        cursor.close()
     finally:
         conn.close()
 
@@ -78,4 +432,167 @@ def add_columns_to_corners_table():
         conn.rollback()
         return False, f"Error al modificar la base de datos: {e}"
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+# Tablas con claves ajenas, en el orden en que se reconstruyen
+TABLAS_CON_CLAVES = ('jugadores', 'partidos', 'corners', 'posiciones_jugadores')
+
+def _borrar_huerfanas(conn):
+    """Borra las filas que apuntan a filas que ya no existen; devuelve {tabla: filas borradas}"""
+    borradas = {}
+    # Borrar una fila huérfana puede dejar huérfanas a sus hijas, así que se repite hasta que no queda ninguna
+    while True:
+        filas = {}
+        for tabla, rowid, _, _ in conn.execute("PRAGMA foreign_key_check").fetchall():
+            filas.setdefault(tabla, set()).add(rowid)
+        if not filas:
+            return borradas
+        for tabla, rowids in filas.items():
+            conn.executemany(f"DELETE FROM {tabla} WHERE rowid = ?", [(r,) for r in rowids])
+            borradas[tabla] = borradas.get(tabla, 0) + len(rowids)
+
+def upgrade_foreign_keys():
+    """
+    Migra las bases de datos creadas antes de los borrados en cascada: reconstruye las tablas cuyas
+    claves ajenas no tienen ON DELETE CASCADE (con las mismas columnas y filas), borra las filas huérfanas
+    que dejaban los borrados a mano y crea los índices de las claves ajenas.
+    Devuelve {'reconstruidas': [tablas], 'huerfanas': {tabla: filas}}.
+    """
+    conn = get_db_connection()
+    try:
+        # Solo se puede desactivar fuera de una transacción; DROP TABLE no debe borrar en cascada
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("BEGIN")
+        reconstruidas = []
+        for tabla in TABLAS_CON_CLAVES:
+            claves = conn.execute(f"PRAGMA foreign_key_list({tabla})").fetchall()
+            if all(clave[6] == 'CASCADE' for clave in claves):
+                continue
+            # La definición guardada incluye las columnas añadidas después con ALTER TABLE
+            sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()[0]
+            sql = re.sub(r"(REFERENCES\s+\w+\s*\(\s*\w+\s*\))(\s+ON\s+DELETE\s+(SET\s+NULL|SET\s+DEFAULT|NO\s+ACTION|\w+))?",
+                         r"\1 ON DELETE CASCADE", sql, flags=re.IGNORECASE)
+            sql = re.sub(rf"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?[\"`]?{tabla}[\"`]?",
+                         f"CREATE TABLE {tabla}__migracion", sql, count=1, flags=re.IGNORECASE)
+            conn.execute(sql)
+            conn.execute(f"INSERT INTO {tabla}__migracion SELECT * FROM {tabla}")
+            conn.execute(f"DROP TABLE {tabla}")
+            conn.execute(f"ALTER TABLE {tabla}__migracion RENAME TO {tabla}")
+            reconstruidas.append(tabla)
+        huerfanas = _borrar_huerfanas(conn)
+        create_indexes(conn)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {'reconstruidas': reconstruidas, 'huerfanas': huerfanas}
+
+# --- Motor analítico opcional (DuckDB) ---
+
+_duckdb_lock = threading.Lock()
+# Una base de datos en memoria por origen y club: {(origen, ruta): {'conn', 'version'}}
+_duckdb_estado = {'conexiones': {}, 'fallido': set()}
+
+def _duckdb_module():
+    """Importa duckdb solo cuando se necesita (None si no está instalado)"""
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+def _sql_texto(valor):
+    return "'" + str(valor).replace("'", "''") + "'"
+
+def _crear_vistas_parquet(conn, manifest, destino):
+    """Crea una vista por tabla sobre los ficheros Parquet del manifiesto"""
+    tipos_duckdb = {'int64': 'BIGINT', 'float64': 'DOUBLE', 'string': 'VARCHAR'}
+    from utils.snapshots import TIPOS_PARTICION
+
+    for tabla, info in manifest['tablas'].items():
+        ficheros = [os.path.join(destino, p['fichero']) for p in info['particiones'].values()]
+        particiones = info['particionado_por']
+        if ficheros:
+            lista = '[' + ', '.join(_sql_texto(f) for f in ficheros) + ']'
+            opciones = ''
+            if particiones:
+                tipos = ', '.join(f"{_sql_texto(col)}: {_sql_texto(tipos_duckdb[TIPOS_PARTICION[col]])}" for col in particiones)
+                opciones = f", hive_partitioning = true, hive_types = {{{tipos}}}"
+            origen = f"SELECT * FROM read_parquet({lista}{opciones})"
+        else:
+            # Tabla vacía: vista sin filas con las columnas del manifiesto
+            columnas = [(col, tipo) for col, tipo in info['columnas']]
+            columnas += [(col, TIPOS_PARTICION[col]) for col in particiones]
+            origen = "SELECT " + ', '.join(f"CAST(NULL AS {tipos_duckdb[tipo]}) AS {col}" for col, tipo in columnas) + " WHERE false"
+        conn.execute(f"CREATE OR REPLACE VIEW {tabla} AS {origen}")
+
+def get_duckdb_connection(source=None):
+    """
+    Devuelve un cursor de DuckDB con las tablas de la aplicación visibles por su nombre, o None si
+    DuckDB no está instalado, el origen no se puede abrir o los snapshots no están al día.
+    """
+    source = source or ANALYTICS_SOURCE
+    duckdb = _duckdb_module()
+    if duckdb is None or source in _duckdb_estado['fallido']:
+        return None
+
+    with _duckdb_lock:
+        try:
+            if source == 'parquet':
+                from utils.snapshots import SNAPSHOT_DIR, load_manifest
+                destino = tenant_path(SNAPSHOT_DIR)
+                manifest = load_manifest(destino)
+                # Un snapshot desactualizado daría resultados distintos de SQLite
+                if manifest is None or manifest.get('data_version') != get_data_version():
+                    return None
+                version = manifest['data_version']
+            else:
+                version = None
+
+            clave = (source, os.path.abspath(database_path()))
+            estado = _duckdb_estado['conexiones'].get(clave)
+            if estado is None:
+                conn = duckdb.connect(':memory:')
+                if source == 'sqlite':
+                    conn.execute(f"ATTACH {_sql_texto(clave[1])} AS corners_db (TYPE SQLITE, READ_ONLY)")
+                    conn.execute("USE corners_db")
+                estado = _duckdb_estado['conexiones'][clave] = {'conn': conn, 'version': None}
+
+            if source == 'parquet' and estado['version'] != version:
+                _crear_vistas_parquet(estado['conn'], manifest, destino)
+                estado['version'] = version
+        except duckdb.Error:
+            # Por ejemplo, la extensión sqlite no está instalada y no hay red para descargarla
+            _duckdb_estado['fallido'].add(source)
+            return None
+
+        # Cada hilo usa su propio cursor sobre la misma base de datos en memoria
+        return estado['conn'].cursor()
+
+def execute_duckdb_query(query, params=(), fetch_one=False, source=None):
+    """
+    Ejecuta una consulta de solo lectura en DuckDB. Devuelve (resultado, columnas), con el resultado
+    como tupla o lista de tuplas, o None si DuckDB no está disponible o no acepta la consulta.
+    """
+    cursor = get_duckdb_connection(source)
+    if cursor is None:
+        return None
+
+    duckdb = _duckdb_module()
+    try:
+        with span('sql', _sql_span_name(query), motor='duckdb'):
+            inicio = time.perf_counter()
+            cursor.execute(query, list(params))
+            columnas = [d[0] for d in cursor.description]
+            result = cursor.fetchone() if fetch_one else cursor.fetchall()
+            duracion = (time.perf_counter() - inicio) * 1000
+    except duckdb.Error:
+        return None
+    finally:
+        cursor.close()
+    if query_log.QUERY_STATS:
+        filas = (result is not None) if fetch_one else len(result)
+        query_log.record_query(query, duracion, int(filas), params, motor='duckdb')
+    return result, columnas
@@ -0,0 +1,124 @@
+# Borrado de equipos, jugadores, partidos y corners. Las claves ajenas llevan ON DELETE CASCADE (ver
+# upgrade_foreign_keys en utils/db.py), así que cada borrado es un único DELETE y SQLite elimina las filas
+# dependientes siguiendo los índices de las claves ajenas, sin subconsultas por tabla.
+# Unos triggers temporales de la conexión cuentan las filas que la cascada borra de cada tabla.
+# Los partidos y corners se borran desde las páginas de forma lógica: solo se marcan con borrado_en (una
+# escritura pequeña que no bloquea la base de datos) y utils/compaction.py los purga fuera de horas punta.
+import time
+
+from utils.db import get_db_connection
+
+TABLAS = ('equipos', 'jugadores', 'partidos', 'corners', 'posiciones_jugadores')
+
+# Singular y plural de cada tabla para describir lo borrado
+NOMBRES = {
+    'equipos': ('equipo', 'equipos'),
+    'jugadores': ('jugador', 'jugadores'),
+    'partidos': ('partido', 'partidos'),
+    'corners': ('corner', 'corners'),
+    'posiciones_jugadores': ('posición', 'posiciones'),
+}
+
+def _preparar_contadores(conn):
+    """Tabla temporal con un contador por tabla y un trigger que lo incrementa en cada fila borrada"""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS borrados (tabla TEXT PRIMARY KEY, filas INTEGER NOT NULL)")
+    for tabla in TABLAS:
+        conn.execute(f"""
+            CREATE TEMP TRIGGER IF NOT EXISTS contar_{tabla} AFTER DELETE ON main.{tabla}
+            BEGIN
+                UPDATE borrados SET filas = filas + 1 WHERE tabla = '{tabla}';
+            END
+        """)
+    conn.execute("DELETE FROM borrados")
+    conn.executemany("INSERT INTO borrados (tabla, filas) VALUES (?, 0)", [(tabla,) for tabla in TABLAS])
+
+def delete_row(tabla, fila_id):
+    """
+    Borra una fila y, en cascada, todo lo que depende de ella, en una sola transacción.
+    Devuelve las filas borradas de cada tabla ({tabla: filas}, solo las tablas afectadas).
+    """
+    if tabla not in TABLAS:
+        raise ValueError(f"Tabla desconocida: {tabla}")
+    return _borrar(f"DELETE FROM {tabla} WHERE id = ?", (fila_id,))
+
+def _borrar(sentencia, parametros):
+    """Ejecuta un DELETE contando las filas que borra la cascada en cada tabla"""
+    conn = get_db_connection()
+    try:
+        _preparar_contadores(conn)
+        conn.execute(sentencia, parametros)
+        borrados = dict(conn.execute("SELECT tabla, filas FROM borrados WHERE filas > 0").fetchall())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {t: borrados[t] for t in TABLAS if t in borrados}
+
+def delete_team(equipo_id):
+    """Borra un equipo con sus jugadores, sus partidos y los corners y posiciones de estos"""
+    return delete_row('equipos', equipo_id)
+
+def delete_player(jugador_id):
+    """Borra un jugador y sus posiciones en corners"""
+    return delete_row('jugadores', jugador_id)
+
+def delete_match(partido_id):
+    """Borra un partido con sus corners y las posiciones registradas en ellos"""
+    return delete_row('partidos', partido_id)
+
+def delete_corner(corner_id):
+    """Borra un corner y sus posiciones"""
+    return delete_row('corners', corner_id)
+
+def _marcar_borrados(sentencias):
+    """Marca filas como borradas (borrado_en) en una sola transacción; devuelve {tabla: filas marcadas}"""
+    borrado_en = time.strftime('%Y-%m-%d %H:%M:%S')
+    conn = get_db_connection()
+    try:
+        marcados = {}
+        for tabla, sentencia, parametros in sentencias:
+            filas = conn.execute(sentencia, (borrado_en, *parametros)).rowcount
+            if filas > 0:
+                marcados[tabla] = marcados.get(tabla, 0) + filas
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return marcados
+
+def soft_delete_match(partido_id):
+    """Marca como borrados un partido y sus corners; sus posiciones se purgan con ellos al compactar"""
+    return _marcar_borrados([
+        ('partidos', "UPDATE partidos SET borrado_en = ? WHERE id = ? AND borrado_en IS NULL", (partido_id,)),
+        ('corners', "UPDATE corners SET borrado_en = ? WHERE partido_id = ? AND borrado_en IS NULL", (partido_id,)),
+    ])
+
+def soft_delete_corner(corner_id):
+    """Marca como borrado un corner; sus posiciones se purgan con él al compactar"""
+    return _marcar_borrados([
+        ('corners', "UPDATE corners SET borrado_en = ? WHERE id = ? AND borrado_en IS NULL", (corner_id,)),
+    ])
+
+def purge_marked(tabla, limite):
+    """
+    Borra en cascada hasta `limite` filas de partidos o corners marcadas como borradas (las más antiguas
+    primero). Devuelve las filas borradas de cada tabla; vacío cuando ya no queda ninguna marcada.
+    """
+    if tabla not in ('partidos', 'corners'):
+        raise ValueError(f"La tabla {tabla} no tiene borrado lógico")
+    return _borrar(f"""
+        DELETE FROM {tabla} WHERE id IN (
+            SELECT id FROM {tabla} WHERE borrado_en IS NOT NULL ORDER BY borrado_en LIMIT ?
+        )
+    """, (limite,))
+
+def describe_deleted(borrados):
+    """Texto con lo borrado, p. ej. '1 equipo, 22 jugadores, 4 partidos, 40 corners y 640 posiciones'"""
+    partes = [f"{filas} {NOMBRES[tabla][filas != 1]}" for tabla, filas in borrados.items()]
+    if not partes:
+        return "nada"
+    return partes[0] if len(partes) == 1 else ', '.join(partes[:-1]) + ' y ' + partes[-1]
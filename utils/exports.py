@@ -0,0 +1,290 @@
+# Exportación en streaming (CSV, JSON y XLSX) de las tablas de análisis: participaciones de un jugador,
+# corners lanzados y recibidos por un equipo y volcado de las posiciones de toda la liga.
+# Las filas se leen por lotes con iter_query y se escriben según llegan, así que la memoria no crece
+# con el tamaño del resultado. En la aplicación, el fichero se deja en static/exports/ y lo sirve el
+# servidor de ficheros estáticos de Streamlit por trozos (st.download_button cargaría todo en memoria).
+# Uso: python -m utils.exports posiciones_liga --formato csv --salida posiciones.csv
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import secrets
+import shutil
+import tempfile
+import time
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl es opcional: solo hace falta para exportar a XLSX
+    Workbook = None
+
+from utils.db import FORMA_TUPLAS, TAMANO_LOTE, iter_query
+
+# El rival de una posición o de un corner es el otro equipo del partido
+_RIVAL = "CASE WHEN p.equipo_local_id = {equipo} THEN p.equipo_visitante_id ELSE p.equipo_local_id END"
+
+_SELECT_CORNERS = f"""
+    SELECT c.id, p.fecha, e.nombre AS equipo, e_rival.nombre AS rival, c.minuto, c.tipo, c.resultado,
+           c.zona_caida, c.punto_caida
+    FROM corners c
+    JOIN partidos p ON c.partido_id = p.id
+    JOIN equipos e ON c.equipo_id = e.id
+    JOIN equipos e_rival ON e_rival.id = {_RIVAL.format(equipo='c.equipo_id')}
+"""
+
+# Cada exportación: consulta con parámetros con nombre, parámetros obligatorios y cabeceras
+EXPORTACIONES = {
+    'participacion_jugador': {
+        'sql': f"""
+            SELECT c.id, p.fecha, e_rival.nombre AS rival, c.minuto, pj.tipo, c.tipo, c.resultado, pj.rol,
+                   pj.x, pj.y, c.zona_caida, c.punto_caida
+            FROM posiciones_jugadores pj
+            JOIN corners c ON pj.corner_id = c.id
+            JOIN partidos p ON c.partido_id = p.id
+            JOIN equipos e_rival ON e_rival.id = {_RIVAL.format(equipo='pj.equipo_id')}
+            WHERE pj.jugador_id = :jugador_id AND (:tipo IS NULL OR pj.tipo = :tipo) AND c.borrado_en IS NULL
+            ORDER BY p.fecha DESC, c.id
+        """,
+        'parametros': ('jugador_id',),
+        'opcionales': {'tipo': None},
+        'columnas': ['Corner', 'Fecha', 'Rival', 'Minuto', 'Participación', 'Tipo Corner', 'Resultado', 'Rol',
+                     'X', 'Y', 'Zona de Caída', 'Punto de Caída'],
+    },
+    'corners_equipo': {
+        'sql': _SELECT_CORNERS + "WHERE c.equipo_id = :equipo_id AND c.borrado_en IS NULL ORDER BY p.fecha, c.minuto, c.id",
+        'parametros': ('equipo_id',),
+        'opcionales': {},
+        'columnas': ['Corner', 'Fecha', 'Equipo', 'Rival', 'Minuto', 'Tipo Corner', 'Resultado',
+                     'Zona de Caída', 'Punto de Caída'],
+    },
+    'corners_recibidos': {
+        'sql': _SELECT_CORNERS + f"WHERE {_RIVAL.format(equipo='c.equipo_id')} = :equipo_id AND c.borrado_en IS NULL ORDER BY p.fecha, c.minuto, c.id",
+        'parametros': ('equipo_id',),
+        'opcionales': {},
+        'columnas': ['Corner', 'Fecha', 'Equipo', 'Rival', 'Minuto', 'Tipo Corner', 'Resultado',
+                     'Zona de Caída', 'Punto de Caída'],
+    },
+    'posiciones_liga': {
+        'sql': """
+            SELECT pj.id, c.id, p.fecha, e.nombre, j.nombre, j.numero, pj.tipo, pj.rol, pj.x, pj.y,
+                   c.tipo, c.resultado, c.zona_caida
+            FROM posiciones_jugadores pj
+            JOIN corners c ON pj.corner_id = c.id
+            JOIN partidos p ON c.partido_id = p.id
+            JOIN jugadores j ON pj.jugador_id = j.id
+            JOIN equipos e ON pj.equipo_id = e.id
+            WHERE c.borrado_en IS NULL
+            ORDER BY pj.id
+        """,
+        'parametros': (),
+        'opcionales': {},
+        'columnas': ['Posición', 'Corner', 'Fecha', 'Equipo', 'Jugador', 'Número', 'Participación', 'Rol',
+                     'X', 'Y', 'Tipo Corner', 'Resultado', 'Zona de Caída'],
+    },
+}
+
+FORMATOS = {
+    'csv': ('csv', 'text/csv'),
+    'json': ('json', 'application/json'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+BLOQUE_FICHERO = 1 << 20  # trozos en los que se devuelve un XLSX ya escrito
+
+# Descargas de la aplicación: Streamlit sirve static/ (junto a app.py, con server.enableStaticServing en
+# .streamlit/config.toml) en app/static/. Cada descarga va en un directorio con un nombre aleatorio que
+# hace de contraseña del enlace y se borra pasada CADUCIDAD_DESCARGA_S
+DESCARGAS_DIR = os.path.join('static', 'exports')
+CADUCIDAD_DESCARGA_S = 15 * 60
+# Streamlit no sirve ficheros estáticos más grandes (MAX_APP_STATIC_FILE_SIZE)
+MAX_DESCARGA = 200 * 1024 * 1024
+
+def available_formats():
+    """Formatos de exportación disponibles (XLSX solo si openpyxl está instalado)"""
+    return [f for f in FORMATOS if f != 'xlsx' or Workbook is not None]
+
+def _require_openpyxl():
+    if Workbook is None:
+        raise RuntimeError("La exportación a XLSX necesita openpyxl (pip install openpyxl)")
+
+def _lotes(nombre, params, tamano):
+    """Lotes de filas (tuplas) de una exportación, comprobando sus parámetros"""
+    if nombre not in EXPORTACIONES:
+        raise ValueError(f"Exportación desconocida: {nombre}")
+    definicion = EXPORTACIONES[nombre]
+    faltan = [p for p in definicion['parametros'] if params.get(p) is None]
+    if faltan:
+        raise ValueError(f"Faltan parámetros para {nombre}: {', '.join(faltan)}")
+    valores = dict(definicion['opcionales'])
+    valores.update({p: params[p] for p in definicion['parametros']})
+    valores.update({p: params[p] for p in definicion['opcionales'] if params.get(p) is not None})
+    return iter_query(definicion['sql'], valores, forma=FORMA_TUPLAS, tamano=tamano)
+
+def stream_csv(lotes, columnas):
+    """CSV en UTF-8 con BOM (para que Excel respete los acentos), un trozo de bytes por lote"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode('utf-8')
+
+def _valor_json(valor):
+    # NaN e infinito no existen en JSON: se escriben como null
+    return None if isinstance(valor, float) and not math.isfinite(valor) else valor
+
+def stream_json(lotes, columnas):
+    """Lista JSON de objetos {columna: valor}, un trozo de bytes por lote"""
+    separador = '\n'
+    yield b'['
+    for lote in lotes:
+        trozo = ',\n'.join(json.dumps({c: _valor_json(v) for c, v in zip(columnas, fila)},
+                                       ensure_ascii=False, allow_nan=False) for fila in lote)
+        yield (separador + trozo).encode('utf-8')
+        separador = ',\n'
+    yield b'\n]\n'
+
+def stream_xlsx(lotes, columnas, hoja='Datos'):
+    """
+    Libro XLSX en modo de solo escritura de openpyxl (las filas van a un fichero temporal, no se
+    guardan en memoria). El formato es un zip, así que se devuelve por trozos una vez terminado.
+    """
+    _require_openpyxl()
+    libro = Workbook(write_only=True)
+    pagina = libro.create_sheet(hoja)
+    pagina.append(columnas)
+    for lote in lotes:
+        for fila in lote:
+            pagina.append(fila)
+    descriptor, ruta = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descriptor)
+    try:
+        libro.save(ruta)
+        with open(ruta, 'rb') as f:
+            while True:
+                trozo = f.read(BLOQUE_FICHERO)
+                if not trozo:
+                    break
+                yield trozo
+    finally:
+        os.remove(ruta)
+
+_ESCRITORES = {'csv': stream_csv, 'json': stream_json, 'xlsx': stream_xlsx}
+
+def export_rows(nombre, formato, tamano=TAMANO_LOTE, **params):
+    """Generador de trozos de bytes con la exportación en el formato pedido"""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    if formato == 'xlsx':
+        _require_openpyxl()
+    return _ESCRITORES[formato](_lotes(nombre, params, tamano), EXPORTACIONES[nombre]['columnas'])
+
+def export_to_file(nombre, formato, destino, tamano=TAMANO_LOTE, **params):
+    """Escribe la exportación en destino (escritura atómica) y devuelve los bytes escritos"""
+    if os.path.dirname(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = destino + '.tmp'
+    escritos = 0
+    try:
+        with open(temporal, 'wb') as f:
+            for trozo in export_rows(nombre, formato, tamano, **params):
+                f.write(trozo)
+                escritos += len(trozo)
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return escritos
+
+def export_file_name(nombre, formato, sufijo=''):
+    """Nombre de fichero para la descarga, p. ej. corners_equipo_3.csv"""
+    return f"{nombre}{'_' + sufijo if sufijo else ''}.{FORMATOS[formato][0]}"
+
+def purge_downloads(caducidad=CADUCIDAD_DESCARGA_S, ahora=None):
+    """Borra las descargas preparadas hace más de caducidad segundos; devuelve cuántas"""
+    ahora = ahora or time.time()
+    borradas = 0
+    try:
+        directorios = os.listdir(DESCARGAS_DIR)
+    except FileNotFoundError:
+        return 0
+    for nombre in directorios:
+        ruta = os.path.join(DESCARGAS_DIR, nombre)
+        try:
+            caducada = ahora - os.path.getmtime(ruta) > caducidad
+        except OSError:
+            continue
+        if caducada:
+            shutil.rmtree(ruta, ignore_errors=True)
+            borradas += 1
+    return borradas
+
+def prepare_download(nombre, formato, sufijo='', **params):
+    """
+    Escribe la exportación en un directorio nuevo de DESCARGAS_DIR y devuelve (ruta del fichero, URL
+    relativa con la que la sirve Streamlit)
+    """
+    purge_downloads()
+    ficha = secrets.token_urlsafe(24)
+    fichero = export_file_name(nombre, formato, sufijo)
+    ruta = os.path.join(DESCARGAS_DIR, ficha, fichero)
+    try:
+        export_to_file(nombre, formato, ruta, **params)
+    except BaseException:
+        shutil.rmtree(os.path.dirname(ruta), ignore_errors=True)
+        raise
+    return ruta, f"app/static/exports/{ficha}/{fichero}"
+
+def render_export(nombre, clave, sufijo='', **params):
+    """
+    Selector de formato y enlace de descarga en Streamlit. La exportación solo se genera al pulsar
+    "Preparar descarga"; se escribe por lotes en static/exports/ y el navegador la descarga del servidor
+    de ficheros estáticos, que la lee del disco por trozos. (st.download_button guardaría el resultado
+    entero en la memoria del servidor.) El enlace caduca a los CADUCIDAD_DESCARGA_S segundos.
+    """
+    import html
+
+    import streamlit as st
+
+    col_formato, col_boton = st.columns([1, 2])
+    with col_formato:
+        formato = st.selectbox("Formato", available_formats(), key=f"{clave}_formato")
+    with col_boton:
+        if not st.button("Preparar descarga", key=f"{clave}_preparar"):
+            return
+        if not st.get_option('server.enableStaticServing'):
+            st.error("Las descargas necesitan server.enableStaticServing = true (ver .streamlit/config.toml)")
+            return
+        ruta, url = prepare_download(nombre, formato, sufijo, **params)
+        if os.path.getsize(ruta) > MAX_DESCARGA:
+            shutil.rmtree(os.path.dirname(ruta), ignore_errors=True)
+            st.error(f"La exportación supera {MAX_DESCARGA // (1024 * 1024)} MB; genérala con "
+                     f"python -m utils.exports {nombre}")
+            return
+        fichero = html.escape(os.path.basename(ruta))
+        st.markdown(f'<a href="{url}" download="{fichero}">Descargar {fichero}</a>', unsafe_allow_html=True)
+        st.caption(f"El enlace caduca en {CADUCIDAD_DESCARGA_S // 60} minutos.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta una tabla de análisis en CSV, JSON o XLSX")
+    parser.add_argument('exportacion', choices=sorted(EXPORTACIONES))
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+    parser.add_argument('--salida', required=True, help="Fichero a escribir")
+    parser.add_argument('--jugador', type=int, dest='jugador_id')
+    parser.add_argument('--equipo', type=int, dest='equipo_id')
+    parser.add_argument('--tipo', choices=['Ofensivo', 'Defensivo'], help="Solo participaciones de este tipo")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Filas leídas de cada vez")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    escritos = export_to_file(args.exportacion, args.formato, args.salida, args.lote,
+                              jugador_id=args.jugador_id, equipo_id=args.equipo_id, tipo=args.tipo)
+    print(f"{args.salida}: {escritos / 1e6:.1f} MB ({time.perf_counter() - inicio:.2f}s)")
+
+if __name__ == '__main__':
+    main()
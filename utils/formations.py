@@ -0,0 +1,289 @@
+# Búsqueda de corners parecidos por la colocación de los jugadores. Cada corner da dos vectores de
+# longitud fija, uno por bando (ofensivo y defensivo): las coordenadas de sus jugadores ordenados por rol
+# y, dentro del rol, por posición, con los corners desde la izquierda reflejados para que todos se lancen
+# desde el mismo lado. Un árbol k-d por bando (utils/kdtree.py) devuelve los corners más cercanos a una
+# colocación dada y sus resultados. El índice se construye desde el almacén de posiciones y se reutiliza
+# mientras no cambien los datos.
+# Uso: python -m utils.formations --corner ID [--tipo Defensivo] [-k 10] [--club CLUB] [--medir 200]
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+
+from utils.categories import CATEGORIAS
+from utils.db import get_db_connection
+from utils.kdtree import KDTree, brute_force
+from utils.position_store import POSITIONS_DIR, load_position_store
+from utils.tenancy import tenant_path, use_tenant
+
+# Huecos por vector: los jugadores que pasen se descartan y los que falten se rellenan con el centro
+# del grupo, que no desplaza el vector hacia ninguna posición concreta
+JUGADORES = 10
+# Ancho del campo en las coordenadas de la aplicación (para reflejar los corners desde la izquierda)
+ANCHO_CAMPO = 100
+TIPOS = ('Ofensivo', 'Defensivo')
+
+# Punto de caída ya reflejado como la colocación (NaN si no se registró)
+CORNER_DTYPE = np.dtype([('corner_id', '<i4'), ('equipo_id', '<i4'), ('izquierda', '?'), ('resultado', 'u1'),
+                         ('zona', 'u1'), ('caida_x', '<f4'), ('caida_y', '<f4')])
+SIN_CODIGO = 255
+
+_SELECT_CORNERS = """
+    SELECT c.id, c.equipo_id, c.tipo, c.resultado, c.zona_caida, c.punto_caida
+    FROM corners c
+    WHERE c.borrado_en IS NULL {filtro}
+    ORDER BY c.id
+"""
+
+def _codigo(valor, dominio):
+    try:
+        return CATEGORIAS[dominio].index(valor)
+    except ValueError:
+        return SIN_CODIGO
+
+def _punto(texto):
+    """Punto de caída "x,y" como (x, y); (NaN, NaN) si falta o no tiene ese formato"""
+    try:
+        x, y = str(texto).split(',')
+        return float(x), float(y)
+    except ValueError:
+        return np.nan, np.nan
+
+def load_corners(equipo_id=None):
+    """
+    Datos de cada corner vigente que acompañan a los vecinos (ordenados por corner_id). Con equipo_id,
+    solo los corners que lanza ese equipo.
+    """
+    conn = get_db_connection()
+    try:
+        if equipo_id is None:
+            filas = conn.execute(_SELECT_CORNERS.format(filtro='')).fetchall()
+        else:
+            filas = conn.execute(_SELECT_CORNERS.format(filtro='AND c.equipo_id = ?'), (equipo_id,)).fetchall()
+    finally:
+        conn.close()
+    corners = np.empty(len(filas), dtype=CORNER_DTYPE)
+    if filas:
+        ids, equipos, tipos, resultados, zonas, puntos = zip(*filas)
+        corners['corner_id'] = ids
+        corners['equipo_id'] = [-1 if e is None else e for e in equipos]
+        corners['izquierda'] = [t == 'Izquierda' for t in tipos]
+        corners['resultado'] = [_codigo(r, 'resultado') for r in resultados]
+        corners['zona'] = [_codigo(z, 'zona') for z in zonas]
+        caidas = np.array([_punto(p) for p in puntos], dtype=np.float64)
+        caidas[corners['izquierda'], 0] = ANCHO_CAMPO - caidas[corners['izquierda'], 0]
+        corners['caida_x'], corners['caida_y'] = caidas[:, 0], caidas[:, 1]
+    return corners
+
+def _vectores(grupos, roles, xy, n_grupos):
+    """
+    Vectores (n_grupos, 2 * JUGADORES) y rol de cada hueco (n_grupos, JUGADORES; SIN_CODIGO si está vacío)
+    a partir de las posiciones de cada grupo, que deben venir ya ordenadas por grupo, rol y coordenadas
+    """
+    vectores = np.full((n_grupos, JUGADORES, 2), np.nan)
+    roles_huecos = np.full((n_grupos, JUGADORES), SIN_CODIGO, dtype='u1')
+    if len(grupos):
+        inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+        rango = np.arange(len(grupos)) - np.repeat(inicios, np.diff(np.r_[inicios, len(grupos)]))
+        dentro = rango < JUGADORES
+        vectores[grupos[dentro], rango[dentro]] = xy[dentro]
+        roles_huecos[grupos[dentro], rango[dentro]] = roles[dentro]
+    centros = np.nanmean(vectores, axis=1, keepdims=True)
+    vectores = np.where(np.isnan(vectores), centros, vectores)
+    return vectores.reshape(n_grupos, 2 * JUGADORES), roles_huecos
+
+def layout_vector(colocacion, izquierda=False, codigos_rol=None):
+    """
+    Vector de una colocación dada como [(rol, x, y)], con la misma forma que los del índice.
+    codigos_rol traduce los roles a los códigos del almacén (por defecto, los del catálogo).
+    """
+    codigos_rol = codigos_rol or CATEGORIAS['rol']
+    filas = [(codigos_rol.index(rol), float(x), float(y)) for rol, x, y in colocacion]
+    if not filas:
+        raise ValueError("La colocación no tiene jugadores")
+    datos = np.array(filas)
+    if izquierda:
+        datos[:, 1] = ANCHO_CAMPO - datos[:, 1]
+    datos = datos[np.lexsort((datos[:, 2], datos[:, 1], datos[:, 0]))]
+    return _vectores(np.zeros(len(datos), dtype=np.int64), datos[:, 0], datos[:, 1:], 1)[0][0]
+
+def _colocaciones(posiciones, corners, codigo_tipo):
+    """
+    Vectores de colocación de un bando a partir de posiciones del almacén: (filas en corners de cada
+    vector, vectores, rol de cada hueco, equipo de cada vector). Los corners desde la izquierda se
+    reflejan y las posiciones de corners que no están en corners se descartan.
+    """
+    validas = ~(np.isnan(posiciones['x']) | np.isnan(posiciones['y']))
+    if codigo_tipo is None:
+        validas[:] = False
+    else:
+        validas &= posiciones['tipo'] == codigo_tipo
+    posiciones = posiciones[validas]
+    # Solo las posiciones de corners conocidos (el almacén y la tabla corners pueden ir desfasados un instante)
+    fila = np.searchsorted(corners['corner_id'], posiciones['corner_id'])
+    fila = np.minimum(fila, max(len(corners) - 1, 0))
+    conocidas = (corners['corner_id'][fila] == posiciones['corner_id']) if len(corners) else np.zeros(len(posiciones), bool)
+    posiciones, fila = posiciones[conocidas], fila[conocidas]
+    x = posiciones['x'].astype(np.float64)
+    izquierda = corners['izquierda'][fila]
+    x[izquierda] = ANCHO_CAMPO - x[izquierda]
+    y = posiciones['y'].astype(np.float64)
+
+    orden = np.lexsort((y, x, posiciones['rol'], fila))
+    filas = fila[orden]
+    corners_tipo, grupos = np.unique(filas, return_inverse=True)
+    vectores, roles = _vectores(grupos, posiciones['rol'][orden], np.column_stack([x[orden], y[orden]]),
+                                len(corners_tipo))
+    # Equipo del bando (el que defiende en los vectores defensivos)
+    primeras = np.searchsorted(filas, corners_tipo)
+    equipos = posiciones['equipo_id'][orden][primeras] if len(primeras) else np.empty(0, '<i4')
+    return corners_tipo, vectores, roles, equipos
+
+def team_layouts(store, corners, equipo_id, tipo='Ofensivo'):
+    """
+    Vectores de colocación de un equipo en un bando, sin construir el índice completo: solo se leen las
+    posiciones del equipo en el almacén. Devuelve (filas en corners, vectores, rol de cada hueco).
+    """
+    filas, vectores, roles, _ = _colocaciones(store.equipo(equipo_id, tipo), corners, store.codigo('tipo', tipo))
+    return filas, vectores, roles
+
+class FormationIndex:
+    """Vectores de colocación de cada corner y bando, con un árbol k-d por bando"""
+
+    def __init__(self, store, corners):
+        self.corners = corners
+        self.codigos_rol = store.codigos['rol']
+        # Por bando: vectores, rol de cada hueco, corner (id y fila en corners) y equipo de cada vector
+        self.vectores, self.roles, self.ids, self.filas, self.equipos, self.arboles = {}, {}, {}, {}, {}, {}
+        for tipo in TIPOS:
+            corners_tipo, self.vectores[tipo], self.roles[tipo], self.equipos[tipo] = _colocaciones(
+                store.posiciones, corners, store.codigo('tipo', tipo))
+            self.ids[tipo] = corners['corner_id'][corners_tipo]
+            self.filas[tipo] = corners_tipo
+            self.arboles[tipo] = KDTree(self.vectores[tipo]) if len(corners_tipo) else None
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.ids.values())
+
+    def vector(self, corner_id, tipo):
+        """Vector de colocación de un corner en un bando (None si no tiene posiciones de ese bando)"""
+        ids = self.ids[tipo]
+        i = np.searchsorted(ids, corner_id)
+        return self.vectores[tipo][i] if i < len(ids) and ids[i] == corner_id else None
+
+    def query(self, vector, tipo='Defensivo', k=10, equipo_id=None, excluir=None):
+        """
+        Los k corners cuya colocación en el bando indicado más se parece al vector, del más parecido al
+        menos. Con equipo_id solo se buscan los de ese equipo (en ese bando), por fuerza bruta: son pocos.
+        Cada vecino lleva su distancia media por jugador y el resultado y zona de caída del corner.
+        """
+        arbol = self.arboles[tipo]
+        if arbol is None:
+            return []
+        extra = 1 if excluir is not None else 0
+        if equipo_id is None:
+            indices, distancias = arbol.query(vector, k + extra)
+        else:
+            candidatos = np.flatnonzero(self.equipos[tipo] == equipo_id)
+            indices, distancias = brute_force(self.vectores[tipo][candidatos], vector, k + extra)
+            indices = candidatos[indices]
+        vecinos = []
+        for indice, distancia in zip(indices, distancias):
+            corner_id = int(self.ids[tipo][indice])
+            if corner_id == excluir:
+                continue
+            corner = self.corners[self.filas[tipo][indice]]
+            vecinos.append({
+                'corner_id': corner_id,
+                'equipo_id': int(self.equipos[tipo][indice]),
+                # Distancia media por jugador, en las unidades del campo
+                'distancia': float(distancia / np.sqrt(JUGADORES)),
+                'resultado': _texto(corner['resultado'], 'resultado'),
+                'zona_caida': _texto(corner['zona'], 'zona'),
+                'lado': 'Izquierda' if corner['izquierda'] else 'Derecha',
+            })
+        return vecinos[:k]
+
+    def similar_corners(self, corner_id, tipo='Defensivo', k=10, equipo_id=None):
+        """Los k corners más parecidos a uno dado en el bando indicado (sin incluirlo)"""
+        vector = self.vector(corner_id, tipo)
+        if vector is None:
+            return []
+        return self.query(vector, tipo, k, equipo_id, excluir=corner_id)
+
+    def query_layout(self, colocacion, tipo='Defensivo', k=10, izquierda=False, equipo_id=None):
+        """Los k corners más parecidos a una colocación dada como [(rol, x, y)]"""
+        return self.query(layout_vector(colocacion, izquierda, self.codigos_rol), tipo, k, equipo_id)
+
+def _texto(codigo, dominio):
+    return CATEGORIAS[dominio][codigo] if codigo != SIN_CODIGO else None
+
+def outcome_rates(vecinos):
+    """Proporción de cada resultado entre los vecinos ({resultado: proporción}, de más a menos frecuente)"""
+    if not vecinos:
+        return {}
+    cuentas = {}
+    for vecino in vecinos:
+        cuentas[vecino['resultado']] = cuentas.get(vecino['resultado'], 0) + 1
+    return {resultado: n / len(vecinos) for resultado, n in sorted(cuentas.items(), key=lambda c: -c[1])}
+
+_indice_lock = threading.Lock()
+_indices = {}
+
+def load_formation_index(destino=None):
+    """Índice de colocaciones del club actual; se reconstruye solo cuando cambia el almacén de posiciones"""
+    destino = destino or tenant_path(POSITIONS_DIR)
+    store = load_position_store(destino)
+    clave = store.meta['generacion']
+    with _indice_lock:
+        indice = _indices.get(destino)
+        if indice is None or indice[0] != clave:
+            indice = (clave, FormationIndex(store, load_corners()))
+            _indices[destino] = indice
+        return indice[1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Corners con una colocación parecida a la de uno dado")
+    parser.add_argument('--corner', type=int, help="Corner de referencia (por defecto, el último)")
+    parser.add_argument('--tipo', choices=TIPOS, default='Defensivo', help="Bando que se compara")
+    parser.add_argument('-k', type=int, default=10, help="Número de corners parecidos")
+    parser.add_argument('--equipo', type=int, help="Buscar solo entre los corners de este equipo en ese bando")
+    parser.add_argument('--club', help="Club cuyos datos se usan (por defecto, la base principal)")
+    parser.add_argument('--medir', type=int, default=0, metavar='N',
+                        help="Mide N búsquedas con el árbol frente a recorrer todos los corners")
+    args = parser.parse_args(argv)
+
+    with use_tenant(args.club):
+        inicio = time.perf_counter()
+        indice = load_formation_index()
+        print(f"Índice: {len(indice)} colocaciones en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        ids = indice.ids[args.tipo]
+        if len(ids) == 0:
+            print(f"No hay corners con posiciones del bando {args.tipo}", file=sys.stderr)
+            return 1
+        corner_id = args.corner if args.corner is not None else int(ids[-1])
+        inicio = time.perf_counter()
+        vecinos = indice.similar_corners(corner_id, args.tipo, args.k, args.equipo)
+        duracion = (time.perf_counter() - inicio) * 1000
+        print(f"Corners parecidos al {corner_id} ({args.tipo}) en {duracion:.1f} ms:")
+        for vecino in vecinos:
+            print(f"  {vecino['corner_id']:>7}  equipo {vecino['equipo_id']:>4}  {vecino['distancia']:6.2f}  "
+                  f"{vecino['lado']:9}  {vecino['resultado'] or '-':16} {vecino['zona_caida'] or '-'}")
+        for resultado, proporcion in outcome_rates(vecinos).items():
+            print(f"  {resultado or '-':16} {proporcion:.0%}")
+
+        if args.medir:
+            rng = np.random.default_rng(0)
+            consultas = indice.vectores[args.tipo][rng.integers(0, len(ids), args.medir)]
+            for nombre, buscar in (('árbol k-d', lambda v: indice.arboles[args.tipo].query(v, args.k)),
+                                   ('fuerza bruta', lambda v: brute_force(indice.vectores[args.tipo], v, args.k))):
+                inicio = time.perf_counter()
+                for vector in consultas:
+                    buscar(vector)
+                print(f"{nombre}: {(time.perf_counter() - inicio) * 1000 / args.medir:.2f} ms por búsqueda")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
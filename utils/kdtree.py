@@ -0,0 +1,116 @@
+# Árbol k-d en NumPy para buscar los vecinos más cercanos de un vector entre decenas de miles. Los nodos
+# viven en arrays (sin objetos por nodo) y cada hoja agrupa HOJA puntos contiguos, cuya distancia se
+# calcula de una vez; la búsqueda recorre los nodos por su distancia mínima a la consulta y se detiene
+# en cuanto ninguno puede mejorar los k mejores.
+import heapq
+
+import numpy as np
+
+# Puntos por hoja. Con vectores de ~20 dimensiones las cajas apenas descartan nodos si los datos no
+# forman grupos, así que las hojas son grandes: en el peor caso la búsqueda cuesta lo que recorrerlo
+# todo y, cuando las colocaciones se repiten (rutinas), solo se visitan unas pocas hojas
+HOJA = 1024
+
+class KDTree:
+    """Árbol k-d exacto con distancia euclídea sobre las filas de un array (n, d)"""
+
+    def __init__(self, puntos, hoja=HOJA):
+        puntos = np.asarray(puntos, dtype=np.float64)
+        if puntos.ndim != 2:
+            raise ValueError("Los puntos deben ser un array (n, d)")
+        self.n, self.d = puntos.shape
+        self.orden = np.arange(self.n)
+        inicios, fines, izquierdos, derechos = [], [], [], []
+        # Cada nodo cubre orden[inicio:fin]; los hijos se añaden al recorrer la pila
+        pila = [(0, self.n, -1, False)]
+        while pila:
+            inicio, fin, padre, es_derecho = pila.pop()
+            nodo = len(inicios)
+            inicios.append(inicio)
+            fines.append(fin)
+            izquierdos.append(-1)
+            derechos.append(-1)
+            if padre >= 0:
+                (derechos if es_derecho else izquierdos)[padre] = nodo
+            if fin - inicio <= hoja:
+                continue
+            indices = self.orden[inicio:fin]
+            bloque = puntos[indices]
+            # Se corta por la dimensión más extendida, en la mediana
+            dimension = int(np.argmax(bloque.max(axis=0) - bloque.min(axis=0)))
+            mitad = (fin - inicio) // 2
+            particion = np.argpartition(bloque[:, dimension], mitad)
+            self.orden[inicio:fin] = indices[particion]
+            pila.append((inicio + mitad, fin, nodo, True))
+            pila.append((inicio, inicio + mitad, nodo, False))
+        self.inicios = np.array(inicios, dtype=np.int64)
+        self.fines = np.array(fines, dtype=np.int64)
+        self.izquierdos = np.array(izquierdos, dtype=np.int64)
+        self.derechos = np.array(derechos, dtype=np.int64)
+        # Los puntos se guardan en el orden del árbol para que cada hoja sea un bloque contiguo, con sus
+        # normas al cuadrado: la distancia de una hoja es entonces un producto matriz-vector
+        self.puntos = puntos[self.orden]
+        self.normas = np.einsum('ij,ij->i', self.puntos, self.puntos)
+        # Caja de cada nodo: con ella la cota de distancia es mucho más ajustada que con el plano de corte
+        self.minimos = np.empty((len(inicios), self.d))
+        self.maximos = np.empty((len(inicios), self.d))
+        for nodo in range(len(inicios)):
+            bloque = self.puntos[inicios[nodo]:fines[nodo]]
+            if len(bloque):
+                self.minimos[nodo] = bloque.min(axis=0)
+                self.maximos[nodo] = bloque.max(axis=0)
+            else:
+                self.minimos[nodo] = np.inf
+                self.maximos[nodo] = -np.inf
+
+    def _cota(self, nodo, consulta):
+        """Distancia al cuadrado mínima entre la consulta y la caja del nodo"""
+        exceso = np.maximum(self.minimos[nodo] - consulta, 0) + np.maximum(consulta - self.maximos[nodo], 0)
+        return float(exceso @ exceso)
+
+    def query(self, consulta, k=10):
+        """Índices (en el array original) y distancias de los k puntos más cercanos, del más cercano al más lejano"""
+        consulta = np.asarray(consulta, dtype=np.float64)
+        k = min(k, self.n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        norma = float(consulta @ consulta)
+        mejores_d = np.empty(0)
+        mejores_i = np.empty(0, dtype=np.int64)
+        limite = np.inf
+        pendientes = [(0.0, 0)]
+        while pendientes:
+            cota, nodo = heapq.heappop(pendientes)
+            if cota > limite:
+                break
+            izquierdo = self.izquierdos[nodo]
+            if izquierdo < 0:
+                inicio, fin = self.inicios[nodo], self.fines[nodo]
+                distancias = self.normas[inicio:fin] - 2 * (self.puntos[inicio:fin] @ consulta) + norma
+                mejores_d = np.concatenate([mejores_d, distancias])
+                mejores_i = np.concatenate([mejores_i, np.arange(inicio, fin)])
+                if len(mejores_d) > k:
+                    seleccion = np.argpartition(mejores_d, k - 1)[:k]
+                    mejores_d, mejores_i = mejores_d[seleccion], mejores_i[seleccion]
+                if len(mejores_d) == k:
+                    limite = mejores_d.max()
+                continue
+            for hijo in (izquierdo, self.derechos[nodo]):
+                cota_hijo = self._cota(hijo, consulta)
+                if cota_hijo <= limite:
+                    heapq.heappush(pendientes, (cota_hijo, int(hijo)))
+        orden = np.argsort(mejores_d, kind='stable')
+        # El redondeo puede dejar distancias minúsculamente negativas
+        return self.orden[mejores_i[orden]], np.sqrt(np.maximum(mejores_d[orden], 0))
+
+def brute_force(puntos, consulta, k=10):
+    """Los k vecinos más cercanos recorriendo todos los puntos (referencia para comprobar el árbol)"""
+    puntos = np.asarray(puntos, dtype=np.float64)
+    diferencia = puntos - np.asarray(consulta, dtype=np.float64)
+    distancias = np.einsum('ij,ij->i', diferencia, diferencia)
+    k = min(k, len(puntos))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    seleccion = np.argpartition(distancias, k - 1)[:k]
+    seleccion = seleccion[np.argsort(distancias[seleccion], kind='stable')]
+    return seleccion, np.sqrt(distancias[seleccion])
@@ -0,0 +1,42 @@
+# Importación diferida de librerías pesadas (matplotlib, seaborn, PIL): el módulo se carga la primera
+# vez que se usa uno de sus atributos, no al importar la página o el módulo de utils que lo declara.
+# Así la comprobación de sesión, los selectores y los resúmenes cacheados no pagan su tiempo de carga.
+import importlib
+import sys
+import types
+
+class LazyModule(types.ModuleType):
+    """Sustituto de un módulo que lo importa al acceder al primer atributo"""
+
+    def __init__(self, nombre):
+        super().__init__(nombre)
+        self.__dict__['_modulo'] = None
+
+    def _cargar(self):
+        modulo = self.__dict__['_modulo']
+        if modulo is None:
+            # import_module ya serializa las importaciones concurrentes (hilos de gráficos)
+            modulo = importlib.import_module(self.__name__)
+            self.__dict__['_modulo'] = modulo
+        return modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __dir__(self):
+        return dir(self._cargar())
+
+    def __repr__(self):
+        estado = 'cargado' if self.__dict__['_modulo'] is not None else 'sin cargar'
+        return f"<módulo diferido {self.__name__!r} ({estado})>"
+
+def lazy_import(nombre):
+    """Devuelve el módulo si ya está importado o un LazyModule que lo importará cuando se use"""
+    modulo = sys.modules.get(nombre)
+    if modulo is not None:
+        return modulo
+    return LazyModule(nombre)
+
+def is_loaded(nombre):
+    """Indica si un módulo ya se ha importado de verdad (no cuenta un LazyModule sin usar)"""
+    return nombre in sys.modules
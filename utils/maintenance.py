@@ -0,0 +1,206 @@
+# Mantenimiento nocturno de la base de datos: ANALYZE (rellena sqlite_stat1, sin lo que el planificador
+# elige el orden de los joins a ciegas), PRAGMA optimize, comprobación de integridad y de claves ajenas y
+# checkpoint del WAL si la base lo usa. Cada ejecución guarda en historial_mantenimiento lo que ha tardado
+# cada tarea y las filas y bytes de cada tabla, para seguir el crecimiento de los datos.
+# El hilo de compactación (utils/compaction.py) lo lanza cada noche después de purgar lo borrado.
+# Uso: python -m utils.maintenance [--club CLUB | --todos] [--integridad-completa] [--historial [N]]
+import argparse
+import datetime
+import sqlite3
+import sys
+import time
+
+from utils.db import get_db_connection
+from utils.tenancy import current_tenant, list_tenants, use_tenant
+
+ESQUEMA_HISTORIAL = '''
+    CREATE TABLE IF NOT EXISTS historial_mantenimiento (
+        id INTEGER PRIMARY KEY,
+        ejecucion TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        nombre TEXT NOT NULL,
+        filas INTEGER,
+        bytes INTEGER,
+        duracion_ms REAL,
+        resultado TEXT
+    )
+'''
+# tipo: 'tarea' (duracion_ms y resultado de cada paso) o 'tabla' (filas y bytes, índices incluidos)
+TIPO_TAREA = 'tarea'
+TIPO_TABLA = 'tabla'
+
+# Mensajes de integridad que se guardan como mucho en el resultado
+MAX_MENSAJES = 5
+
+def _integridad(conn, completa):
+    # quick_check no compara los índices con las tablas, pero es mucho más rápido que integrity_check
+    pragma = 'integrity_check' if completa else 'quick_check'
+    mensajes = [fila[0] for fila in conn.execute(f"PRAGMA {pragma}({MAX_MENSAJES})")]
+    return 'ok' if mensajes == ['ok'] else '; '.join(mensajes)
+
+def _claves_ajenas(conn):
+    huerfanas = {}
+    for tabla, *_ in conn.execute("PRAGMA foreign_key_check"):
+        huerfanas[tabla] = huerfanas.get(tabla, 0) + 1
+    if not huerfanas:
+        return 'ok'
+    return ', '.join(f"{filas} filas huérfanas en {tabla}" for tabla, filas in huerfanas.items())
+
+def _checkpoint(conn):
+    if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != 'wal':
+        return 'sin WAL'
+    ocupado, paginas, copiadas = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return f"{copiadas}/{paginas} páginas{' (ocupado)' if ocupado else ''}"
+
+def _analyze(conn):
+    conn.execute("ANALYZE")
+    return f"{conn.execute('SELECT COUNT(*) FROM sqlite_stat1').fetchone()[0]} estadísticas"
+
+def _optimize(conn):
+    conn.execute("PRAGMA optimize")
+    return 'ok'
+
+def table_sizes(conn):
+    """Filas y bytes (con sus índices; None si SQLite no trae dbstat) de cada tabla: [(tabla, filas, bytes)]"""
+    tablas = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    try:
+        bytes_tabla = dict(conn.execute("""
+            SELECT m.tbl_name, SUM(s.pgsize)
+            FROM dbstat s
+            JOIN sqlite_master m ON s.name = m.name
+            GROUP BY m.tbl_name
+        """).fetchall())
+    except sqlite3.OperationalError:
+        bytes_tabla = {}
+    return [(tabla, conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0], bytes_tabla.get(tabla))
+            for tabla in tablas]
+
+def run_maintenance(integridad_completa=False):
+    """
+    Ejecuta el mantenimiento de la base de datos del club actual (o la principal) y lo guarda en el
+    historial. Devuelve {'club', 'ejecucion', 'tareas': [(tarea, ms, resultado)], 'tablas': [...]}.
+    """
+    tareas = [
+        ('integridad', lambda conn: _integridad(conn, integridad_completa)),
+        ('claves_ajenas', _claves_ajenas),
+        ('analyze', _analyze),
+        ('optimize', _optimize),
+        ('checkpoint', _checkpoint),
+    ]
+    ejecucion = datetime.datetime.now().isoformat(sep=' ', timespec='milliseconds')
+    conn = get_db_connection()
+    try:
+        resultados = []
+        for nombre, tarea in tareas:
+            inicio = time.perf_counter()
+            try:
+                resultado = tarea(conn)
+            except sqlite3.Error as e:
+                resultado = f"error: {e}"
+            resultados.append((nombre, round((time.perf_counter() - inicio) * 1000, 1), resultado))
+        conn.execute(ESQUEMA_HISTORIAL)
+        tablas = table_sizes(conn)
+        conn.executemany(
+            "INSERT INTO historial_mantenimiento (ejecucion, tipo, nombre, duracion_ms, resultado) VALUES (?, ?, ?, ?, ?)",
+            [(ejecucion, TIPO_TAREA, nombre, ms, resultado) for nombre, ms, resultado in resultados])
+        conn.executemany(
+            "INSERT INTO historial_mantenimiento (ejecucion, tipo, nombre, filas, bytes) VALUES (?, ?, ?, ?, ?)",
+            [(ejecucion, TIPO_TABLA, tabla, filas, bytes_) for tabla, filas, bytes_ in tablas])
+        conn.commit()
+    finally:
+        conn.close()
+    return {'club': current_tenant(), 'ejecucion': ejecucion, 'tareas': resultados, 'tablas': tablas}
+
+def maintain_all(integridad_completa=False):
+    """Mantenimiento de la base principal y de la de cada club; un fallo en una no detiene las demás"""
+    resumenes = []
+    for club in [None] + list_tenants():
+        with use_tenant(club):
+            try:
+                resumenes.append(run_maintenance(integridad_completa))
+            except (sqlite3.Error, OSError) as e:
+                resumenes.append({'club': club, 'error': str(e)})
+    return resumenes
+
+def load_history(ejecuciones=10):
+    """
+    Filas y bytes de cada tabla en las últimas ejecuciones, de la más antigua a la más reciente:
+    {'ejecuciones': [fechas], 'tablas': {tabla: [(filas, bytes) o None por ejecución]}}
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute(ESQUEMA_HISTORIAL)
+        fechas = [fila[0] for fila in conn.execute(
+            "SELECT DISTINCT ejecucion FROM historial_mantenimiento ORDER BY ejecucion DESC LIMIT ?", (ejecuciones,))]
+        fechas.reverse()
+        tablas = {}
+        if fechas:
+            filas = conn.execute(
+                "SELECT ejecucion, nombre, filas, bytes FROM historial_mantenimiento WHERE tipo = ? AND ejecucion >= ?",
+                (TIPO_TABLA, fechas[0])).fetchall()
+            posicion = {fecha: i for i, fecha in enumerate(fechas)}
+            for ejecucion, tabla, n, bytes_ in filas:
+                tablas.setdefault(tabla, [None] * len(fechas))[posicion[ejecucion]] = (n, bytes_)
+    finally:
+        conn.close()
+    return {'ejecuciones': fechas, 'tablas': dict(sorted(tablas.items()))}
+
+def _formato_bytes(n):
+    if n is None:
+        return '?'
+    for unidad in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f} {unidad}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+def _imprimir_historial(historial):
+    fechas = historial['ejecuciones']
+    if not fechas:
+        print("Sin ejecuciones de mantenimiento")
+        return
+    print(f"Crecimiento entre {fechas[0]} y {fechas[-1]} ({len(fechas)} ejecuciones):")
+    for tabla, medidas in historial['tablas'].items():
+        presentes = [m for m in medidas if m is not None]
+        primera, ultima = presentes[0], presentes[-1]
+        print(f"  {tabla:28} {ultima[0]:>10} filas ({ultima[0] - primera[0]:+d})  {_formato_bytes(ultima[1]):>9}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ANALYZE, integridad y checkpoint con historial de tamaños")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--club', help="Club que se mantiene (por defecto, la base principal)")
+    grupo.add_argument('--todos', action='store_true', help="La base principal y todos los clubes")
+    parser.add_argument('--integridad-completa', action='store_true',
+                        help="integrity_check en lugar de quick_check (compara también los índices)")
+    parser.add_argument('--historial', type=int, nargs='?', const=10, metavar='N',
+                        help="Muestra el crecimiento de las tablas en las N últimas ejecuciones, sin ejecutar nada")
+    args = parser.parse_args(argv)
+
+    if args.historial:
+        with use_tenant(args.club):
+            _imprimir_historial(load_history(args.historial))
+        return 0
+
+    if args.todos:
+        resumenes = maintain_all(args.integridad_completa)
+    else:
+        with use_tenant(args.club):
+            resumenes = [run_maintenance(args.integridad_completa)]
+    fallos = False
+    for resumen in resumenes:
+        nombre = resumen['club'] or '(principal)'
+        if 'error' in resumen:
+            print(f"{nombre}: error: {resumen['error']}")
+            fallos = True
+            continue
+        print(f"{nombre}:")
+        for tarea, ms, resultado in resumen['tareas']:
+            print(f"  {tarea:14} {ms:>9.1f} ms  {resultado}")
+            fallos = fallos or (tarea in ('integridad', 'claves_ajenas') and resultado != 'ok')
+        total = sum(b or 0 for _, _, b in resumen['tablas'])
+        print(f"  {len(resumen['tablas'])} tablas, {_formato_bytes(total)}")
+    return 1 if fallos else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,421 @@
+# Almacén columnar de posiciones de jugadores en ficheros .npy mapeados en memoria, para análisis
+# espaciales sin pasar por tuplas de Python ni DataFrames. El almacén se guarda por segmentos que no se
+# reescriben nunca: cada actualización añade un segmento pequeño con las filas nuevas y apunta los ids
+# borrados en una lista aparte. Cuando hay demasiados segmentos o borrados se compacta en uno solo.
+# Uso: python -m utils.position_store [--club CLUB] [--completo]
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils.categories import CATEGORIAS
+from utils.db import get_db_connection, get_data_version
+from utils.tenancy import tenant_path, use_tenant
+
+POSITIONS_DIR = os.path.join('data', 'positions')
+STORE_VERSION = 3
+# Se compacta al pasar de MAX_SEGMENTOS segmentos o cuando las filas fuera del primer segmento más los
+# borrados superan esta fracción del total
+MAX_SEGMENTOS = 8
+FRACCION_COMPACTAR = 0.1
+
+# Una fila por posición registrada: identificadores en int32, coordenadas en float32 y rol/tipo como códigos
+POSICION_DTYPE = np.dtype([
+    ('id', '<i4'),
+    ('corner_id', '<i4'),
+    ('jugador_id', '<i4'),
+    ('equipo_id', '<i4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('rol', 'u1'),
+    ('tipo', 'u1'),
+])
+
+# Índices de desplazamientos: cada entrada es el rango [inicio, fin) de filas contiguas
+INDICE_EQUIPOS_DTYPE = np.dtype([('equipo_id', '<i4'), ('tipo', 'u1'), ('inicio', '<i8'), ('fin', '<i8')])
+INDICE_JUGADORES_DTYPE = np.dtype([('jugador_id', '<i4'), ('equipo_id', '<i4'), ('tipo', 'u1'),
+                                   ('inicio', '<i8'), ('fin', '<i8')])
+
+# Ficheros de cada segmento y de la lista de borrados; el número de segmento o generación va detrás
+FICHEROS = {
+    'posiciones': 'posiciones_{}.npy',
+    'equipos': 'indice_equipos_{}.npy',
+    'jugadores': 'indice_jugadores_{}.npy',
+}
+BORRADOS = 'borrados_{}.npy'
+META = 'meta.json'
+
+def _leer_meta(destino):
+    try:
+        with open(os.path.join(destino, META), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == STORE_VERSION else None
+
+def _ruta(destino, plantilla, nombre):
+    return os.path.join(destino, plantilla.format(nombre))
+
+def _guardar_npy(array, ruta):
+    """Guarda un array en un temporal y lo renombra para no dejar ficheros a medias"""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        np.save(f, array)
+    os.replace(temporal, ruta)
+
+def _codificar(valores, codigos):
+    """Convierte textos en códigos; los valores nuevos se añaden al final (los códigos nunca cambian)"""
+    posicion = {valor: i for i, valor in enumerate(codigos)}
+    resultado = np.empty(len(valores), dtype='u1')
+    for i, valor in enumerate(valores):
+        if valor not in posicion:
+            if len(codigos) >= 255:
+                raise ValueError("Demasiados valores distintos para un código de 8 bits")
+            posicion[valor] = len(codigos)
+            codigos.append(valor)
+        resultado[i] = posicion[valor]
+    return resultado
+
+def _filas_a_array(filas, codigos):
+    """Convierte filas (id, corner_id, jugador_id, equipo_id, x, y, rol, tipo) en un array estructurado"""
+    array = np.empty(len(filas), dtype=POSICION_DTYPE)
+    if not filas:
+        return array
+    columnas = list(zip(*filas))
+    for nombre, valores in zip(('id', 'corner_id', 'jugador_id', 'equipo_id', 'x', 'y'), columnas[:6]):
+        # Los valores nulos se guardan como -1 (ids) o NaN (coordenadas)
+        relleno = np.nan if nombre in ('x', 'y') else -1
+        array[nombre] = [relleno if v is None else v for v in valores]
+    array['rol'] = _codificar(columnas[6], codigos['rol'])
+    array['tipo'] = _codificar(columnas[7], codigos['tipo'])
+    return array
+
+def _ordenar(posiciones):
+    """Ordena por equipo, tipo, jugador e id para que cada porción del índice sea contigua"""
+    orden = np.lexsort((posiciones['id'], posiciones['jugador_id'], posiciones['tipo'], posiciones['equipo_id']))
+    return posiciones[orden]
+
+def _construir_indices(posiciones):
+    """Calcula los rangos contiguos de cada equipo/tipo y de cada jugador/equipo/tipo"""
+    def rangos(claves):
+        if len(posiciones) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        cambios = np.ones(len(posiciones), dtype=bool)
+        cambios[1:] = np.any([c[1:] != c[:-1] for c in claves], axis=0)
+        inicios = np.flatnonzero(cambios)
+        fines = np.append(inicios[1:], len(posiciones))
+        return inicios, fines
+
+    inicios, fines = rangos([posiciones['equipo_id'], posiciones['tipo']])
+    equipos = np.empty(len(inicios), dtype=INDICE_EQUIPOS_DTYPE)
+    equipos['equipo_id'] = posiciones['equipo_id'][inicios]
+    equipos['tipo'] = posiciones['tipo'][inicios]
+    equipos['inicio'], equipos['fin'] = inicios, fines
+
+    inicios, fines = rangos([posiciones['equipo_id'], posiciones['tipo'], posiciones['jugador_id']])
+    jugadores = np.empty(len(inicios), dtype=INDICE_JUGADORES_DTYPE)
+    jugadores['jugador_id'] = posiciones['jugador_id'][inicios]
+    jugadores['equipo_id'] = posiciones['equipo_id'][inicios]
+    jugadores['tipo'] = posiciones['tipo'][inicios]
+    jugadores['inicio'], jugadores['fin'] = inicios, fines
+    # Ordenar el índice de jugadores por jugador para buscar con searchsorted
+    jugadores = jugadores[np.argsort(jugadores['jugador_id'], kind='stable')]
+    return equipos, jugadores
+
+# Solo las posiciones de corners vigentes: las de corners marcados como borrados salen del almacén
+_DESDE_VIGENTES = """
+    FROM posiciones_jugadores pj
+    JOIN corners c ON pj.corner_id = c.id
+    WHERE c.borrado_en IS NULL
+"""
+SELECT_POSICIONES = "SELECT pj.id, pj.corner_id, pj.jugador_id, pj.equipo_id, pj.x, pj.y, pj.rol, pj.tipo" + _DESDE_VIGENTES
+# Posiciones de corners marcados como borrados (usa el índice parcial de corners.borrado_en)
+_DE_BORRADOS = """
+    FROM posiciones_jugadores pj
+    WHERE pj.corner_id IN (SELECT id FROM corners WHERE borrado_en IS NOT NULL) AND pj.id <= ?
+"""
+
+def _vivas(conn, max_id):
+    """
+    Filas vigentes con id <= max_id sin recorrer la tabla: todas (COUNT(*) usa el índice más pequeño) menos
+    las posteriores a max_id, que son pocas, y las de corners borrados
+    """
+    total = conn.execute("SELECT COUNT(*) FROM posiciones_jugadores").fetchone()[0]
+    total -= conn.execute("SELECT COUNT(*) FROM posiciones_jugadores WHERE id > ?", (max_id,)).fetchone()[0]
+    return total - conn.execute("SELECT COUNT(*)" + _DE_BORRADOS, (max_id,)).fetchone()[0]
+
+def _guardar_segmento(posiciones, destino, nombre):
+    """Ordena las filas, calcula sus índices y escribe los tres ficheros del segmento"""
+    posiciones = _ordenar(posiciones)
+    equipos, jugadores = _construir_indices(posiciones)
+    _guardar_npy(posiciones, _ruta(destino, FICHEROS['posiciones'], nombre))
+    _guardar_npy(equipos, _ruta(destino, FICHEROS['equipos'], nombre))
+    _guardar_npy(jugadores, _ruta(destino, FICHEROS['jugadores'], nombre))
+    return len(posiciones)
+
+def _guardar_meta(meta, destino):
+    temporal = os.path.join(destino, META + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, os.path.join(destino, META))
+
+def _limpiar(destino, meta):
+    """Borra los ficheros de segmentos y borrados que ya no usa el meta (también los de versiones anteriores)"""
+    usados = {plantilla.format(nombre) for nombre in meta['segmentos'] for plantilla in FICHEROS.values()}
+    if meta['borrados'] is not None:
+        usados.add(BORRADOS.format(meta['borrados']))
+    for fichero in os.listdir(destino):
+        if fichero.endswith(('.npy', '.npy.tmp')) and fichero not in usados:
+            try:
+                os.remove(os.path.join(destino, fichero))
+            except OSError:
+                # Otro proceso puede tenerlo abierto (Windows); se borrará en la próxima limpieza
+                pass
+
+def _leer_borrados(destino, meta):
+    if meta['borrados'] is None:
+        return np.empty(0, dtype='<i4')
+    return np.load(_ruta(destino, BORRADOS, meta['borrados']))
+
+def _cargar(destino, meta, campos=None):
+    """Filas de todos los segmentos (solo los campos indicados) y los ids borrados"""
+    partes = []
+    for nombre in meta['segmentos']:
+        posiciones = np.load(_ruta(destino, FICHEROS['posiciones'], nombre), mmap_mode='r')
+        partes.append(np.array(posiciones[campos] if campos else posiciones))
+    return np.concatenate(partes) if len(partes) > 1 else partes[0], _leer_borrados(destino, meta)
+
+def refresh_position_store(destino=None, completo=False):
+    """
+    Actualiza el almacén desde la base de datos. Las posiciones solo se insertan o se borran (también al
+    marcar su corner como borrado), así que basta con añadir las filas con id mayor que el último
+    exportado en un segmento nuevo y apuntar los ids que ya no existen. Si la base de datos ha cambiado
+    pero no hay posiciones nuevas ni borradas (p. ej. se ha registrado un partido), solo se anota su
+    versión en el meta. Devuelve un resumen con las filas añadidas y eliminadas.
+    """
+    destino = destino or tenant_path(POSITIONS_DIR)
+    meta = None if completo else _leer_meta(destino)
+    data_version = get_data_version()
+    if meta and meta['data_version'] == data_version:
+        return {'añadidas': 0, 'eliminadas': 0, 'filas': meta['filas'], 'completo': False}
+    os.makedirs(destino, exist_ok=True)
+
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN')
+        ultimo = conn.execute("SELECT COALESCE(MAX(id), 0) FROM posiciones_jugadores").fetchone()[0]
+        if meta is None:
+            # Mismos códigos que utils.categories; los valores fuera del catálogo se añaden detrás
+            codigos = {'rol': list(CATEGORIAS['rol']), 'tipo': list(CATEGORIAS['tipo_posicion'])}
+            posiciones = _filas_a_array(conn.execute(SELECT_POSICIONES + " ORDER BY pj.id").fetchall(), codigos)
+            conn.rollback()
+            # Un número de segmento que no use el almacén anterior, si lo hay
+            anterior = _leer_meta(destino)
+            return _reconstruir(destino, posiciones, codigos, data_version, ultimo, anterior['siguiente'] if anterior else 0)
+
+        codigos = meta['codigos']
+        max_id = meta['max_id']
+        vivas = _vivas(conn, max_id)
+        if ultimo <= max_id and vivas == meta['filas']:
+            # Nada que añadir ni quitar: el resto del almacén (y las cachés que dependen de él) no cambian
+            conn.rollback()
+            _guardar_meta(dict(meta, data_version=data_version), destino)
+            return {'añadidas': 0, 'eliminadas': 0, 'filas': meta['filas'], 'completo': False}
+
+        # Filas que han dejado de estar vigentes desde la última actualización
+        nuevos_borrados = np.empty(0, dtype='<i4')
+        if vivas != meta['filas']:
+            ids, borrados = _cargar(destino, meta, 'id')
+            presentes = ids[~np.isin(ids, borrados)]
+            # Primero las de corners marcados como borrados, que se encuentran con el índice
+            candidatos = np.fromiter((f[0] for f in conn.execute("SELECT pj.id" + _DE_BORRADOS, (max_id,))),
+                                     dtype='<i4')
+            nuevos_borrados = presentes[np.isin(presentes, candidatos)]
+            if len(presentes) - len(nuevos_borrados) != vivas:
+                # Filas eliminadas de la tabla (purga, borrado en cascada): hay que comparar todos los ids
+                vigentes = np.fromiter((f[0] for f in conn.execute(
+                    "SELECT pj.id" + _DESDE_VIGENTES + " AND pj.id <= ?", (max_id,))), dtype='<i4')
+                nuevos_borrados = presentes[~np.isin(presentes, vigentes)]
+
+        nuevas = _filas_a_array(conn.execute(SELECT_POSICIONES + " AND pj.id > ? ORDER BY pj.id", (max_id,)).fetchall(),
+                                codigos)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    filas = meta['filas'] - len(nuevos_borrados) + len(nuevas)
+    segmentos = list(meta['segmentos'])
+    siguiente = meta['siguiente']
+    fuera_del_primero = meta['fuera_del_primero'] + len(nuevas)
+    total_borrados = meta['total_borrados'] + len(nuevos_borrados)
+    if (len(segmentos) + bool(len(nuevas)) > MAX_SEGMENTOS
+            or fuera_del_primero + total_borrados > FRACCION_COMPACTAR * max(filas, 1)):
+        posiciones, borrados = _cargar(destino, meta)
+        borrados = np.concatenate([borrados, nuevos_borrados])
+        posiciones = np.concatenate([posiciones[~np.isin(posiciones['id'], borrados)], nuevas])
+        resumen = _reconstruir(destino, posiciones, codigos, data_version, max(max_id, ultimo), siguiente)
+        return dict(resumen, añadidas=len(nuevas), eliminadas=len(nuevos_borrados), completo=False)
+
+    if len(nuevas):
+        _guardar_segmento(nuevas, destino, siguiente)
+        segmentos.append(siguiente)
+        siguiente += 1
+    generacion = time.time_ns()
+    nombre_borrados = meta['borrados']
+    if len(nuevos_borrados):
+        nombre_borrados = generacion
+        _guardar_npy(np.sort(np.concatenate([_leer_borrados(destino, meta), nuevos_borrados])),
+                     _ruta(destino, BORRADOS, nombre_borrados))
+
+    # El meta se escribe al final; max_id solo avanza
+    nuevo_meta = dict(meta, data_version=data_version, max_id=max(max_id, ultimo), filas=int(filas), codigos=codigos,
+                      segmentos=segmentos, siguiente=siguiente, borrados=nombre_borrados,
+                      fuera_del_primero=int(fuera_del_primero), total_borrados=int(total_borrados),
+                      generacion=generacion, actualizado=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    _guardar_meta(nuevo_meta, destino)
+    _limpiar(destino, nuevo_meta)
+    return {'añadidas': len(nuevas), 'eliminadas': len(nuevos_borrados), 'filas': int(filas), 'completo': False}
+
+def _reconstruir(destino, posiciones, codigos, data_version, max_id, nombre):
+    """Escribe todas las filas como un único segmento sin borrados (reconstrucción completa o compactación)"""
+    filas = _guardar_segmento(posiciones, destino, nombre)
+    nuevo_meta = {'version': STORE_VERSION, 'data_version': data_version, 'max_id': int(max_id),
+                  'filas': int(filas), 'codigos': codigos, 'segmentos': [nombre], 'siguiente': nombre + 1,
+                  'borrados': None, 'fuera_del_primero': 0, 'total_borrados': 0,
+                  'generacion': time.time_ns(), 'actualizado': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    _guardar_meta(nuevo_meta, destino)
+    _limpiar(destino, nuevo_meta)
+    return {'añadidas': filas, 'eliminadas': 0, 'filas': filas, 'completo': True}
+
+class PositionStore:
+    """
+    Vista de solo lectura del almacén. Con un solo segmento y sin borrados, las porciones por equipo o
+    jugador son vistas sin copia del fichero mapeado; si no, se unen las de cada segmento.
+    """
+
+    def __init__(self, destino=None):
+        destino = destino or tenant_path(POSITIONS_DIR)
+        meta = _leer_meta(destino)
+        if meta is None:
+            raise FileNotFoundError(f"No hay almacén de posiciones en {destino}")
+        self.meta = meta
+        self.codigos = meta['codigos']
+        # Por segmento: (posiciones, índice de equipos, índice de jugadores)
+        self.segmentos = [tuple(np.load(_ruta(destino, FICHEROS[fichero], nombre), mmap_mode='r')
+                                for fichero in ('posiciones', 'equipos', 'jugadores'))
+                          for nombre in meta['segmentos']]
+        self.borrados = _leer_borrados(destino, meta)
+        self._posiciones = None
+
+    @property
+    def posiciones(self):
+        """Todas las filas vigentes, ordenadas dentro de cada segmento"""
+        if self._posiciones is None:
+            self._posiciones = self._unir([segmento[0] for segmento in self.segmentos], ordenar=False)
+        return self._posiciones
+
+    def codigo(self, campo, valor):
+        """Código de un rol o tipo (None si no aparece en el almacén)"""
+        try:
+            return self.codigos[campo].index(valor)
+        except ValueError:
+            return None
+
+    def decode(self, campo, codigos):
+        """Convierte un array de códigos de rol o tipo en textos"""
+        return np.asarray(self.codigos[campo], dtype=object)[codigos]
+
+    def _unir(self, partes, ordenar=True):
+        """Une las porciones de cada segmento (en el orden del almacén) y quita las filas borradas"""
+        llenas = [parte for parte in partes if len(parte)]
+        if not llenas:
+            return partes[0][:0]
+        union = llenas[0] if len(llenas) == 1 else np.concatenate(llenas)
+        if len(llenas) > 1 and ordenar:
+            union = _ordenar(union)
+        if len(self.borrados):
+            union = union[~np.isin(union['id'], self.borrados)]
+        return union
+
+    @staticmethod
+    def _porcion(posiciones, entradas):
+        if len(entradas) == 0:
+            return posiciones[:0]
+        # Una sola porción contigua: vista directa sobre el fichero mapeado
+        if len(entradas) == 1 or np.all(entradas['inicio'][1:] == entradas['fin'][:-1]):
+            return posiciones[int(entradas['inicio'][0]):int(entradas['fin'][-1])]
+        return np.concatenate([posiciones[int(e['inicio']):int(e['fin'])] for e in entradas])
+
+    def equipo(self, equipo_id, tipo=None):
+        """Posiciones de un equipo (opcionalmente solo 'Ofensivo' o 'Defensivo')"""
+        partes = []
+        for posiciones, indice_equipos, _ in self.segmentos:
+            entradas = indice_equipos[indice_equipos['equipo_id'] == equipo_id]
+            if tipo is not None:
+                entradas = entradas[entradas['tipo'] == self.codigo('tipo', tipo)]
+            partes.append(self._porcion(posiciones, entradas))
+        return self._unir(partes)
+
+    def jugador(self, jugador_id, tipo=None):
+        """Posiciones de un jugador (opcionalmente solo 'Ofensivo' o 'Defensivo')"""
+        partes = []
+        for posiciones, _, indice_jugadores in self.segmentos:
+            ids = indice_jugadores['jugador_id']
+            inicio, fin = np.searchsorted(ids, jugador_id, 'left'), np.searchsorted(ids, jugador_id, 'right')
+            entradas = indice_jugadores[inicio:fin]
+            if tipo is not None:
+                entradas = entradas[entradas['tipo'] == self.codigo('tipo', tipo)]
+            partes.append(self._porcion(posiciones, entradas))
+        return self._unir(partes)
+
+def average_positions(posiciones):
+    """Posición media y número de veces por jugador y rol de una porción del almacén"""
+    if len(posiciones) == 0:
+        return np.empty(0, dtype=[('jugador_id', '<i4'), ('rol', 'u1'), ('x', '<f8'), ('y', '<f8'), ('veces', '<i8')])
+    claves = posiciones['jugador_id'].astype(np.int64) * 256 + posiciones['rol']
+    unicas, inversa = np.unique(claves, return_inverse=True)
+    veces = np.bincount(inversa)
+    resultado = np.empty(len(unicas), dtype=[('jugador_id', '<i4'), ('rol', 'u1'), ('x', '<f8'), ('y', '<f8'), ('veces', '<i8')])
+    resultado['jugador_id'] = unicas // 256
+    resultado['rol'] = unicas % 256
+    resultado['x'] = np.bincount(inversa, weights=posiciones['x']) / veces
+    resultado['y'] = np.bincount(inversa, weights=posiciones['y']) / veces
+    resultado['veces'] = veces
+    return resultado
+
+_store_lock = threading.Lock()
+_store_cache = {}
+
+def load_position_store(destino=None, refrescar=True):
+    """Devuelve el almacén de posiciones, actualizándolo primero si la base de datos ha cambiado"""
+    destino = destino or tenant_path(POSITIONS_DIR)
+    with _store_lock:
+        if refrescar:
+            refresh_position_store(destino)
+        meta = _leer_meta(destino)
+        # Solo cambia cuando cambian las filas: anotar una versión nueva de la base de datos no lo invalida
+        clave = (destino, meta and meta['generacion'])
+        store = _store_cache.get(destino)
+        if store is None or store[0] != clave:
+            store = (clave, PositionStore(destino))
+            _store_cache[destino] = store
+        return store[1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Actualiza el almacén de posiciones en ficheros .npy")
+    parser.add_argument('--destino', help="Directorio del almacén (por defecto, el del club)")
+    parser.add_argument('--club', help="Club cuyos datos se exportan (por defecto, la base principal)")
+    parser.add_argument('--completo', action='store_true', help="Reconstruir desde cero")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    with use_tenant(args.club):
+        resumen = refresh_position_store(args.destino, completo=args.completo)
+    print(f"Posiciones: {resumen['filas']} (añadidas {resumen['añadidas']}, eliminadas {resumen['eliminadas']}"
+          f"{', reconstrucción completa' if resumen['completo'] else ''}) en {time.perf_counter() - inicio:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# Instrumentación por ejecución de página: intervalos de tiempo (spans) de consultas SQL, gráficos y
+# secciones, número de consultas, panel de depuración opcional y traza en JSON-lines.
+# Desactivada apenas cuesta: span() devuelve un contexto vacío compartido y las conexiones no se envuelven.
+import itertools
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+# CORNERS_PROFILE=1 perfila todas las ejecuciones; si no, solo las sesiones con el modo depuración activado
+PROFILE_ALL = os.environ.get('CORNERS_PROFILE') == '1'
+# Fichero JSON-lines donde se añade una línea por cada ejecución perfilada (opcional)
+TRACE_FILE = os.environ.get('CORNERS_TRACE_FILE')
+# Muestra el interruptor del modo depuración en la barra lateral (también con ?debug=1 en la URL)
+DEBUG_PANEL = os.environ.get('CORNERS_DEBUG_PANEL') == '1'
+
+DEBUG_KEY = 'debug_perfil'
+
+_local = threading.local()
+_trace_lock = threading.Lock()
+
+class Trace:
+    """Spans y contadores de una ejecución de página; los hilos de gráficos añaden los suyos con bind()"""
+
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.fecha = time.time()
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self.consultas = 0
+        self.spans = []
+        self.seccion = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, registro):
+        with self._lock:
+            self.spans.append(registro)
+            if registro['categoria'] == 'sql' and registro['nombre'] != 'fetch':
+                self.consultas += 1
+
+class _Span:
+    """Intervalo medido; guarda el span padre del mismo hilo para poder calcular el tiempo propio"""
+    __slots__ = ('traza', 'categoria', 'nombre', 'atributos', 'id', 'padre', 'inicio')
+
+    def __init__(self, traza, categoria, nombre, atributos):
+        self.traza = traza
+        self.categoria = categoria
+        self.nombre = nombre
+        self.atributos = atributos
+
+    def __enter__(self):
+        self.id = next(self.traza._ids)
+        self.padre = getattr(_local, 'span', None)
+        _local.span = self
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        fin = time.perf_counter()
+        _local.span = self.padre
+        registro = {
+            'id': self.id,
+            'padre': self.padre.id if self.padre is not None else None,
+            'categoria': self.categoria,
+            'nombre': self.nombre,
+            'inicio_ms': round((self.inicio - self.traza.inicio) * 1000, 3),
+            'duracion_ms': round((fin - self.inicio) * 1000, 3),
+            'hilo': threading.current_thread().name,
+        }
+        if self.atributos:
+            registro['atributos'] = self.atributos
+        if tipo is not None:
+            registro['error'] = repr(valor)
+        self.traza.add(registro)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        return False
+
+_NULO = _NullSpan()
+
+def current_trace():
+    """Traza de la ejecución en curso en este hilo (None si no se está perfilando)"""
+    return getattr(_local, 'traza', None)
+
+def span(categoria, nombre, **atributos):
+    """Mide un bloque: with span('sql', 'SELECT ...'): ... (no hace nada si no se está perfilando)"""
+    traza = getattr(_local, 'traza', None)
+    if traza is None:
+        return _NULO
+    return _Span(traza, categoria, nombre, atributos)
+
+def traced(categoria, nombre=None):
+    """Decorador que mide cada llamada a la función como un span"""
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @wraps(funcion)
+        def envoltorio(*args, **kwargs):
+            with span(categoria, etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+def bind(funcion):
+    """Liga la función a la traza actual para ejecutarla en otro hilo (p. ej. el pool de gráficos)"""
+    traza = current_trace()
+    if traza is None:
+        return funcion
+
+    @wraps(funcion)
+    def envoltorio(*args, **kwargs):
+        anterior = getattr(_local, 'traza', None)
+        _local.traza = traza
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            _local.traza = anterior
+    return envoltorio
+
+def _debug_toggle():
+    """Interruptor del modo depuración en la barra lateral, solo si está habilitado"""
+    import streamlit as st
+
+    try:
+        visible = DEBUG_PANEL or st.query_params.get('debug') == '1'
+    except Exception:
+        visible = DEBUG_PANEL
+    if visible:
+        st.sidebar.checkbox("Perfilar esta página", key=DEBUG_KEY)
+    return bool(st.session_state.get(DEBUG_KEY))
+
+def begin_rerun(pagina):
+    """Empieza la traza de una ejecución de la página si el perfilado está activo; devuelve la traza o None"""
+    activo = _debug_toggle() or PROFILE_ALL
+    _local.span = None
+    _local.traza = Trace(pagina) if activo else None
+    return _local.traza
+
+def section(nombre):
+    """Cierra la sección anterior de la página y abre otra (así no hay que indentar bloques enteros)"""
+    traza = current_trace()
+    if traza is None:
+        return
+    if traza.seccion is not None:
+        traza.seccion.__exit__(None, None, None)
+    traza.seccion = _Span(traza, 'seccion', nombre, None)
+    traza.seccion.__enter__()
+
+def trace_summary(traza):
+    """Tiempo total, número de consultas y tiempo propio por categoría (sin contar los spans hijos)"""
+    hijos = {}
+    for s in traza.spans:
+        if s['padre'] is not None:
+            hijos[s['padre']] = hijos.get(s['padre'], 0.0) + s['duracion_ms']
+    categorias = {}
+    for s in traza.spans:
+        propio = max(s['duracion_ms'] - hijos.get(s['id'], 0.0), 0.0)
+        datos = categorias.setdefault(s['categoria'], {'spans': 0, 'propio_ms': 0.0})
+        datos['spans'] += 1
+        datos['propio_ms'] = round(datos['propio_ms'] + propio, 3)
+    return {
+        'pagina': traza.pagina,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(traza.fecha)),
+        'duracion_ms': traza.duracion,
+        'consultas': traza.consultas,
+        'categorias': categorias,
+    }
+
+def _write_trace(traza, resumen):
+    linea = json.dumps(dict(resumen, spans=traza.spans), ensure_ascii=False, default=str)
+    with _trace_lock:
+        with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+            f.write(linea + '\n')
+
+def render_debug_panel(traza, resumen):
+    """Panel de la barra lateral con el desglose de la ejecución"""
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("Perfil de la ejecución", expanded=True):
+        st.metric("Tiempo total", f"{resumen['duracion_ms']:.0f} ms")
+        st.metric("Consultas SQL", resumen['consultas'])
+        st.caption("Tiempo propio por categoría (los gráficos se dibujan en paralelo, así que pueden sumar más que el total)")
+        st.dataframe(pd.DataFrame(
+            [(c, d['spans'], d['propio_ms']) for c, d in resumen['categorias'].items()],
+            columns=['Categoría', 'Spans', 'Tiempo propio (ms)']
+        ).sort_values('Tiempo propio (ms)', ascending=False), hide_index=True)
+        lentos = sorted(traza.spans, key=lambda s: s['duracion_ms'], reverse=True)[:10]
+        st.caption("Spans más lentos")
+        st.dataframe(pd.DataFrame(
+            [(s['categoria'], s['nombre'], s['duracion_ms']) for s in lentos],
+            columns=['Categoría', 'Nombre', 'Duración (ms)']
+        ), hide_index=True)
+
+        # Contadores de todo el proceso, no solo de esta ejecución. Se importan aquí para que este módulo,
+        # que cargan utils.db y las páginas antes de la comprobación de sesión, siga siendo ligero
+        from utils.chart_cache import chart_cache_stats
+        from utils.render import render_stats
+
+        st.caption("Figuras y memoria del proceso")
+        st.dataframe(_tabla_contadores(render_stats()), hide_index=True)
+        st.caption("Caché de gráficos")
+        st.dataframe(_tabla_contadores(chart_cache_stats()), hide_index=True)
+
+def _tabla_contadores(stats):
+    """DataFrame (Contador, Valor) a partir de un diccionario de contadores"""
+    import pandas as pd
+
+    # Como texto: mezclados con la memoria en MB, los enteros se mostrarían como reales
+    def texto(valor):
+        if valor is None:
+            return '-'
+        return f"{valor:.1f}" if isinstance(valor, float) else str(valor)
+
+    return pd.DataFrame([(nombre, texto(valor)) for nombre, valor in stats.items()], columns=['Contador', 'Valor'])
+
+def end_rerun():
+    """Cierra la traza de la ejecución: la escribe en TRACE_FILE y muestra el panel si procede"""
+    traza = current_trace()
+    if traza is None:
+        return None
+    if traza.seccion is not None:
+        traza.seccion.__exit__(None, None, None)
+        traza.seccion = None
+    traza.duracion = round((time.perf_counter() - traza.inicio) * 1000, 3)
+    _local.traza = None
+
+    import streamlit as st
+
+    resumen = trace_summary(traza)
+    if TRACE_FILE:
+        _write_trace(traza, resumen)
+    if st.session_state.get(DEBUG_KEY):
+        render_debug_panel(traza, resumen)
+    return resumen
+
+def stop_rerun():
+    """
+    st.stop() que antes cierra la traza. st.stop() corta el script con una excepción, así que sin esto las
+    ejecuciones que terminan pronto (p. ej. un equipo sin corners) no llegarían a la traza ni al recuento
+    de consultas. Las páginas perfiladas lo usan en lugar de st.stop() después de begin_rerun().
+    """
+    import streamlit as st
+
+    end_rerun()
+    st.stop()
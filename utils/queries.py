@@ -0,0 +1,135 @@
+import streamlit as st
+
+from utils.categories import categorize_columns
+from utils.db import FORMA_DATAFRAME, FORMA_TUPLAS, execute_query
+
+# Consultas de las páginas de análisis. Todas reciben la versión de los datos (get_data_version) como
+# último argumento: forma parte de la clave de st.cache_data, así que el resultado se reutiliza mientras
+# no cambien el equipo/jugador ni la base de datos, y se descarta en cuanto hay una escritura.
+# Las columnas de rol, tipo, resultado y zona se devuelven como Categorical con los códigos de
+# utils.categories.
+
+MAX_ENTRADAS = 64
+
+def _consultar(query, params):
+    """Ejecuta una consulta y devuelve todas las filas como tuplas"""
+    return execute_query(query, params, forma=FORMA_TUPLAS)
+
+def _consultar_df(query, params, columnas):
+    """Ejecuta una consulta y construye el DataFrame directamente desde las filas del cursor"""
+    return execute_query(query, params, forma=FORMA_DATAFRAME, columnas=columnas)
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_equipos(data_version):
+    """Lista de equipos (id, nombre)"""
+    return _consultar("SELECT id, nombre FROM equipos", ())
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_jugadores_equipo(equipo_id, data_version):
+    """Jugadores del equipo (id, nombre, numero) ordenados por número"""
+    return _consultar("""
+        SELECT id, nombre, numero
+        FROM jugadores
+        WHERE equipo_id = ?
+        ORDER BY numero
+    """, (equipo_id,))
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def contar_corners_equipo(equipo_id, data_version):
+    """Número de corners lanzados por el equipo"""
+    return _consultar("SELECT COUNT(*) FROM corners WHERE equipo_id = ? AND borrado_en IS NULL", (equipo_id,))[0][0]
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_resultados_equipo(equipo_id, data_version):
+    """Resultados de los corners del equipo (Resultado, Cantidad)"""
+    resultados = _consultar_df("""
+        SELECT resultado, COUNT(*) as cantidad
+        FROM corners
+        WHERE equipo_id = ? AND borrado_en IS NULL
+        GROUP BY resultado
+    """, (equipo_id,), ['Resultado', 'Cantidad'])
+    return categorize_columns(resultados, {'Resultado': 'resultado'})
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_zonas_equipo(equipo_id, data_version):
+    """Zonas de caída de los corners del equipo (Zona, Cantidad)"""
+    zonas = _consultar_df("""
+        SELECT zona_caida, COUNT(*) as cantidad
+        FROM corners
+        WHERE equipo_id = ? AND borrado_en IS NULL
+        AND zona_caida IS NOT NULL
+        AND zona_caida != ''
+        GROUP BY zona_caida
+    """, (equipo_id,), ['Zona', 'Cantidad'])
+    return categorize_columns(zonas, {'Zona': 'zona'})
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_tipo_zonas_equipo(equipo_id, data_version):
+    """Zonas de caída del equipo por tipo de corner (Tipo, Zona, Cantidad)"""
+    df = _consultar_df("""
+        SELECT tipo, zona_caida, COUNT(*) as cantidad
+        FROM corners
+        WHERE equipo_id = ? AND borrado_en IS NULL
+        AND zona_caida IS NOT NULL
+        AND zona_caida != ''
+        GROUP BY tipo, zona_caida
+    """, (equipo_id,), ['Tipo', 'Zona', 'Cantidad'])
+    return categorize_columns(df, {'Tipo': 'tipo_corner', 'Zona': 'zona'})
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_posiciones_promedio_ofensivas(equipo_id, data_version):
+    """Posición promedio de cada jugador y rol en los corners ofensivos del equipo"""
+    df = _consultar_df("""
+        SELECT j.id, j.nombre, j.numero, pj.rol, AVG(pj.x) as x_prom, AVG(pj.y) as y_prom, COUNT(*) as veces
+        FROM posiciones_jugadores pj
+        JOIN jugadores j ON pj.jugador_id = j.id
+        JOIN corners c ON pj.corner_id = c.id
+        WHERE pj.equipo_id = ? AND pj.tipo = 'Ofensivo' AND c.equipo_id = ? AND c.borrado_en IS NULL
+        GROUP BY j.id, pj.rol
+        ORDER BY veces DESC
+    """, (equipo_id, equipo_id), ['jugador_id', 'nombre', 'numero', 'rol', 'x_prom', 'y_prom', 'veces'])
+    return categorize_columns(df, {'rol': 'rol'})
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_puntos_caida_equipo(equipo_id, data_version):
+    """Puntos de caída registrados en los corners del equipo"""
+    df = _consultar_df("""
+        SELECT punto_caida, tipo, resultado, zona_caida
+        FROM corners
+        WHERE equipo_id = ? AND borrado_en IS NULL
+        AND punto_caida IS NOT NULL
+        AND punto_caida != ''
+    """, (equipo_id,), ['punto_caida', 'tipo', 'resultado', 'zona'])
+    return categorize_columns(df, {'tipo': 'tipo_corner', 'resultado': 'resultado', 'zona': 'zona'})
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_posiciones_jugador_ofensivas(jugador_id, data_version):
+    """Posiciones del jugador en cada corner ofensivo, con el rival y el resultado"""
+    cols = ['corner_id', 'fecha', 'rival', 'minuto', 'tipo', 'resultado', 'x', 'y', 'rol', 'zona_caida', 'punto_caida']
+    df = _consultar_df("""
+        SELECT c.id, p.fecha, e_rival.nombre as rival, c.minuto, c.tipo, c.resultado, pj.x, pj.y, pj.rol,
+               c.zona_caida, c.punto_caida
+        FROM posiciones_jugadores pj
+        JOIN corners c ON pj.corner_id = c.id
+        JOIN partidos p ON c.partido_id = p.id
+        JOIN equipos e ON c.equipo_id = e.id
+        JOIN equipos e_rival ON (p.equipo_local_id = e_rival.id OR p.equipo_visitante_id = e_rival.id) AND e_rival.id != e.id
+        WHERE pj.jugador_id = ? AND pj.tipo = 'Ofensivo' AND c.borrado_en IS NULL
+        ORDER BY p.fecha DESC
+    """, (jugador_id,), cols)
+    return categorize_columns(df, {'tipo': 'tipo_corner', 'resultado': 'resultado', 'rol': 'rol', 'zona_caida': 'zona'})
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS)
+def get_combinaciones_ofensivas(jugador_id, data_version):
+    """Compañeros que coinciden con el jugador en corners ofensivos, por resultado"""
+    df = _consultar_df("""
+        SELECT j.nombre, j.numero, c.resultado, COUNT(*) as veces
+        FROM posiciones_jugadores pj1
+        JOIN corners c ON pj1.corner_id = c.id
+        JOIN posiciones_jugadores pj2 ON pj1.corner_id = pj2.corner_id AND pj1.jugador_id != pj2.jugador_id
+        JOIN jugadores j ON pj2.jugador_id = j.id
+        WHERE pj1.jugador_id = ? AND pj1.tipo = 'Ofensivo' AND pj2.tipo = 'Ofensivo' AND c.borrado_en IS NULL
+        GROUP BY j.id, c.resultado
+        ORDER BY veces DESC
+    """, (jugador_id,), ['Jugador', 'Número', 'Resultado', 'Veces'])
+    return categorize_columns(df, {'Resultado': 'resultado'})
@@ -0,0 +1,254 @@
+# Estadísticas de las consultas SQL por huella (la sentencia sin literales) y registro de consultas lentas
+# con su EXPLAIN QUERY PLAN. Lo alimentan los cursores de utils.db; el informe ordena las huellas por
+# tiempo total para ver qué índices hacen falta. Cada club tiene su propia base de datos, así que las
+# estadísticas se llevan por huella y fichero, y el EXPLAIN se hace contra el fichero de la consulta.
+# Uso: python -m utils.query_log [--top 20] [--explicar] [--reiniciar]
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# CORNERS_QUERY_STATS=0 desactiva las estadísticas (los cursores vuelven a ser los de sqlite3)
+QUERY_STATS = os.environ.get('CORNERS_QUERY_STATS', '1') != '0'
+# Umbral a partir del cual una consulta se considera lenta y se guarda su plan
+SLOW_QUERY_MS = float(os.environ.get('CORNERS_SLOW_QUERY_MS', '100'))
+
+LOG_DIR = os.path.join('data', 'logs')
+STATS_FILE = 'query_stats.json'
+SLOW_LOG_FILE = 'slow_queries.jsonl'
+STATS_VERSION = 2
+
+MUESTRAS = 512          # duraciones recientes que se guardan por huella para los percentiles
+GUARDAR_CADA_S = 30     # las estadísticas se vuelcan a disco como mucho cada tantos segundos
+
+_lock = threading.Lock()
+_stats = None
+_ultimo_guardado = 0.0
+
+_COMENTARIOS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    """Sentencia sin comentarios ni literales (cadenas y números pasan a ?) y en una sola línea"""
+    texto = _COMENTARIOS.sub(' ', sql)
+    texto = _CADENAS.sub('?', texto)
+    texto = _NUMEROS.sub('?', texto)
+    texto = _LISTAS.sub('(?...)', texto)
+    return _ESPACIOS.sub(' ', texto).strip()
+
+def fingerprint(sql, motor='sqlite'):
+    """Huella corta de una sentencia normalizada"""
+    return hashlib.sha1(f"{motor}:{normalize_sql(sql)}".encode('utf-8')).hexdigest()[:12]
+
+def _clave(huella, base):
+    """Clave de las estadísticas: la huella y, para SQLite, el fichero de la base de datos"""
+    return f"{huella}|{base}" if base else huella
+
+def _ruta(fichero, directorio=None):
+    return os.path.join(directorio or LOG_DIR, fichero)
+
+def _nueva_entrada(sql, motor, huella, base):
+    return {'huella': huella, 'base': base, 'sql': normalize_sql(sql), 'motor': motor, 'llamadas': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'filas': 0, 'lentas': 0, 'muestras': deque(maxlen=MUESTRAS), 'plan': None, 'ejemplo': None}
+
+def _cargar():
+    """Estadísticas en memoria; la primera vez continúa las guardadas en disco"""
+    global _stats
+    if _stats is None:
+        _stats = {}
+        try:
+            with open(_ruta(STATS_FILE), encoding='utf-8') as f:
+                guardadas = json.load(f)
+        except (OSError, ValueError):
+            guardadas = {}
+        if guardadas.get('version') == STATS_VERSION:
+            for clave, entrada in guardadas['huellas'].items():
+                entrada['muestras'] = deque(entrada.get('muestras', []), maxlen=MUESTRAS)
+                _stats[clave] = entrada
+    return _stats
+
+def save_query_stats(directorio=None):
+    """Vuelca las estadísticas a disco (escritura atómica)"""
+    with _lock:
+        if _stats is None:
+            return
+        datos = {'version': STATS_VERSION, 'guardado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'huellas': {h: dict(e, muestras=list(e['muestras'])) for h, e in _stats.items()}}
+    os.makedirs(directorio or LOG_DIR, exist_ok=True)
+    ruta = _ruta(STATS_FILE, directorio)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+atexit.register(lambda: _stats is not None and save_query_stats())
+
+def _explain(explicar, sql, params):
+    try:
+        return [fila[-1] for fila in explicar(sql, params)]
+    except Exception as e:
+        return [f"(no disponible: {e})"]
+
+def record_query(sql, duracion_ms, filas=None, params=(), explicar=None, motor='sqlite', base=None):
+    """
+    Añade una ejecución a las estadísticas de su huella en la base de datos base (el fichero SQLite). Si
+    supera SLOW_QUERY_MS se apunta en el registro de consultas lentas y, si se pasa explicar(sql, params),
+    se guarda su EXPLAIN QUERY PLAN.
+    """
+    global _ultimo_guardado
+    huella = fingerprint(sql, motor)
+    lenta = duracion_ms >= SLOW_QUERY_MS
+    plan = None
+    with _lock:
+        clave = _clave(huella, base)
+        entrada = _cargar().get(clave)
+        if entrada is None:
+            entrada = _stats[clave] = _nueva_entrada(sql, motor, huella, base)
+        entrada['llamadas'] += 1
+        entrada['total_ms'] = round(entrada['total_ms'] + duracion_ms, 3)
+        entrada['max_ms'] = max(entrada['max_ms'], round(duracion_ms, 3))
+        entrada['filas'] += filas or 0
+        entrada['muestras'].append(round(duracion_ms, 3))
+        if lenta:
+            entrada['lentas'] += 1
+            necesita_plan = entrada['plan'] is None
+            # Se guardan los parámetros de la ejecución más lenta para poder repetir el EXPLAIN
+            if round(duracion_ms, 3) >= entrada['max_ms']:
+                entrada['ejemplo'] = {'sql': sql, 'params': _serializable(params)}
+        guardar = time.monotonic() - _ultimo_guardado > GUARDAR_CADA_S
+        if guardar:
+            _ultimo_guardado = time.monotonic()
+
+    if lenta:
+        # El EXPLAIN se hace fuera del bloqueo: es otra consulta contra la base de datos
+        if necesita_plan and explicar is not None:
+            plan = _explain(explicar, sql, params)
+            with _lock:
+                entrada['plan'] = plan
+        registro = {'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'), 'huella': huella, 'motor': motor, 'base': base,
+                    'duracion_ms': round(duracion_ms, 3), 'filas': filas, 'sql': normalize_sql(sql)}
+        if plan is not None:
+            registro['plan'] = plan
+        _append_slow(registro)
+    if guardar:
+        save_query_stats()
+
+def _serializable(params):
+    if isinstance(params, dict):
+        return {k: _serializable(v) for k, v in params.items()}
+    try:
+        return [v if isinstance(v, (int, float, str, type(None))) else repr(v) for v in params]
+    except TypeError:
+        return []
+
+def _append_slow(registro):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    with _lock:
+        with open(_ruta(SLOW_LOG_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+def query_report(top=None):
+    """
+    Huellas ordenadas por tiempo total, con llamadas, p50/p95/max, filas y plan guardado; una fila por
+    huella y base de datos
+    """
+    with _lock:
+        entradas = [dict(e, muestras=list(e['muestras'])) for e in _cargar().values()]
+    informe = []
+    for e in sorted(entradas, key=lambda entrada: entrada['total_ms'], reverse=True)[:top]:
+        informe.append({
+            'huella': e['huella'],
+            'motor': e['motor'],
+            'base': e['base'],
+            'llamadas': e['llamadas'],
+            'total_ms': round(e['total_ms'], 1),
+            'p50_ms': _percentil(e['muestras'], 0.50),
+            'p95_ms': _percentil(e['muestras'], 0.95),
+            'max_ms': e['max_ms'],
+            'filas_media': round(e['filas'] / e['llamadas'], 1) if e['llamadas'] else 0,
+            'lentas': e['lentas'],
+            'sql': e['sql'],
+            'plan': e['plan'],
+            'ejemplo': e['ejemplo'],
+        })
+    return informe
+
+def reset_query_stats():
+    """Borra las estadísticas y el registro de consultas lentas"""
+    global _stats
+    with _lock:
+        _stats = {}
+    for fichero in (STATS_FILE, SLOW_LOG_FILE):
+        try:
+            os.remove(_ruta(fichero))
+        except OSError:
+            pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consultas SQL ordenadas por tiempo total")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--explicar', action='store_true',
+                        help="Mostrar el plan de las consultas lentas (se calcula ahora si no se guardó)")
+    parser.add_argument('--json', action='store_true', help="Salida en JSON")
+    parser.add_argument('--reiniciar', action='store_true', help="Borrar las estadísticas guardadas")
+    args = parser.parse_args(argv)
+
+    if args.reiniciar:
+        reset_query_stats()
+        print("Estadísticas de consultas borradas")
+        return
+
+    informe = query_report(args.top)
+    if args.explicar:
+        import sqlite3
+        from utils.db import DB_PATH
+
+        # Cada plan se calcula en la base de datos donde se ejecutó la consulta (la del club)
+        conexiones = {}
+        try:
+            for fila in informe:
+                if fila['plan'] is None and fila['ejemplo'] and fila['motor'] == 'sqlite':
+                    base = fila['base'] or DB_PATH
+                    if not os.path.exists(base):
+                        fila['plan'] = [f"(no disponible: no existe {base})"]
+                        continue
+                    if base not in conexiones:
+                        conexiones[base] = sqlite3.connect(f"file:{base}?mode=ro", uri=True)
+                    conn = conexiones[base]
+                    ejemplo = fila['ejemplo']
+                    fila['plan'] = _explain(lambda sql, params: conn.execute("EXPLAIN QUERY PLAN " + sql, params),
+                                            ejemplo['sql'], ejemplo['params'])
+        finally:
+            for conn in conexiones.values():
+                conn.close()
+
+    if args.json:
+        print(json.dumps(informe, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'huella':12}  {'llamadas':>8}  {'total ms':>10}  {'p50':>8}  {'p95':>8}  {'max':>8}  {'filas':>8}  sql")
+    for fila in informe:
+        print(f"{fila['huella']:12}  {fila['llamadas']:>8}  {fila['total_ms']:>10.1f}  {fila['p50_ms']:>8.1f}  "
+              f"{fila['p95_ms']:>8.1f}  {fila['max_ms']:>8.1f}  {fila['filas_media']:>8}  {fila['sql'][:100]}")
+        if args.explicar and fila['plan']:
+            if fila['base']:
+                print(f"{'':14}en {fila['base']}:")
+            for paso in fila['plan']:
+                print(f"{'':14}{paso}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+
+import streamlit as st
+
+from utils.lazy import lazy_import
+
+# matplotlib se carga al crear la primera figura (ver utils/lazy.py)
+mfigure = lazy_import('matplotlib.figure')
+backend_agg = lazy_import('matplotlib.backends.backend_agg')
+
+# Contadores del ciclo de vida de las figuras (compartidos por todas las sesiones del servidor)
+_lock = threading.Lock()
+_contadores = {'creadas': 0, 'liberadas': 0}
+_figuras_vivas = weakref.WeakSet()
+
+def new_figure(figsize=(10, 7), nrows=1, ncols=1, **kwargs):
+    """Crea una figura con la API orientada a objetos, sin registrarla en el gestor global de pyplot"""
+    fig = mfigure.Figure(figsize=figsize)
+    backend_agg.FigureCanvasAgg(fig)
+    ax = fig.subplots(nrows, ncols, **kwargs)
+
+    with _lock:
+        _contadores['creadas'] += 1
+        _figuras_vivas.add(fig)
+
+    return fig, ax
+
+def release_figure(fig):
+    """Libera los artistas de una figura para que su memoria se recupere inmediatamente"""
+    if fig is None:
+        return
+
+    with _lock:
+        if fig not in _figuras_vivas:
+            return
+        _figuras_vivas.discard(fig)
+        _contadores['liberadas'] += 1
+
+    fig.clear()
+
+def show_figure(fig, container=None, **kwargs):
+    """Muestra la figura en Streamlit y la libera a continuación"""
+    try:
+        (container or st).pyplot(fig, **kwargs)
+    finally:
+        release_figure(fig)
+
+@contextmanager
+def figure(figsize=(10, 7), nrows=1, ncols=1, **kwargs):
+    """Contexto que crea una figura y garantiza su liberación al salir"""
+    fig, ax = new_figure(figsize, nrows, ncols, **kwargs)
+    try:
+        yield fig, ax
+    finally:
+        release_figure(fig)
+
+def _rss_mb():
+    """Devuelve la memoria residente del proceso en MB (None si no se puede medir)"""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas_residentes = int(f.read().split()[1])
+        return paginas_residentes * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # En macOS ru_maxrss está en bytes y en Linux en KB
+        return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+    except (ImportError, ValueError):
+        return None
+
+def render_stats():
+    """Devuelve el contador de memoria del renderizado: figuras creadas, liberadas y vivas, y RSS"""
+    with _lock:
+        stats = {
+            'figuras_creadas': _contadores['creadas'],
+            'figuras_liberadas': _contadores['liberadas'],
+            'figuras_abiertas': len(_figuras_vivas),
+        }
+
+    # Figuras que alguien haya creado con pyplot y que siguen en su gestor global
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    stats['figuras_pyplot'] = len(pyplot.get_fignums()) if pyplot else 0
+    stats['rss_mb'] = _rss_mb()
+    return stats
@@ -0,0 +1,64 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+from utils.chart_cache import chart_key, get_chart, store_chart
+from utils.db import get_data_version
+from utils.profiling import bind, span
+
+# Hilos para rasterizar gráficos; el pool es compartido por todas las sesiones, de modo que
+# el número de figuras que se dibujan a la vez está acotado en todo el servidor
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Crea el pool de hilos la primera vez que se necesita"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='charts')
+        return _pool
+
+class ChartScheduler:
+    """Reserva el hueco de cada gráfico de la página y los rasteriza en paralelo en el pool de hilos"""
+
+    def __init__(self):
+        # La versión de los datos se calcula una sola vez para que todos los gráficos de la ejecución coincidan
+        self.data_version = get_data_version()
+        self._pendientes = {}
+
+    def schedule(self, chart_id, build, equipo_id=None, jugador_id=None, filtros=None, container=None):
+        """Reserva un hueco en la posición actual y encarga el gráfico; build debe llevar sus datos ya ligados"""
+        placeholder = (container or st).empty()
+        key = chart_key(chart_id, equipo_id, jugador_id, filtros, self.data_version)
+
+        # Lo que ya está en caché se muestra directamente, sin pasar por el pool
+        png = get_chart(key)
+        if png is not None:
+            with span('streamlit', chart_id, cache=True):
+                placeholder.image(png, use_column_width=True)
+            return
+
+        # bind() hace que los spans del hilo del pool vayan a la traza de esta ejecución
+        future = _get_pool().submit(bind(store_chart), key, build, chart_id)
+        self._pendientes[future] = (chart_id, placeholder)
+
+    def wait(self):
+        """Coloca cada gráfico en su hueco según van terminando (los elementos de Streamlit solo desde este hilo)"""
+        for future in as_completed(self._pendientes):
+            chart_id, placeholder = self._pendientes[future]
+            try:
+                png = future.result()
+            except Exception as e:
+                placeholder.error(f"Error al generar el gráfico {chart_id}: {e}")
+                continue
+
+            if png is not None:
+                with span('streamlit', chart_id):
+                    placeholder.image(png, use_column_width=True)
+
+        self._pendientes.clear()
@@ -0,0 +1,334 @@
+# Colocación de un equipo por huecos. La media por (jugador, rol) mezcla posiciones cuando los jugadores
+# se intercambian el trabajo de un corner a otro; aquí cada corner se reparte entre JUGADORES huecos
+# canónicos con el algoritmo húngaro (asignación de coste mínimo: distancia al cuadrado al hueco más una
+# penalización si el rol del jugador no es el del hueco) y los huecos se reajustan a la media de lo
+# asignado hasta que el reparto no cambia, como en k-means. Cada hueco da su posición media, su
+# dispersión, la fracción de corners en que está ocupado y quién lo ocupa.
+# El húngaro se resuelve en NumPy para todos los corners del equipo a la vez (o con SciPy si está
+# instalado). El resultado se guarda por equipo y bando; cuando solo llegan corners nuevos se asignan a
+# los huecos ya ajustados y se suman a las medias, sin rehacer el ajuste.
+# Uso: python -m utils.slots --equipo ID [--tipo Defensivo] [--club CLUB] [--medir]
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # SciPy es opcional: sin él se usa la versión por lotes en NumPy
+    linear_sum_assignment = None
+
+from utils.formations import ANCHO_CAMPO, JUGADORES, SIN_CODIGO, TIPOS, load_corners
+from utils.position_store import POSITIONS_DIR, load_position_store
+from utils.tenancy import tenant_path, use_tenant
+
+# Coste extra (en unidades del campo al cuadrado) de poner a un jugador en un hueco de otro rol: un
+# jugador solo cambia de rol si así queda unas 10 unidades más cerca de su hueco
+PENALIZACION_ROL = 100.0
+ITERACIONES = 20
+# El ajuste termina cuando cambia de hueco menos de esta fracción de los jugadores en una iteración: los
+# últimos cambios son jugadores a medio camino entre dos huecos que van y vienen
+TOLERANCIA = 0.002
+# Si los corners nuevos desde el último ajuste superan esta fracción de los ajustados, se reajusta todo
+REAJUSTE = 0.25
+# Jugadores que más ocupan cada hueco en el resumen
+MAX_JUGADORES_HUECO = 3
+
+def _hungaro_numpy(costes):
+    """
+    Asignación de coste mínimo de un lote de matrices (B, n, m) con n <= m, por caminos de aumento
+    más cortos con potenciales (O(n² m) por matriz). Todas las matrices avanzan a la vez: cada paso es
+    una operación sobre el lote y las que ya han terminado se quedan quietas.
+    Devuelve (B, n) con la columna asignada a cada fila.
+    """
+    lote, n, m = costes.shape
+    # Índices desde 1: la fila 0 y la columna 0 son auxiliares
+    a = np.zeros((lote, n + 1, m + 1))
+    a[:, 1:, 1:] = costes
+    u = np.zeros((lote, n + 1))
+    v = np.zeros((lote, m + 1))
+    # Fila asignada a cada columna (0 si está libre) y columna anterior en el camino de aumento
+    p = np.zeros((lote, m + 1), dtype=np.int64)
+    camino = np.zeros((lote, m + 1), dtype=np.int64)
+    todos = np.arange(lote)
+    for i in range(1, n + 1):
+        p[:, 0] = i
+        j0 = np.zeros(lote, dtype=np.int64)
+        minimos = np.full((lote, m + 1), np.inf)
+        usadas = np.zeros((lote, m + 1), dtype=bool)
+        activos = todos
+        while len(activos):
+            b = activos
+            usadas[b, j0[b]] = True
+            i0 = p[b, j0[b]]
+            reducidos = a[b, i0] - u[b, i0][:, None] - v[b]
+            libres = ~usadas[b]
+            mejora = libres & (reducidos < minimos[b])
+            minimos_b = np.where(mejora, reducidos, minimos[b])
+            camino[b] = np.where(mejora, j0[b][:, None], camino[b])
+            candidatos = np.where(libres, minimos_b, np.inf)
+            j1 = candidatos.argmin(axis=1)
+            delta = candidatos[np.arange(len(b)), j1]
+            # Las columnas usadas tienen filas distintas, así que la suma con índices no se pisa
+            filas_b, columnas = np.nonzero(usadas[b])
+            u[b[filas_b], p[b[filas_b], columnas]] += delta[filas_b]
+            v[b] -= np.where(usadas[b], delta[:, None], 0)
+            minimos[b] = np.where(usadas[b], minimos_b, minimos_b - delta[:, None])
+            j0[b] = j1
+            activos = b[p[b, j1] != 0]
+        # Recorrer el camino hacia atrás intercambiando las asignaciones
+        activos = todos
+        while len(activos):
+            b = activos
+            j1 = camino[b, j0[b]]
+            p[b, j0[b]] = p[b, j1]
+            j0[b] = j1
+            activos = b[j1 != 0]
+    asignacion = np.zeros((lote, n), dtype=np.int64)
+    b, columnas = np.nonzero(p[:, 1:])
+    asignacion[b, p[b, columnas + 1] - 1] = columnas
+    return asignacion
+
+def assign(costes):
+    """Columna asignada a cada fila de cada matriz de costes (B, n, m), n <= m, con SciPy si está instalado"""
+    costes = np.asarray(costes, dtype=np.float64)
+    if costes.shape[1] > costes.shape[2]:
+        raise ValueError("Cada matriz necesita al menos tantas columnas como filas")
+    if len(costes) == 0 or costes.shape[1] == 0:
+        return np.zeros(costes.shape[:2], dtype=np.int64)
+    if linear_sum_assignment is not None:
+        return np.array([linear_sum_assignment(c)[1] for c in costes], dtype=np.int64)
+    return _hungaro_numpy(costes)
+
+def team_positions(store, corners, equipo_id, tipo):
+    """
+    Posiciones del equipo en un bando, por corner y reflejadas como en utils/formations.py. Devuelve
+    (corner_ids (C,), xy (C, JUGADORES, 2), roles (C, JUGADORES), jugadores (C, JUGADORES),
+    filas registradas por corner (C,)); los huecos sobrantes tienen rol SIN_CODIGO.
+    """
+    porcion = store.equipo(equipo_id, tipo)
+    porcion = porcion[~(np.isnan(porcion['x']) | np.isnan(porcion['y']))]
+    fila = np.minimum(np.searchsorted(corners['corner_id'], porcion['corner_id']), max(len(corners) - 1, 0))
+    conocidas = (corners['corner_id'][fila] == porcion['corner_id']) if len(corners) else np.zeros(len(porcion), bool)
+    porcion, fila = porcion[conocidas], fila[conocidas]
+    x = porcion['x'].astype(np.float64)
+    izquierda = corners['izquierda'][fila]
+    x[izquierda] = ANCHO_CAMPO - x[izquierda]
+    y = porcion['y'].astype(np.float64)
+    # Por corner y, dentro del corner, por rol y posición: si sobran jugadores se quedan fuera siempre los mismos
+    orden = np.lexsort((y, x, porcion['rol'], porcion['corner_id']))
+    ids, grupos, filas = np.unique(porcion['corner_id'][orden], return_inverse=True, return_counts=True)
+    xy = np.full((len(ids), JUGADORES, 2), np.nan)
+    roles = np.full((len(ids), JUGADORES), SIN_CODIGO, dtype='u1')
+    jugadores = np.full((len(ids), JUGADORES), -1, dtype=np.int64)
+    if len(ids):
+        inicios = np.r_[0, np.cumsum(filas)[:-1]]
+        rango = np.arange(len(grupos)) - inicios[grupos]
+        dentro = rango < JUGADORES
+        g, r, o = grupos[dentro], rango[dentro], orden[dentro]
+        xy[g, r] = np.column_stack([x[o], y[o]])
+        roles[g, r] = porcion['rol'][o]
+        jugadores[g, r] = porcion['jugador_id'][o]
+    return ids, xy, roles, jugadores, filas
+
+def _costes(xy, roles, medias, roles_hueco):
+    """Matrices (C, JUGADORES, JUGADORES) de jugador a hueco; los huecos vacíos del corner no cuestan nada"""
+    presentes = roles != SIN_CODIGO
+    diferencia = np.nan_to_num(xy)[:, :, None, :] - medias[None, None]
+    costes = (diferencia ** 2).sum(axis=3) + PENALIZACION_ROL * (roles[:, :, None] != roles_hueco[None, None])
+    return np.where(presentes[:, :, None], costes, 0.0)
+
+def _acumular(xy, roles, jugadores, huecos):
+    """Sumas por hueco de lo asignado: veces, posición, cuadrados, roles y jugadores"""
+    presentes = roles != SIN_CODIGO
+    h = huecos[presentes]
+    puntos = xy[presentes]
+    veces = np.bincount(h, minlength=JUGADORES)
+    suma = np.column_stack([np.bincount(h, weights=puntos[:, d], minlength=JUGADORES) for d in range(2)])
+    cuadrados = np.column_stack([np.bincount(h, weights=puntos[:, d] ** 2, minlength=JUGADORES) for d in range(2)])
+    cuenta_roles = np.bincount(h * 256 + roles[presentes], minlength=JUGADORES * 256).reshape(JUGADORES, 256)
+    claves, cuentas = np.unique(jugadores[presentes] * JUGADORES + h, return_counts=True)
+    por_jugador = {(clave % JUGADORES, clave // JUGADORES): cuenta
+                   for clave, cuenta in zip(claves.tolist(), cuentas.tolist())}
+    return {'veces': veces, 'suma': suma, 'cuadrados': cuadrados, 'roles': cuenta_roles, 'jugadores': por_jugador}
+
+def _sumar(a, b):
+    jugadores = dict(a['jugadores'])
+    for clave, cuenta in b['jugadores'].items():
+        jugadores[clave] = jugadores.get(clave, 0) + cuenta
+    return {'veces': a['veces'] + b['veces'], 'suma': a['suma'] + b['suma'],
+            'cuadrados': a['cuadrados'] + b['cuadrados'], 'roles': a['roles'] + b['roles'], 'jugadores': jugadores}
+
+def _asignar_huecos(xy, roles, medias, roles_hueco):
+    """Hueco (C, JUGADORES) de cada jugador de cada corner"""
+    return assign(_costes(xy, roles, medias, roles_hueco))
+
+def fit_layout(xy, roles, jugadores, iteraciones=ITERACIONES):
+    """
+    Ajusta los huecos a los corners dados. Se empieza por la colocación ordenada por rol y posición (la
+    de los vectores de utils/formations.py) y se alterna asignar y recalcular medias y roles hasta que la
+    asignación apenas cambia (TOLERANCIA); las sumas son las de la última asignación.
+    Devuelve (medias (JUGADORES, 2), roles_hueco, sumas, iteraciones).
+    """
+    presentes = roles != SIN_CODIGO
+    centro = np.nanmean(xy[presentes], axis=0) if presentes.any() else np.zeros(2)
+    medias = _media_huecos(xy, presentes, centro)
+    roles_hueco = np.array([_moda(roles[presentes[:, h], h]) for h in range(JUGADORES)], dtype='u1')
+    huecos = None
+    for iteracion in range(1, iteraciones + 1):
+        nuevos = np.where(presentes, _asignar_huecos(xy, roles, medias, roles_hueco), -1)
+        cambios = presentes.sum() if huecos is None else (nuevos != huecos).sum()
+        huecos = nuevos
+        if cambios <= TOLERANCIA * presentes.sum():
+            break
+        # Medias y rol más frecuente de cada hueco; uno que se queda sin jugadores conserva los suyos
+        h = huecos[presentes]
+        veces = np.bincount(h, minlength=JUGADORES)
+        ocupados = veces > 0
+        for d in range(2):
+            medias[ocupados, d] = np.bincount(h, weights=xy[presentes][:, d], minlength=JUGADORES)[ocupados] / veces[ocupados]
+        cuenta_roles = np.bincount(h * 256 + roles[presentes], minlength=JUGADORES * 256).reshape(JUGADORES, 256)
+        roles_hueco[ocupados] = cuenta_roles[ocupados].argmax(axis=1)
+    return medias, roles_hueco, _acumular(xy, roles, jugadores, huecos), iteracion
+
+def _media_huecos(xy, presentes, centro):
+    """Media de cada columna de la colocación ordenada; el centro para las que nunca tienen jugador"""
+    medias = np.tile(centro, (JUGADORES, 1))
+    for h in range(JUGADORES):
+        if presentes[:, h].any():
+            medias[h] = xy[presentes[:, h], h].mean(axis=0)
+    return medias
+
+def _moda(valores):
+    if len(valores) == 0:
+        return SIN_CODIGO
+    codigos, veces = np.unique(valores, return_counts=True)
+    return codigos[veces.argmax()]
+
+def update_layout(estado, datos):
+    """
+    Estado de la colocación con los datos actuales del equipo (los de team_positions). Si solo hay
+    corners nuevos, y no demasiados, se asignan a los huecos del último ajuste y se suman; si se ha borrado
+    o cambiado alguno, se reajusta todo. Devuelve el nuevo estado (no modifica el anterior).
+    """
+    ids, xy, roles, jugadores, filas = datos
+    if estado is not None and len(estado['corner_ids']):
+        anteriores = np.isin(ids, estado['corner_ids'])
+        conservados = anteriores.sum() == len(estado['corner_ids'])
+        iguales = conservados and np.array_equal(filas[anteriores], estado['filas'])
+        nuevos = ~anteriores
+        if iguales and nuevos.sum() <= REAJUSTE * estado['ajustados']:
+            if not nuevos.any():
+                return estado
+            huecos = _asignar_huecos(xy[nuevos], roles[nuevos], estado['medias'], estado['roles_hueco'])
+            return {**estado, 'corner_ids': ids, 'filas': filas,
+                    'sumas': _sumar(estado['sumas'], _acumular(xy[nuevos], roles[nuevos], jugadores[nuevos], huecos)),
+                    'incrementales': estado['incrementales'] + int(nuevos.sum())}
+    medias, roles_hueco, sumas, iteraciones = fit_layout(xy, roles, jugadores)
+    return {'corner_ids': ids, 'filas': filas, 'medias': medias, 'roles_hueco': roles_hueco, 'sumas': sumas,
+            'ajustados': len(ids), 'incrementales': 0, 'iteraciones': iteraciones}
+
+def summarize_layout(estado, codigos_rol):
+    """
+    Huecos ocupados alguna vez, ordenados por rol y posición: [{'hueco', 'rol', 'consistencia', 'x', 'y',
+    'dispersion_x', 'dispersion_y', 'dispersion', 'veces', 'ocupacion', 'jugadores': [(jugador_id, veces)]}].
+    consistencia es la fracción de veces que el hueco lo ocupa alguien con su rol más frecuente y
+    dispersion, la distancia media al cuadrado al centro del hueco (en raíz).
+    """
+    sumas = estado['sumas']
+    corners = len(estado['corner_ids'])
+    huecos = []
+    for h in np.flatnonzero(sumas['veces']):
+        veces = int(sumas['veces'][h])
+        media = sumas['suma'][h] / veces
+        varianza = np.maximum(sumas['cuadrados'][h] / veces - media ** 2, 0)
+        rol = int(sumas['roles'][h].argmax())
+        jugadores = sorted(((j, c) for (hueco, j), c in sumas['jugadores'].items() if hueco == h),
+                           key=lambda jc: (-jc[1], jc[0]))
+        huecos.append({
+            'rol': codigos_rol[rol] if rol < len(codigos_rol) else None,
+            'consistencia': float(sumas['roles'][h, rol] / veces),
+            'x': float(media[0]),
+            'y': float(media[1]),
+            'dispersion_x': float(np.sqrt(varianza[0])),
+            'dispersion_y': float(np.sqrt(varianza[1])),
+            'dispersion': float(np.sqrt(varianza.sum())),
+            'veces': veces,
+            'ocupacion': veces / corners,
+            'jugadores': jugadores[:MAX_JUGADORES_HUECO],
+            '_orden': (rol, media[0], media[1]),
+        })
+    huecos.sort(key=lambda hueco: hueco.pop('_orden'))
+    for numero, hueco in enumerate(huecos, 1):
+        hueco['hueco'] = numero
+    return huecos
+
+_lock = threading.Lock()
+_colocaciones = {}
+
+def load_slot_layout(equipo_id, tipo='Ofensivo', destino=None):
+    """
+    Colocación por huecos del equipo en un bando con los datos actuales: {'corners', 'huecos', 'ajustados',
+    'incrementales', 'iteraciones'}. Se actualiza solo cuando cambia el almacén de posiciones, y entonces
+    de forma incremental si es posible.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Bando desconocido: {tipo}")
+    destino = destino or tenant_path(POSITIONS_DIR)
+    store = load_position_store(destino)
+    clave = (destino, equipo_id, tipo)
+    with _lock:
+        guardado = _colocaciones.get(clave)
+        if guardado is not None and guardado[0] is store:
+            return guardado[2]
+    estado = update_layout(guardado[1] if guardado else None, team_positions(store, load_corners(), equipo_id, tipo))
+    resumen = {
+        'corners': len(estado['corner_ids']),
+        'huecos': summarize_layout(estado, store.codigos['rol']),
+        'ajustados': estado['ajustados'],
+        'incrementales': estado['incrementales'],
+        'iteraciones': estado.get('iteraciones'),
+    }
+    with _lock:
+        _colocaciones[clave] = (store, estado, resumen)
+    return resumen
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Colocación de un equipo por huecos (asignación húngara)")
+    parser.add_argument('--equipo', type=int, required=True)
+    parser.add_argument('--tipo', choices=TIPOS, default='Ofensivo', help="Bando")
+    parser.add_argument('--club', help="Club cuyos datos se usan (por defecto, la base principal)")
+    parser.add_argument('--medir', action='store_true',
+                        help="Mide la asignación de todos los corners del equipo con NumPy (y SciPy si está)")
+    args = parser.parse_args(argv)
+
+    with use_tenant(args.club):
+        inicio = time.perf_counter()
+        colocacion = load_slot_layout(args.equipo, args.tipo)
+        duracion = (time.perf_counter() - inicio) * 1000
+        print(f"{colocacion['corners']} corners, {len(colocacion['huecos'])} huecos "
+              f"({colocacion['iteraciones']} iteraciones) en {duracion:.0f} ms")
+        for hueco in colocacion['huecos']:
+            jugadores = ', '.join(f"{j} ({v})" for j, v in hueco['jugadores'])
+            print(f"  {hueco['hueco']:>2} {hueco['rol'] or '-':11} {hueco['consistencia']:4.0%}  "
+                  f"({hueco['x']:5.1f}, {hueco['y']:5.1f}) ± {hueco['dispersion']:4.1f}  "
+                  f"{hueco['ocupacion']:4.0%}  {jugadores}")
+
+        if args.medir:
+            store = load_position_store()
+            ids, xy, roles, _, _ = team_positions(store, load_corners(), args.equipo, args.tipo)
+            estado = _colocaciones[(tenant_path(POSITIONS_DIR), args.equipo, args.tipo)][1]
+            costes = _costes(xy, roles, estado['medias'], estado['roles_hueco'])
+            metodos = [('NumPy por lotes', _hungaro_numpy)]
+            if linear_sum_assignment is not None:
+                metodos.append(('SciPy', assign))
+            for nombre, resolver in metodos:
+                inicio = time.perf_counter()
+                resolver(costes)
+                print(f"{nombre}: {(time.perf_counter() - inicio) * 1000:.1f} ms para {len(ids)} corners")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
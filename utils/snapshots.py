@@ -0,0 +1,359 @@
+# Exportación de la base de datos a ficheros Parquet particionados para análisis fuera de la aplicación.
+# Uso: python -m utils.snapshots [--destino DIR] [--club CLUB] [--completo]
+import argparse
+import hashlib
+import json
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: solo hace falta para exportar y leer snapshots
+    pa = None
+    ds = None
+    pafs = None
+    pq = None
+
+from utils.db import get_db_connection, get_data_version
+from utils.tenancy import tenant_path, use_tenant
+
+SNAPSHOT_DIR = os.path.join('data', 'snapshots')
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Valor que usa la convención "hive" para las particiones sin valor (p. ej. partidos sin fecha)
+PARTICION_NULA = '__HIVE_DEFAULT_PARTITION__'
+
+# Tablas exportadas: columnas (con la temporada calculada a partir de la fecha del partido), origen con
+# sus JOIN, condición de las filas vigentes, columna id y expresión SQL de cada columna de partición.
+# Partidos, corners y posiciones solo reciben inserciones y borrados lógicos (nunca UPDATE de sus datos);
+# 'borrado' es la columna borrado_en que marca sus filas borradas y la tabla a la que pertenece.
+# La tabla usuarios no se exporta nunca.
+TABLAS = {
+    'equipos': {'columnas': 'e.*', 'origen': 'equipos e', 'vigente': '1', 'id': 'e.id', 'particiones': {}},
+    'jugadores': {'columnas': 'j.*', 'origen': 'jugadores j', 'vigente': '1', 'id': 'j.id', 'particiones': {}},
+    'partidos': {
+        'columnas': 'p.*, substr(p.fecha, 1, 4) AS temporada',
+        'origen': 'partidos p',
+        'vigente': 'p.borrado_en IS NULL',
+        'id': 'p.id',
+        'particiones': {'temporada': 'substr(p.fecha, 1, 4)'},
+        'borrado': ('partidos', 'p.borrado_en'),
+    },
+    'corners': {
+        'columnas': 'c.*, substr(p.fecha, 1, 4) AS temporada',
+        'origen': 'corners c LEFT JOIN partidos p ON c.partido_id = p.id',
+        'vigente': 'c.borrado_en IS NULL',
+        'id': 'c.id',
+        'particiones': {'temporada': 'substr(p.fecha, 1, 4)', 'equipo_id': 'c.equipo_id'},
+        'borrado': ('corners', 'c.borrado_en'),
+    },
+    'posiciones_jugadores': {
+        'columnas': 'pj.*, substr(p.fecha, 1, 4) AS temporada',
+        'origen': """posiciones_jugadores pj
+                     LEFT JOIN corners c ON pj.corner_id = c.id
+                     LEFT JOIN partidos p ON c.partido_id = p.id""",
+        'vigente': 'c.borrado_en IS NULL',
+        'id': 'pj.id',
+        'particiones': {'temporada': 'substr(p.fecha, 1, 4)', 'equipo_id': 'pj.equipo_id'},
+        'borrado': ('corners', 'c.borrado_en'),
+    },
+}
+# Filas que se leen de SQLite de cada vez
+LOTE = 5000
+
+# Tipo Arrow de cada columna según su tipo declarado en SQLite
+TIPOS_ARROW = {'INTEGER': 'int64', 'REAL': 'float64', 'TEXT': 'string'}
+TIPOS_PARTICION = {'temporada': 'string', 'equipo_id': 'int64'}
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Los snapshots necesitan pyarrow (pip install pyarrow)")
+
+def _tipos_columnas(conn, tabla, columnas):
+    """Tipo Arrow de cada columna a partir de PRAGMA table_info (texto si no se conoce)"""
+    declarados = {col[1]: (col[2] or '').upper() for col in conn.execute(f"PRAGMA table_info({tabla})")}
+    return [(col, TIPOS_ARROW.get(declarados.get(col), 'string')) for col in columnas]
+
+def _to_arrow(filas, tipos, tabla):
+    """Construye una tabla Arrow columna a columna con el tipo declarado en SQLite"""
+    arrays = []
+    for i, (col, tipo) in enumerate(tipos):
+        valores = [fila[i] for fila in filas]
+        if tipo == 'string':
+            # SQLite no impone tipos: convertir a texto lo que se haya guardado como número
+            valores = [None if v is None else str(v) for v in valores]
+        try:
+            arrays.append(pa.array(valores, type=pa.type_for_alias(tipo)))
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"Valor no válido en {tabla}.{col} para el tipo {tipo}: {e}") from e
+    return pa.Table.from_arrays(arrays, names=[col for col, _ in tipos])
+
+def _ruta_particion(valores):
+    """Ruta relativa de una partición al estilo hive (temporada=2024/equipo_id=3)"""
+    return '/'.join(f"{col}={PARTICION_NULA if v is None else v}" for col, v in valores)
+
+def _hash_filas(filas):
+    h = hashlib.sha1()
+    for fila in filas:
+        h.update(repr(fila).encode('utf-8'))
+    return h.hexdigest()
+
+def load_manifest(destino=None):
+    """Devuelve el manifiesto del último snapshot (None si no hay ninguno)"""
+    destino = destino or tenant_path(SNAPSHOT_DIR)
+    try:
+        with open(os.path.join(destino, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+def _escribir_atomico(tabla_arrow, ruta):
+    """Escribe un Parquet en un temporal y lo renombra, para no dejar ficheros a medias"""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + '.tmp'
+    pq.write_table(tabla_arrow, temporal, compression='zstd')
+    os.replace(temporal, ruta)
+
+def _lotes(cursor):
+    """Filas de un cursor leídas con fetchmany, sin cargar toda la consulta en memoria"""
+    while True:
+        filas = cursor.fetchmany(LOTE)
+        if not filas:
+            return
+        yield from filas
+
+def _columnas(conn, spec):
+    return [d[0] for d in conn.execute(f"SELECT {spec['columnas']} FROM {spec['origen']} LIMIT 0").description]
+
+def _recorrer(conn, spec, idx_particion):
+    """
+    Todas las filas vigentes de una tabla ordenadas por partición, como (clave de partición, filas): solo
+    hay en memoria una partición a la vez
+    """
+    orden = ', '.join([*spec['particiones'].values(), spec['id']])
+    cursor = conn.execute(f"SELECT {spec['columnas']} FROM {spec['origen']} WHERE {spec['vigente']} ORDER BY {orden}")
+    clave, grupo = None, []
+    for fila in _lotes(cursor):
+        actual = tuple(fila[i] for i in idx_particion)
+        if grupo and actual != clave:
+            yield clave, grupo
+            grupo = []
+        clave = actual
+        grupo.append(fila)
+    if grupo:
+        yield clave, grupo
+
+def _leer_particion(conn, spec, clave):
+    """Filas vigentes de una sola partición (usa los índices de las columnas de partición)"""
+    condiciones = ' AND '.join(f"{expresion} IS ?" for expresion in spec['particiones'].values())
+    return list(_lotes(conn.execute(f"SELECT {spec['columnas']} FROM {spec['origen']} "
+                                    f"WHERE {spec['vigente']} AND {condiciones} ORDER BY {spec['id']}", clave)))
+
+def _particiones_tocadas(conn, spec, previa):
+    """
+    Claves de las particiones que pueden haber cambiado desde el snapshot anterior: las que tienen filas
+    con id mayor que el último exportado y las de filas marcadas como borradas desde entonces (borrado_en
+    tiene resolución de segundos, así que se repasan también las del mismo segundo)
+    """
+    claves = ', '.join(spec['particiones'].values())
+    tocadas = set(conn.execute(f"SELECT DISTINCT {claves} FROM {spec['origen']} WHERE {spec['vigente']} AND {spec['id']} > ?",
+                               (previa['max_id'],)))
+    columna = spec['borrado'][1]
+    if previa['borrado_hasta'] is None:
+        borradas = conn.execute(f"SELECT DISTINCT {claves} FROM {spec['origen']} WHERE {columna} IS NOT NULL")
+    else:
+        borradas = conn.execute(f"SELECT DISTINCT {claves} FROM {spec['origen']} WHERE {columna} >= ?",
+                                (previa['borrado_hasta'],))
+    return tocadas | set(borradas)
+
+def _contar_vigentes(conn, tabla, spec):
+    """Filas vigentes sin recorrer la tabla: todas menos las marcadas como borradas (índice parcial)"""
+    total = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    return total - conn.execute(f"SELECT COUNT(*) FROM {spec['origen']} WHERE {spec['borrado'][1]} IS NOT NULL").fetchone()[0]
+
+def _escribir_particion(destino, tabla, ruta, filas, tipos, previa):
+    """Entrada del manifiesto de una partición y si se ha escrito (solo si su contenido ha cambiado)"""
+    huella = _hash_filas(filas)
+    # El nombre del fichero depende del contenido: una partición modificada se escribe en un
+    # fichero nuevo y el anterior sigue disponible para quien esté leyendo el snapshot viejo
+    fichero = '/'.join(filter(None, [tabla, ruta, f"part-{huella[:16]}.parquet"]))
+    entrada = {'fichero': fichero, 'filas': len(filas), 'hash': huella}
+    if previa and previa['hash'] == huella and os.path.exists(os.path.join(destino, fichero)):
+        return entrada, False
+    _escribir_atomico(_to_arrow(filas, tipos, tabla), os.path.join(destino, fichero))
+    return entrada, True
+
+def export_snapshot(destino=None, completo=False):
+    """
+    Exporta las tablas a Parquet particionado. Solo se reescriben las particiones cuyo contenido
+    ha cambiado desde el último snapshot (o todas si completo=True). Devuelve el manifiesto nuevo.
+
+    En partidos, corners y posiciones no se recorre la tabla: solo se leen de nuevo las particiones con
+    filas de id mayor que el último exportado o marcadas como borradas desde entonces. Si el número de
+    filas vigentes no cuadra con el manifiesto (filas eliminadas sin marcar, p. ej. al borrar un equipo
+    en cascada), esa tabla se recorre entera. Equipos y jugadores, que sí se modifican, se recorren
+    siempre; son pequeñas. Todo se lee con fetchmany, una partición a la vez.
+    """
+    destino = destino or tenant_path(SNAPSHOT_DIR)
+    _require_pyarrow()
+    anterior = None if completo else load_manifest(destino)
+    data_version = get_data_version()
+
+    # Si la base de datos no ha cambiado desde el último snapshot no hay nada que hacer
+    if anterior and anterior.get('data_version') == data_version:
+        anterior['cambios'] = {'escritas': 0, 'sin_cambios': sum(len(t['particiones']) for t in anterior['tablas'].values()), 'eliminadas': 0}
+        return anterior
+
+    manifest = {'version': MANIFEST_VERSION, 'data_version': data_version,
+                'creado': time.strftime('%Y-%m-%dT%H:%M:%S'), 'tablas': {}}
+    cambios = {'escritas': 0, 'sin_cambios': 0, 'eliminadas': 0}
+    obsoletos = []
+
+    conn = get_db_connection()
+    try:
+        # Una única transacción de lectura para que todas las tablas sean coherentes entre sí
+        conn.execute('BEGIN')
+        for tabla, spec in TABLAS.items():
+            particiones = tuple(spec['particiones'])
+            columnas = _columnas(conn, spec)
+            # Las columnas de partición van en la ruta, no dentro del fichero
+            idx_particion = [columnas.index(col) for col in particiones]
+            idx_datos = [i for i, col in enumerate(columnas) if col not in particiones]
+            tipos = _tipos_columnas(conn, tabla, [columnas[i] for i in idx_datos])
+
+            def datos(clave, filas):
+                return _ruta_particion(zip(particiones, clave)), [tuple(fila[i] for i in idx_datos) for fila in filas]
+
+            previa_tabla = anterior['tablas'].get(tabla) if anterior else None
+            previas = previa_tabla['particiones'] if previa_tabla else {}
+            max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}").fetchone()[0]
+            borrado_hasta = None
+            if 'borrado' in spec:
+                borrado_hasta = conn.execute(f"SELECT MAX(borrado_en) FROM {spec['borrado'][0]}").fetchone()[0]
+
+            # Solo las particiones que pueden haber cambiado, si la tabla lo permite
+            tocadas = None
+            if ('borrado' in spec and previa_tabla is not None and 'max_id' in previa_tabla
+                    and previa_tabla['columnas'] == [list(t) for t in tipos]):
+                tocadas = dict(datos(clave, _leer_particion(conn, spec, clave))
+                               for clave in _particiones_tocadas(conn, spec, previa_tabla))
+                vigentes = (sum(len(filas) for filas in tocadas.values())
+                            + sum(p['filas'] for ruta, p in previas.items() if ruta not in tocadas))
+                if vigentes != _contar_vigentes(conn, tabla, spec):
+                    # Filas eliminadas sin marca (p. ej. al borrar un equipo en cascada): se recorre entera
+                    tocadas = None
+
+            if tocadas is None:
+                entradas = {}
+                grupos = (datos(clave, filas) for clave, filas in _recorrer(conn, spec, idx_particion))
+            else:
+                entradas = {ruta: p for ruta, p in previas.items() if ruta not in tocadas}
+                cambios['sin_cambios'] += len(entradas)
+                grupos = tocadas.items()
+            for ruta, filas in grupos:
+                previa = previas.get(ruta)
+                if not filas:
+                    continue
+                entrada, escrita = _escribir_particion(destino, tabla, ruta, filas, tipos, previa)
+                cambios['escritas' if escrita else 'sin_cambios'] += 1
+                if escrita and previa and previa['fichero'] != entrada['fichero']:
+                    obsoletos.append(previa['fichero'])
+                entradas[ruta] = entrada
+
+            # Particiones que ya no tienen filas
+            for ruta, previa in previas.items():
+                if ruta not in entradas:
+                    obsoletos.append(previa['fichero'])
+                    cambios['eliminadas'] += 1
+
+            manifest['tablas'][tabla] = {
+                'particionado_por': list(particiones),
+                'columnas': tipos,
+                'filas': sum(e['filas'] for e in entradas.values()),
+                'particiones': entradas,
+                'max_id': max_id,
+                'borrado_hasta': borrado_hasta,
+            }
+        conn.rollback()
+    finally:
+        conn.close()
+
+    # El manifiesto se escribe al final: mientras tanto los lectores siguen viendo el snapshot anterior
+    os.makedirs(destino, exist_ok=True)
+    temporal = os.path.join(destino, MANIFEST + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, os.path.join(destino, MANIFEST))
+
+    # Con el manifiesto nuevo publicado ya se pueden borrar los ficheros sustituidos
+    for fichero in obsoletos:
+        try:
+            os.remove(os.path.join(destino, fichero))
+        except OSError:
+            pass
+
+    manifest['cambios'] = cambios
+    return manifest
+
+def read_snapshot(tabla, columns=None, filters=None, destino=None):
+    """
+    Lee una tabla del snapshot como tabla Arrow, con los ficheros mapeados en memoria.
+    filters sigue la sintaxis de pyarrow, p. ej. [('temporada', '=', '2024'), ('equipo_id', '=', 3)].
+    """
+    destino = destino or tenant_path(SNAPSHOT_DIR)
+    _require_pyarrow()
+    manifest = load_manifest(destino)
+    if manifest is None or tabla not in manifest['tablas']:
+        raise FileNotFoundError(f"No hay snapshot de la tabla {tabla} en {destino}")
+
+    info = manifest['tablas'][tabla]
+    particiones = info['particionado_por']
+    ficheros = [os.path.join(destino, p['fichero']) for p in info['particiones'].values()]
+
+    # Tabla vacía: construirla con el esquema del manifiesto
+    if not ficheros:
+        campos = [(col, tipo) for col, tipo in info['columnas']]
+        campos += [(col, TIPOS_PARTICION[col]) for col in particiones]
+        schema = pa.schema([(col, pa.type_for_alias(tipo)) for col, tipo in campos])
+        vacia = schema.empty_table()
+        return vacia.select(columns) if columns else vacia
+
+    # Leer exactamente los ficheros del manifiesto (no todo el directorio), mapeados en memoria
+    particionado = None
+    if particiones:
+        particionado = ds.partitioning(
+            pa.schema([(col, pa.type_for_alias(TIPOS_PARTICION[col])) for col in particiones]),
+            flavor='hive'
+        )
+    dataset = ds.dataset(ficheros, format='parquet', filesystem=pafs.LocalFileSystem(use_mmap=True),
+                         partitioning=particionado, partition_base_dir=os.path.join(destino, tabla))
+    filtro = pq.filters_to_expression(filters) if filters else None
+    return dataset.to_table(columns=columns, filter=filtro)
+
+def read_snapshot_df(tabla, columns=None, filters=None, destino=None):
+    """Lee una tabla del snapshot como DataFrame de pandas"""
+    return read_snapshot(tabla, columns, filters, destino).to_pandas(split_blocks=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta la base de datos de corners a Parquet particionado")
+    parser.add_argument('--destino', help="Directorio del snapshot (por defecto, el del club)")
+    parser.add_argument('--club', help="Club cuyos datos se exportan (por defecto, la base principal)")
+    parser.add_argument('--completo', action='store_true', help="Reescribir todas las particiones")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    with use_tenant(args.club):
+        manifest = export_snapshot(args.destino, completo=args.completo)
+    cambios = manifest['cambios']
+    for tabla, info in manifest['tablas'].items():
+        print(f"{tabla}: {info['filas']} filas en {len(info['particiones'])} particiones")
+    print(f"Particiones escritas: {cambios['escritas']}, sin cambios: {cambios['sin_cambios']}, "
+          f"eliminadas: {cambios['eliminadas']} ({time.perf_counter() - inicio:.2f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Auditoría del arranque: cuánto tarda en importarse lo que las páginas cargan antes de comprobar la
+# sesión y qué librerías pesadas arrastra. Cada medida se hace en un intérprete nuevo (las importaciones
+# se cachean en sys.modules, así que solo la primera cuenta).
+# Uso: python -m utils.startup [--presupuesto 400] [--auditar 15]; sale con 1 si se pasa del presupuesto
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que importan las páginas en su cabecera
+MODULOS_PAGINAS = [
+    'streamlit', 'utils.db', 'utils.auth', 'utils.categories', 'utils.queries', 'utils.profiling',
+    'utils.scheduler', 'utils.chart_cache', 'utils.charts', 'utils.visualization', 'utils.exports',
+    'utils.bootstrap',
+]
+# Librerías que solo deben cargarse después de comprobar la sesión (ver utils/lazy.py)
+MODULOS_PESADOS = ['matplotlib', 'seaborn', 'PIL', 'pandas', 'numpy']
+# Páginas que se ejecutan sin sesión: deben pararse antes de cargar las librerías pesadas
+PAGINAS = ['pages/2_registro.py', 'pages/3_corners.py', 'pages/4_analisis_ofensivo.py',
+           'pages/5_analisis_defensivo.py']
+
+PRESUPUESTO_MS = float(os.environ.get('CORNERS_IMPORT_BUDGET_MS', '400'))
+REPETICIONES = 5
+
+_MEDIR = """
+import json, sys, time
+inicio = time.perf_counter()
+for nombre in {modulos!r}:
+    __import__(nombre)
+duracion = (time.perf_counter() - inicio) * 1000
+print(json.dumps({{'ms': duracion, 'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+_PAGINA = """
+import json, logging, sys
+from streamlit.testing.v1 import AppTest
+for nombre in list(logging.root.manager.loggerDict):
+    if nombre.startswith('streamlit'):
+        logging.getLogger(nombre).setLevel(logging.ERROR)
+AppTest.from_file({pagina!r}, default_timeout=60).run()
+print(json.dumps({{'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+def _python(codigo, *opciones, cwd=None):
+    """Ejecuta código en un intérprete nuevo con la raíz del proyecto en el path"""
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get('PYTHONPATH')])))
+    return subprocess.run([sys.executable, *opciones, '-c', codigo], capture_output=True, text=True,
+                          cwd=cwd or RAIZ, env=entorno, check=True)
+
+def measure_imports(modulos=MODULOS_PAGINAS, repeticiones=REPETICIONES):
+    """Tiempo de importación en frío (mediana y mínimo) y librerías pesadas cargadas por el camino"""
+    tiempos, pesados = [], set()
+    codigo = _MEDIR.format(modulos=list(modulos), pesados=MODULOS_PESADOS)
+    for _ in range(repeticiones):
+        resultado = json.loads(_python(codigo).stdout.strip().splitlines()[-1])
+        tiempos.append(resultado['ms'])
+        pesados.update(resultado['pesados'])
+    return {'mediana_ms': round(statistics.median(tiempos), 1), 'min_ms': round(min(tiempos), 1),
+            'pesados': sorted(pesados)}
+
+def audit_imports(modulos=MODULOS_PAGINAS, top=15):
+    """Paquetes de primer nivel que más tardan en importarse (salida de python -X importtime)"""
+    codigo = ''.join(f"import {nombre}\n" for nombre in modulos)
+    salida = _python(codigo, '-X', 'importtime').stderr
+    paquetes = {}
+    for linea in salida.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", linea)
+        # Solo los de primer nivel (sin sangría): su tiempo acumulado incluye el de sus dependencias
+        if m and not m.group(3):
+            paquetes[m.group(4)] = round(int(m.group(2)) / 1000, 1)
+    return sorted(paquetes.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def check_pages(paginas=PAGINAS):
+    """Ejecuta cada página sin sesión iniciada y devuelve las librerías pesadas que llega a cargar"""
+    resultados = {}
+    # En un directorio vacío, para que una página que no se pare a tiempo no toque data/ del proyecto
+    with tempfile.TemporaryDirectory(prefix='corners-startup-') as directorio:
+        for pagina in paginas:
+            codigo = _PAGINA.format(pagina=os.path.join(RAIZ, pagina), pesados=MODULOS_PESADOS)
+            resultados[pagina] = json.loads(_python(codigo, cwd=directorio).stdout.strip().splitlines()[-1])['pesados']
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el arranque de las páginas frente a un presupuesto")
+    parser.add_argument('--presupuesto', type=float, default=PRESUPUESTO_MS, help="Milisegundos admitidos")
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--auditar', type=int, default=0, metavar='N', help="Mostrar los N paquetes más lentos")
+    parser.add_argument('--sin-paginas', action='store_true', help="No ejecutar las páginas sin sesión")
+    args = parser.parse_args(argv)
+
+    fallos = []
+    medida = measure_imports(repeticiones=args.repeticiones)
+    print(f"Importación de los módulos de las páginas: {medida['mediana_ms']} ms "
+          f"(mínimo {medida['min_ms']} ms, presupuesto {args.presupuesto:.0f} ms)")
+    if medida['mediana_ms'] > args.presupuesto:
+        fallos.append(f"la importación tarda {medida['mediana_ms']} ms, más que el presupuesto")
+    if medida['pesados']:
+        fallos.append(f"la importación carga {', '.join(medida['pesados'])}")
+
+    if args.auditar:
+        print("Paquetes más lentos (ms acumulados):")
+        for paquete, ms in audit_imports(top=args.auditar):
+            print(f"  {paquete:40} {ms:>8.1f}")
+
+    if not args.sin_paginas:
+        for pagina, pesados in check_pages().items():
+            print(f"{pagina} sin sesión: {'carga ' + ', '.join(pesados) if pesados else 'OK'}")
+            if pesados:
+                fallos.append(f"{pagina} carga {', '.join(pesados)} antes de comprobar la sesión")
+
+    for fallo in fallos:
+        print(f"FALLO: {fallo}", file=sys.stderr)
+    return 1 if fallos else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
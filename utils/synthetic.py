@@ -0,0 +1,200 @@
+# Generador determinista de una liga sintética (equipos, plantillas, partidos, corners y posiciones)
+# para probar la aplicación con muchos más datos de los que se registran a mano.
+# Uso: python -m utils.synthetic --destino data/sintetico.db [--equipos 20] [--temporadas 1] [--semilla 0]
+import argparse
+import datetime
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from utils.categories import CATEGORIAS
+from utils.db import create_indexes, create_tables
+from utils.visualization import get_zonas_referencia
+
+JUGADORES_POR_EQUIPO = 22
+CORNERS_POR_PARTIDO = 10  # media de una distribución de Poisson
+ANIO_INICIAL = 2024
+USUARIO_DEMO = ('demo', 'demo')
+
+# Roles de cada corner: ocho atacantes y ocho defensores
+ROLES_ATAQUE = ['Lanzador', 'Rematador', 'Rematador', 'Rematador', 'Bloqueador', 'Arrastre', 'Rechace', 'Atrás']
+ROLES_DEFENSA = ['Poste', 'Zona', 'Zona', 'Zona', 'Al hombre', 'Al hombre', 'Al hombre', 'Arriba']
+
+# Nube de posiciones de cada rol en un corner desde la derecha: centro (x, y) y desviación típica.
+# Para los corners desde la izquierda se refleja la coordenada x.
+NUBES_ROLES = {
+    'Lanzador': ((96, 6), 0.5),
+    'Rematador': ((52, 16), 6),
+    'Bloqueador': ((58, 12), 4),
+    'Arrastre': ((62, 18), 5),
+    'Rechace': ((50, 36), 5),
+    'Atrás': ((50, 58), 6),
+    'Poste': ((36, 12), 1.5),
+    'Zona': ((50, 14), 5),
+    'Al hombre': ((52, 20), 6),
+    'Arriba': ((45, 40), 6),
+}
+
+# Probabilidades en el orden de los catálogos de utils.categories
+PROB_RESULTADOS = [0.03, 0.12, 0.15, 0.45, 0.07, 0.08, 0.10]
+PROB_ZONAS = [0.22, 0.18, 0.16, 0.08, 0.12, 0.07, 0.09, 0.08]
+
+def _jornadas(n_equipos):
+    """Calendario de ida (método del círculo): lista de jornadas con pares (local, visitante) de índices"""
+    equipos = list(range(n_equipos)) + ([None] if n_equipos % 2 else [])
+    n = len(equipos)
+    jornadas = []
+    for j in range(n - 1):
+        pares = []
+        for i in range(n // 2):
+            local, visitante = equipos[i], equipos[n - 1 - i]
+            if local is not None and visitante is not None:
+                # Alternar la localía para que nadie juegue siempre en casa
+                pares.append((local, visitante) if (j + i) % 2 == 0 else (visitante, local))
+        jornadas.append(pares)
+        equipos = [equipos[0]] + [equipos[-1]] + equipos[1:-1]
+    return jornadas
+
+def _posiciones(rng, roles, tipos_corner, jugadores, desvio_jugador):
+    """Coordenadas de cada posición según la nube de su rol, el sesgo del jugador y el lado del corner"""
+    centros = np.array([NUBES_ROLES[r][0] for r in roles], dtype=float)
+    desviaciones = np.array([NUBES_ROLES[r][1] for r in roles], dtype=float)
+    xy = centros + desvio_jugador[jugadores] + rng.normal(0, 1, (len(roles), 2)) * desviaciones[:, None]
+    # Corners desde la izquierda: reflejar en el eje x
+    izquierda = tipos_corner == 1
+    xy[izquierda, 0] = 100 - xy[izquierda, 0]
+    xy[:, 0] = np.clip(xy[:, 0], 0, 100)
+    xy[:, 1] = np.clip(xy[:, 1], 0, 70)
+    return np.round(xy, 1)
+
+def _elegir_jugadores(rng, n_corners, preferencias, peso):
+    """Elige ocho jugadores de la plantilla por corner (más probable para los titulares) y los ordena por rol"""
+    # Muestreo ponderado sin reemplazo: la clave u^(1/peso) más alta gana
+    claves = rng.random((n_corners, JUGADORES_POR_EQUIPO)) ** (1 / peso)
+    elegidos = np.argsort(-claves, axis=1)[:, :8]
+    # Cada jugador tiende a ocupar el puesto de su preferencia, con algo de variación
+    orden = np.argsort(preferencias[elegidos] + rng.random((n_corners, 8)) * 2, axis=1)
+    return np.take_along_axis(elegidos, orden, axis=1)
+
+def generate_league(destino, equipos=20, temporadas=1, semilla=0, sobrescribir=False):
+    """Crea una base de datos nueva con una liga sintética y devuelve el número de filas de cada tabla"""
+    if os.path.exists(destino):
+        if not sobrescribir:
+            raise FileExistsError(f"{destino} ya existe")
+        os.remove(destino)
+    if os.path.dirname(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+    rng = np.random.default_rng(semilla)
+    conn = sqlite3.connect(destino)
+    try:
+        # Base de datos nueva: no hace falta diario mientras se carga
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        # Los índices de las claves ajenas se crean al final: cargar con ellos sería más lento
+        create_tables(conn, indices=False)
+        conn.execute("ALTER TABLE corners ADD COLUMN zona_caida TEXT")
+        conn.execute("ALTER TABLE corners ADD COLUMN punto_caida TEXT")
+
+        usuario, clave = USUARIO_DEMO
+        conn.execute("INSERT INTO usuarios (username, password) VALUES (?, ?)",
+                     (usuario, hashlib.sha256(clave.encode()).hexdigest()))
+        conn.executemany("INSERT INTO equipos (id, nombre) VALUES (?, ?)",
+                         [(e + 1, f"Equipo {e + 1:02d}") for e in range(equipos)])
+        conn.executemany("INSERT INTO jugadores (id, nombre, equipo_id, numero) VALUES (?, ?, ?, ?)", [
+            (e * JUGADORES_POR_EQUIPO + n + 1, f"Jugador {e + 1:02d}-{n + 1:02d}", e + 1, n + 1)
+            for e in range(equipos) for n in range(JUGADORES_POR_EQUIPO)
+        ])
+
+        # Rasgos fijos de cada jugador: puesto preferido en ataque y defensa, titularidad y sesgo de posición
+        preferencia_ataque = rng.permutation(JUGADORES_POR_EQUIPO) % len(ROLES_ATAQUE)
+        preferencia_defensa = rng.permutation(JUGADORES_POR_EQUIPO) % len(ROLES_DEFENSA)
+        peso = np.where(np.arange(JUGADORES_POR_EQUIPO) < 14, 4.0, 1.0)
+        desvio_jugador = rng.normal(0, 2.5, (equipos * JUGADORES_POR_EQUIPO, 2))
+
+        # Punto de caída (texto "x,y", como en el registro) de cada tipo de corner y zona
+        puntos_caida = [[f"{x},{y}" for x, y in (get_zonas_referencia(tipo)[zona] for zona in CATEGORIAS['zona'])]
+                        for tipo in CATEGORIAS['tipo_corner']]
+
+        jornadas = _jornadas(equipos)
+        jornadas = jornadas + [[(v, l) for l, v in pares] for pares in jornadas]  # ida y vuelta
+        partido_id = corner_id = 0
+        for temporada in range(temporadas):
+            inicio = datetime.date(ANIO_INICIAL + temporada, 8, 15)
+            partidos = []
+            for j, pares in enumerate(jornadas):
+                fecha = (inicio + datetime.timedelta(days=7 * j)).isoformat()
+                for local, visitante in pares:
+                    partido_id += 1
+                    partidos.append((partido_id, local + 1, visitante + 1, fecha))
+            conn.executemany("INSERT INTO partidos (id, equipo_local_id, equipo_visitante_id, fecha) VALUES (?, ?, ?, ?)",
+                             partidos)
+
+            # Corners de la temporada
+            ids_partido = np.array([p[0] for p in partidos])
+            locales = np.array([p[1] for p in partidos])
+            visitantes = np.array([p[2] for p in partidos])
+            por_partido = rng.poisson(CORNERS_POR_PARTIDO, len(partidos))
+            n = int(por_partido.sum())
+            if n == 0:
+                continue
+            idx = np.repeat(np.arange(len(partidos)), por_partido)
+            local_ataca = rng.random(n) < 0.55
+            atacante = np.where(local_ataca, locales[idx], visitantes[idx])
+            defensor = np.where(local_ataca, visitantes[idx], locales[idx])
+            minutos = rng.integers(1, 96, n)
+            tipos = rng.integers(0, 2, n)
+            resultados = rng.choice(len(PROB_RESULTADOS), n, p=PROB_RESULTADOS)
+            zonas = rng.choice(len(PROB_ZONAS), n, p=PROB_ZONAS)
+            ids_corner = np.arange(corner_id + 1, corner_id + n + 1)
+            corner_id += n
+            conn.executemany("""
+                INSERT INTO corners (id, partido_id, equipo_id, minuto, tipo, resultado, zona_caida, punto_caida)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, zip(ids_corner.tolist(), ids_partido[idx].tolist(), atacante.tolist(), minutos.tolist(),
+                     [CATEGORIAS['tipo_corner'][t] for t in tipos],
+                     [CATEGORIAS['resultado'][r] for r in resultados],
+                     [CATEGORIAS['zona'][z] for z in zonas],
+                     [puntos_caida[t][z] for t, z in zip(tipos, zonas)]))
+
+            # Posiciones: ocho atacantes y ocho defensores por corner
+            for equipo, roles, preferencias, tipo_pos in (
+                (atacante, ROLES_ATAQUE, preferencia_ataque, 'Ofensivo'),
+                (defensor, ROLES_DEFENSA, preferencia_defensa, 'Defensivo'),
+            ):
+                elegidos = _elegir_jugadores(rng, n, preferencias, peso)
+                jugadores = ((equipo - 1)[:, None] * JUGADORES_POR_EQUIPO + elegidos).ravel()
+                roles_filas = roles * n
+                xy = _posiciones(rng, roles_filas, np.repeat(tipos, 8), jugadores, desvio_jugador)
+                conn.executemany("""
+                    INSERT INTO posiciones_jugadores (corner_id, jugador_id, equipo_id, x, y, rol, tipo)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, zip(np.repeat(ids_corner, 8).tolist(), (jugadores + 1).tolist(), np.repeat(equipo, 8).tolist(),
+                         xy[:, 0].tolist(), xy[:, 1].tolist(), roles_filas, [tipo_pos] * len(roles_filas)))
+        create_indexes(conn)
+        conn.commit()
+
+        return {tabla: conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+                for tabla in ('equipos', 'jugadores', 'partidos', 'corners', 'posiciones_jugadores')}
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera una base de datos con una liga sintética")
+    parser.add_argument('--destino', required=True, help="Fichero SQLite a crear")
+    parser.add_argument('--equipos', type=int, default=20)
+    parser.add_argument('--temporadas', type=int, default=1)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--sobrescribir', action='store_true', help="Reemplazar el fichero si ya existe")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    filas = generate_league(args.destino, args.equipos, args.temporadas, args.semilla, args.sobrescribir)
+    print(', '.join(f"{tabla}: {n}" for tabla, n in filas.items()) + f" ({time.perf_counter() - inicio:.2f}s)")
+    print(f"Usuario de prueba: {USUARIO_DEMO[0]} / {USUARIO_DEMO[1]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# Separación de los datos por club: cada club tiene su propia base de datos SQLite, con sus snapshots y
+# su almacén de posiciones, en data/clubes/<club>/, así que sus consultas solo recorren sus propios datos.
+# Los usuarios sin club siguen usando data/corners.db. El club de cada ejecución lo fija la comprobación
+# de sesión (utils.auth.require_login) y get_db_connection abre el fichero que le corresponde.
+# Uso: python -m utils.tenancy crear <club> | asignar <usuario> [<club>] | listar
+import argparse
+import os
+import re
+import sys
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+DATA_DIR = 'data'
+CLUBES_DIR = os.path.join(DATA_DIR, 'clubes')
+
+# El club es de la ejecución de la página (un hilo por sesión de Streamlit), no del proceso
+_local = threading.local()
+
+def club_slug(club):
+    """Nombre de directorio de un club: minúsculas, sin acentos y con guiones ('Real Oviedo' -> 'real-oviedo')"""
+    texto = unicodedata.normalize('NFKD', str(club)).encode('ascii', 'ignore').decode('ascii')
+    slug = re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-')
+    if not slug:
+        raise ValueError(f"Nombre de club no válido: {club!r}")
+    return slug
+
+def current_tenant():
+    """Club de la ejecución actual (None: base de datos principal)"""
+    return getattr(_local, 'club', None)
+
+def set_tenant(club):
+    """Fija el club de la ejecución actual; None vuelve a la base de datos principal"""
+    _local.club = club_slug(club) if club else None
+
+@contextmanager
+def use_tenant(club):
+    """Ejecuta un bloque con los datos de un club y restaura después el club anterior"""
+    anterior = current_tenant()
+    set_tenant(club)
+    try:
+        yield
+    finally:
+        _local.club = anterior
+
+def tenant_path(ruta, club=None):
+    """
+    Ruta bajo data/ del club indicado o, si no se indica, del actual: data/corners.db pasa a ser
+    data/clubes/<club>/corners.db. Sin club se devuelve la ruta tal cual.
+    """
+    club = club_slug(club) if club else current_tenant()
+    if club is None:
+        return ruta
+    return os.path.join(CLUBES_DIR, club, os.path.relpath(ruta, DATA_DIR))
+
+def list_tenants():
+    """Clubes que ya tienen base de datos"""
+    if not os.path.isdir(CLUBES_DIR):
+        return []
+    from utils.db import DB_PATH
+
+    return sorted(club for club in os.listdir(CLUBES_DIR)
+                  if os.path.isfile(tenant_path(DB_PATH, club)))
+
+def create_tenant(club):
+    """Crea (o completa) la base de datos de un club con el esquema de la aplicación; devuelve su ruta"""
+    from utils.categories import drop_lookup_tables
+    from utils.db import (DB_PATH, add_columns_to_corners_table, create_tables, get_db_connection,
+                          upgrade_foreign_keys)
+
+    with use_tenant(club):
+        conn = get_db_connection()
+        try:
+            create_tables(conn)
+            drop_lookup_tables(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        correcto, mensaje = add_columns_to_corners_table()
+        if not correcto:
+            raise RuntimeError(mensaje)
+        upgrade_foreign_keys()
+        return tenant_path(DB_PATH)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gestiona las bases de datos de cada club")
+    ordenes = parser.add_subparsers(dest='orden', required=True)
+    crear = ordenes.add_parser('crear', help="Crea la base de datos de un club")
+    crear.add_argument('club')
+    asignar = ordenes.add_parser('asignar', help="Asigna un usuario a un club (sin club: base principal)")
+    asignar.add_argument('usuario')
+    asignar.add_argument('club', nargs='?')
+    ordenes.add_parser('listar', help="Lista los clubes y sus usuarios")
+    args = parser.parse_args(argv)
+
+    from utils.auth import assign_club, users_by_club
+
+    if args.orden == 'crear':
+        print(f"{club_slug(args.club)}: {create_tenant(args.club)}")
+    elif args.orden == 'asignar':
+        if args.club and club_slug(args.club) not in list_tenants():
+            print(f"El club {club_slug(args.club)} no existe; créalo con: python -m utils.tenancy crear {args.club}",
+                  file=sys.stderr)
+            return 1
+        if not assign_club(args.usuario, args.club):
+            print(f"El usuario {args.usuario} no existe", file=sys.stderr)
+            return 1
+        print(f"{args.usuario} -> {club_slug(args.club) if args.club else 'base principal'}")
+    else:
+        usuarios = users_by_club()
+        for club in [None] + list_tenants():
+            print(f"{club or '(principal)'}: {', '.join(usuarios.get(club, [])) or 'sin usuarios'}")
+    return 0
+
+if __name__ == '__main__':
+    # Se usa el módulo importado como utils.tenancy, que es el que consulta utils.db para elegir la base
+    from utils.tenancy import main
+    sys.exit(main())
@@ -1,22 +1,38 @@
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.patches import Circle
+from functools import lru_cache
+
+from utils.categories import CATEGORIAS, lookup_by_code
+from utils.lazy import lazy_import
+from utils.render import new_figure
+
+# numpy, pandas y matplotlib se cargan al dibujar el primer gráfico (ver utils/lazy.py)
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+matplotlib = lazy_import('matplotlib')
+mpimg = lazy_import('matplotlib.image')
+mpatches = lazy_import('matplotlib.patches')
+mpath = lazy_import('matplotlib.path')
+mcollections = lazy_import('matplotlib.collections')
+mfont_manager = lazy_import('matplotlib.font_manager')
+mtextpath = lazy_import('matplotlib.textpath')
+mtransforms = lazy_import('matplotlib.transforms')
+
+FIELD_IMAGE_PATH = 'assets/mediocampo.jpg'
 
 def create_field(ax):
     """Crea un campo de fútbol simplificado para visualización de corners"""
     # Dibujar el fondo
     ax.set_xlim(0, 100)
     ax.set_ylim(0, 70)
-    ax.add_patch(plt.Rectangle((0, 0), 100, 70, fill=True, color='green', alpha=0.3))
+    ax.add_patch(mpatches.Rectangle((0, 0), 100, 70, fill=True, color='green', alpha=0.3))
     
     # Área de penalty
-    ax.add_patch(plt.Rectangle((0, 0), 16.5, 40.3, fill=False, edgecolor='white'))
+    ax.add_patch(mpatches.Rectangle((0, 0), 16.5, 40.3, fill=False, edgecolor='white'))
     
     # Área de portería
-    ax.add_patch(plt.Rectangle((0, 0), 5.5, 18.3, fill=False, edgecolor='white'))
+    ax.add_patch(mpatches.Rectangle((0, 0), 5.5, 18.3, fill=False, edgecolor='white'))
     
     # Semicírculo del área
-    circle = plt.Circle((11, 11), 9.15, fill=False, edgecolor='white')
+    circle = mpatches.Circle((11, 11), 9.15, fill=False, edgecolor='white')
     ax.add_artist(circle)
     
     # Configuración final
@@ -25,21 +41,256 @@ def create_field(ax):
     
     return ax
 
+@lru_cache(maxsize=1)
+def load_field_image():
+    """Carga una sola vez la imagen de fondo del campo (None si no se puede cargar)"""
+    try:
+        field_img = mpimg.imread(FIELD_IMAGE_PATH)
+    except Exception:
+        return None
+    # La imagen se comparte entre figuras: evitar que alguien la modifique
+    field_img.setflags(write=False)
+    return field_img
+
+def create_field_plot(figsize=(10, 7)):
+    """Crea una figura con el campo de fútbol (imagen de fondo o campo genérico como respaldo)"""
+    fig, ax = new_figure(figsize=figsize)
+    
+    field_img = load_field_image()
+    if field_img is not None:
+        # Configurar los límites del eje para que coincidan con nuestro sistema de coordenadas
+        ax.set_xlim(0, 100)
+        ax.set_ylim(0, 70)  # Mantener orientación normal
+        
+        # Mostrar la imagen de fondo
+        ax.imshow(field_img, extent=[0, 100, 0, 70], aspect='auto', alpha=1.0)
+        
+        # Configuraciones comunes
+        ax.set_aspect('equal')
+        ax.axis('off')
+    else:
+        # Si no se puede cargar la imagen, usar el fondo verde como respaldo
+        create_field(ax)
+    
+    return fig, ax
+
+# Colores de cada rol según el tipo de posicionamiento
+COLORES_ROLES = {
+    'Defensivo': {
+        'Zona': 'red',
+        'Al hombre': 'blue',
+        'Poste': 'yellow',
+        'Arriba': 'green'
+    },
+    'Ofensivo': {
+        'Lanzador': 'purple',
+        'Rematador': 'orange',
+        'Bloqueador': 'cyan',
+        'Arrastre': 'magenta',
+        'Rechace': 'brown',
+        'Atrás': 'gray'
+    }
+}
+
+# Los mismos colores indexados por código de rol (CATEGORIAS['rol']); los roles del otro tipo van en blanco
+COLORES_ROLES_POR_CODIGO = {
+    tipo: [colores.get(rol, 'white') for rol in CATEGORIAS['rol']]
+    for tipo, colores in COLORES_ROLES.items()
+}
+
+def _role_palette(type_pos):
+    return COLORES_ROLES['Defensivo' if type_pos == 'Defensivo' else 'Ofensivo']
+
 def get_role_color(role, type_pos):
     """Devuelve un color según el rol del jugador"""
-    if type_pos == 'Defensivo':
+    return _role_palette(type_pos).get(role, 'white')
+
+def get_role_colors(roles, type_pos):
+    """Devuelve los colores de una serie de roles de una sola vez"""
+    tipo = 'Defensivo' if type_pos == 'Defensivo' else 'Ofensivo'
+    return lookup_by_code(roles, 'rol', COLORES_ROLES_POR_CODIGO[tipo], 'white').tolist()
+
+# Definir el punto de origen del corner basado en el tipo - igual que en registro_corners.py
+def get_punto_origen(tipo_corner):
+    if tipo_corner == "Derecha":
+        return (96, 6)  # Esquina derecha
+    else:  # "Izquierda"
+        return (4, 6)   # Esquina izquierda
+
+# Definir las zonas de referencia para el punto de caída - igual que en registro_corners.py
+def get_zonas_referencia(tipo_corner):
+    # Las zonas son: Primer Palo, Centro del Área Pequeña, Segundo Palo,
+    # Frontal Palo Cercano, Frontal Centro, Frontal Palo Lejano, 
+    # Zona de Rechace, Zona en Corto
+    
+    if tipo_corner == "Derecha":
+        # Corner desde la derecha (viendo hacia la portería)
         return {
-            'Zona': 'red',
-            'Al hombre': 'blue',
-            'Poste': 'yellow',
-            'Arriba': 'green'
-        }.get(role, 'white')
-    else:  # Ofensivo
+            "Primer Palo": (65, 15),         # Primer palo (más alejado del corner)
+            "Centro Área Pequeña": (50, 15), # Centro del área pequeña
+            "Segundo Palo": (35, 15),        # Segundo palo (más cercano al corner)
+            "Frontal Palo Cercano": (35, 30), # Frontal cerca del segundo palo (cercano al lanzamiento)
+            "Frontal Centro": (50, 30),      # Frontal centro
+            "Frontal Palo Lejano": (65, 30), # Frontal cerca del primer palo (lejano al lanzamiento)
+            "Zona de Rechace": (50, 45),     # Zona de rechace
+            "Zona en Corto": (80, 20)        # Zona en corto (derecha)
+        }
+    else:  # "Izquierda"
+        # Corner desde la izquierda (viendo hacia la portería)
         return {
-            'Lanzador': 'purple',
-            'Rematador': 'orange',
-            'Bloqueador': 'cyan',
-            'Arrastre': 'magenta',
-            'Rechace': 'brown',
-            'Atrás': 'gray'
-        }.get(role, 'white')
\ No newline at end of file
+            "Primer Palo": (35, 15),         # Primer palo (más alejado del corner)
+            "Centro Área Pequeña": (50, 15), # Centro del área pequeña
+            "Segundo Palo": (65, 15),        # Segundo palo (más cercano al corner)
+            "Frontal Palo Cercano": (65, 30), # Frontal cerca del segundo palo (cercano al lanzamiento)
+            "Frontal Centro": (50, 30),      # Frontal centro
+            "Frontal Palo Lejano": (35, 30), # Frontal cerca del primer palo (lejano al lanzamiento)
+            "Zona de Rechace": (50, 45),     # Zona de rechace
+            "Zona en Corto": (20, 20)        # Zona en corto (izquierda)
+        }
+
+def get_trayectorias(tipos, zonas):
+    """Devuelve los arrays de origen y destino (ya con el eje Y invertido) de cada par tipo/zona"""
+    pares = pd.DataFrame({'tipo': list(tipos), 'zona': list(zonas)})
+    
+    # Tabla de referencia con todas las zonas de ambos tipos de corner
+    referencia = pd.DataFrame(
+        [(tipo, zona, x, y) for tipo in ("Derecha", "Izquierda")
+         for zona, (x, y) in get_zonas_referencia(tipo).items()],
+        columns=['tipo', 'zona', 'x', 'y']
+    )
+    # Los tipos desconocidos se tratan como "Izquierda", igual que en get_punto_origen
+    pares['tipo_ref'] = pares['tipo'].where(pares['tipo'] == "Derecha", "Izquierda")
+    destinos = pares.merge(referencia, how='left', left_on=['tipo_ref', 'zona'],
+                           right_on=['tipo', 'zona'], sort=False)
+    
+    # Si la zona no está definida, usamos un valor predeterminado
+    destino = np.column_stack([destinos['x'].fillna(50).to_numpy(float),
+                               70 - destinos['y'].fillna(30).to_numpy(float)])
+    origen = np.where((pares['tipo_ref'] == "Derecha").to_numpy()[:, None],
+                      [get_punto_origen("Derecha")], [get_punto_origen("Izquierda")]).astype(float)
+    origen[:, 1] = 70 - origen[:, 1]
+    return origen, destino
+
+def add_text_batch(ax, x, y, labels, fontsize=8, color='black', fontweight='normal',
+                   ha='center', va='center', background=None, background_alpha=0.5, pad=1.5):
+    """Dibuja muchas etiquetas como una única colección de trazados en lugar de un Text por fila"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    labels = np.asarray(labels, dtype=str)
+    if len(labels) == 0:
+        return None
+    
+    # Maquetar cada texto distinto una sola vez y reutilizar el trazado
+    unicos, indices = np.unique(labels, return_inverse=True)
+    prop = mfont_manager.FontProperties(weight=fontweight)
+    trazados, cajas = [], []
+    for texto in unicos:
+        tp = mtextpath.TextPath((0, 0), texto, size=fontsize, prop=prop)
+        ext = tp.get_extents()
+        dx = {'left': -ext.x0, 'right': -ext.x1}.get(ha, -(ext.x0 + ext.x1) / 2)
+        dy = {'bottom': -ext.y0, 'top': -ext.y1, 'baseline': 0}.get(va, -(ext.y0 + ext.y1) / 2)
+        trazados.append(tp.transformed(mtransforms.Affine2D().translate(dx, dy)))
+        x0, y0, x1, y1 = ext.x0 + dx - pad, ext.y0 + dy - pad, ext.x1 + dx + pad, ext.y1 + dy + pad
+        cajas.append([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+    
+    # Los trazados están en puntos tipográficos y se desplazan a las coordenadas de datos
+    en_puntos = mtransforms.Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans
+    offsets = np.column_stack([x, y])
+    
+    if background is not None:
+        fondos = mcollections.PolyCollection([cajas[i] for i in indices], offsets=offsets,
+                                             offset_transform=ax.transData, transform=en_puntos,
+                                             facecolors=background, edgecolors='none', alpha=background_alpha)
+        ax.add_collection(fondos, autolim=False)
+    
+    textos = mcollections.PathCollection([trazados[i] for i in indices], offsets=offsets,
+                                         offset_transform=ax.transData, transform=en_puntos,
+                                         facecolors=color, edgecolors='none', linewidths=0)
+    ax.add_collection(textos, autolim=False)
+    return textos
+
+def draw_curved_arrows(ax, starts, ends, colors, widths, labels=None, curvature=0.2, alpha=0.7):
+    """Dibuja un conjunto de flechas convexas con una colección por capa (curvas, puntas y etiquetas)"""
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    if len(starts) == 0:
+        return
+    colors = np.broadcast_to(np.asarray(colors, dtype=object), (len(starts),)).tolist()
+    widths = np.broadcast_to(np.asarray(widths, dtype=float), (len(starts),))
+    
+    # Punto de control: punto medio desplazado según la distancia y la dirección de la curva
+    delta = ends - starts
+    distance = np.hypot(delta[:, 0], delta[:, 1])
+    control = (starts + ends) / 2
+    control[:, 1] += np.where(starts[:, 0] < ends[:, 0], 1.0, -1.0) * distance * curvature
+    
+    # Curvas Bézier cuadráticas
+    codes = [mpath.Path.MOVETO, mpath.Path.CURVE3, mpath.Path.CURVE3]
+    verts = np.stack([starts, control, ends], axis=1)
+    curvas = mcollections.PathCollection([mpath.Path(v, codes) for v in verts], facecolors='none',
+                                         edgecolors=colors, linewidths=widths, alpha=alpha,
+                                         transform=ax.transData)
+    ax.add_collection(curvas, autolim=False)
+    
+    # Punta de flecha: la dirección tangente en t=1 es P2-P1
+    arrow_length = 0.5
+    arrow_width = 0.3
+    direction = ends - control
+    mag = np.hypot(direction[:, 0], direction[:, 1])
+    direction = np.divide(direction, mag[:, None], out=direction.copy(), where=mag[:, None] != 0)
+    dx, dy = direction[:, 0], direction[:, 1]
+    punta1 = ends - arrow_length * np.column_stack([dx + arrow_width * dy, dy - arrow_width * dx])
+    punta2 = ends - arrow_length * np.column_stack([dx - arrow_width * dy, dy + arrow_width * dx])
+    puntas = mcollections.PolyCollection(np.stack([ends, punta1, punta2], axis=1), facecolors=colors,
+                                         edgecolors=colors, alpha=alpha, transform=ax.transData)
+    ax.add_collection(puntas, autolim=False)
+    
+    # Etiquetas en la parte más convexa de la curva, con fondo blanco para mejorar la visibilidad
+    if labels is not None:
+        add_text_batch(ax, control[:, 0], control[:, 1], labels, fontsize=9, color='black',
+                       fontweight='bold', background='white', background_alpha=0.7)
+
+def draw_role_circles(ax, x, y, sizes, colors, numbers, alpha=0.7):
+    """Dibuja los círculos de posición promedio y sus dorsales en dos colecciones"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) == 0:
+        return
+    diametros = 2 * np.asarray(sizes, dtype=float)
+    circulos = mcollections.EllipseCollection(diametros, diametros, np.zeros_like(diametros), units='xy',
+                                              offsets=np.column_stack([x, y]), offset_transform=ax.transData,
+                                              facecolors=colors, edgecolors=colors, alpha=alpha)
+    ax.add_collection(circulos, autolim=False)
+    add_text_batch(ax, x, y, [str(n) for n in numbers], fontsize=matplotlib.rcParams['font.size'],
+                   color='black', fontweight='bold')
+
+def draw_spread_ellipses(ax, x, y, anchos, altos, colors, alpha=0.2):
+    """Dibuja elipses centradas en cada posición (dispersión de un hueco), detrás de los círculos"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) == 0:
+        return
+    elipses = mcollections.EllipseCollection(np.asarray(anchos, dtype=float), np.asarray(altos, dtype=float),
+                                             np.zeros_like(x), units='xy', offsets=np.column_stack([x, y]),
+                                             offset_transform=ax.transData, facecolors=colors,
+                                             edgecolors=colors, alpha=alpha, linestyles='dashed')
+    ax.add_collection(elipses, autolim=False)
+
+def scatter_by_outcome(ax, x, y, resultados, estilos, default, **kwargs):
+    """Dibuja un scatter por categoría de resultado; estilos = [(resultados, color, marker), ...]"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    resultados = pd.Series(resultados, dtype=object).to_numpy()
+    restantes = np.ones(len(x), dtype=bool)
+    conteos = []
+    for valores, color, marker in estilos:
+        mask = np.isin(resultados, valores) & restantes
+        restantes &= ~mask
+        conteos.append(int(mask.sum()))
+        if mask.any():
+            ax.scatter(x[mask], y[mask], color=color, marker=marker, **kwargs)
+    color, marker = default
+    conteos.append(int(restantes.sum()))
+    if restantes.any():
+        ax.scatter(x[restantes], y[restantes], color=color, marker=marker, **kwargs)
+    return conteos